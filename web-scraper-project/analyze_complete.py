@@ -1,9 +1,19 @@
-﻿import json
-import pandas as pd
-import os
+﻿import os
 from datetime import datetime
 
-def analyze_scraped_data():
+from chunked_analysis import CHUNK_SIZE, aggregate_file, memory_baseline, peak_memory_mb, print_report
+
+
+def format_counts(counts, index_name):
+    # Same layout as pandas' value_counts().to_string()
+    label_width = max(len(str(label)) for label, _ in counts)
+    count_width = max(len(str(count)) for _, count in counts)
+    lines = [index_name]
+    lines += [f'{label:<{label_width}}    {count:>{count_width}}' for label, count in counts]
+    return '\n'.join(lines)
+
+
+def analyze_scraped_data(chunk_size=CHUNK_SIZE):
     print('📊 WEB SCRAPER PROJECT - COMPREHENSIVE ANALYSIS')
     print('=' * 60)
     
@@ -18,92 +28,30 @@ def analyze_scraped_data():
     print()
     
     try:
-        # Load the data
-        with open(data_file, 'r', encoding='utf-8', errors='ignore') as f:
-            books = json.load(f)
-        
-        print(f'✅ SUCCESS! Loaded {len(books):,} books!'.replace(',', ' '))
-        print()
-        
-        # Create DataFrame
-        df = pd.DataFrame(books)
-        
-        # ========== BASIC STATISTICS ==========
-        print('📈 BASIC STATISTICS:')
-        print('-' * 40)
-        print(f'   • Total Books: {len(df):,}'.replace(',', ' '))
-        print(f'   • Unique Categories: {df["category"].nunique()}')
-        print(f'   • Books with Images: {df["image_url"].notna().sum()}')
-        print(f'   • Books with Descriptions: {df["description"].notna().sum()}')
-        
-        # ========== PRICE ANALYSIS ==========
-        print()
-        print('💰 PRICE ANALYSIS:')
-        print('-' * 40)
-        
-        # Clean and convert prices
-        df['price_clean'] = df['price'].astype(str).str.extract(r'([\d\.]+)')[0]
-        df['price_clean'] = pd.to_numeric(df['price_clean'], errors='coerce')
-        
-        price_stats = df['price_clean'].describe()
-        print(f'   • Average Price: £{price_stats["mean"]:.2f}')
-        print(f'   • Most Expensive: £{price_stats["max"]:.2f}')
-        print(f'   • Least Expensive: £{price_stats["min"]:.2f}')
-        print(f'   • Price Range: £{price_stats["min"]:.2f} - £{price_stats["max"]:.2f}')
-        print(f'   • Standard Deviation: £{price_stats["std"]:.2f}')
-        
-        # Price categories
-        cheap = df[df['price_clean'] < 20].shape[0]
-        medium = df[(df['price_clean'] >= 20) & (df['price_clean'] < 50)].shape[0]
-        expensive = df[df['price_clean'] >= 50].shape[0]
-        print(f'   • Cheap (<£20): {cheap} books')
-        print(f'   • Medium (£20-£50): {medium} books')
-        print(f'   • Expensive (≥£50): {expensive} books')
-        
-        # ========== CATEGORY ANALYSIS ==========
-        print()
-        print('📚 CATEGORY ANALYSIS:')
-        print('-' * 40)
-        
-        category_counts = df['category'].value_counts()
-        print(f'   • Top 5 Categories:')
-        for i, (category, count) in enumerate(category_counts.head(5).items(), 1):
-            percentage = (count / len(df)) * 100
-            print(f'     {i}. {category}: {count} books ({percentage:.1f}%)')
+        # Stream the data in chunks into mergeable aggregates; the CSV export
+        # is written in the same pass, so memory is bounded by chunk_size
+        baseline = memory_baseline()
+        csv_file = 'data/books_analysis.csv'
+        stats = aggregate_file(data_file, chunk_size, csv_path=csv_file)
         
-        # ========== RATING ANALYSIS ==========
+        print(f'✅ SUCCESS! Loaded {stats.total:,} books!'.replace(',', ' '))
         print()
-        print('⭐ RATING ANALYSIS:')
-        print('-' * 40)
         
-        if 'rating' in df.columns:
-            rating_map = {'One': 1, 'Two': 2, 'Three': 3, 'Four': 4, 'Five': 5}
-            df['rating_numeric'] = df['rating'].map(rating_map)
-            rating_counts = df['rating_numeric'].value_counts().sort_index()
-            
-            for rating in range(1, 6):
-                count = rating_counts.get(rating, 0)
-                percentage = (count / len(df)) * 100
-                stars = '★' * rating + '☆' * (5 - rating)
-                print(f'   • {stars} ({rating}/5): {count} books ({percentage:.1f}%)')
+        print_report(stats)
         
         # ========== SAMPLE DATA ==========
         print()
         print('📋 SAMPLE DATA (First 5 Books):')
         print('-' * 40)
         
-        sample = df.head(5)[['title', 'price', 'category', 'rating']]
-        for idx, row in sample.iterrows():
-            print(f'   • "{row["title"][:40]}..." - {row["price"]} - {row["category"]} - {row["rating"]}')
+        for book in stats.sample:
+            print(f'   • "{book["title"][:40]}..." - {book["price"]} - {book["category"]} - {book["rating"]}')
         
         # ========== EXPORT DATA ==========
         print()
         print('💾 EXPORTING DATA:')
         print('-' * 40)
         
-        # Save to CSV
-        csv_file = 'data/books_analysis.csv'
-        df.to_csv(csv_file, index=False)
         print(f'   ✅ CSV saved: {csv_file}')
         
         # Save summary statistics
@@ -114,17 +62,17 @@ Analysis Date: {datetime.now().strftime("%Y-%m-%d %H:%M:%S")}
 Data Source: books.toscrape.com
 
 OVERVIEW:
-• Total Books Scraped: {len(df):,}
+• Total Books Scraped: {stats.total:,}
 • File Size: {(os.path.getsize(data_file) / (1024*1024)):.2f} MB
 • Scraping Completed: Yes (2000 books)
 
 PRICE STATISTICS:
-• Average Price: £{price_stats["mean"]:.2f}
-• Price Range: £{price_stats["min"]:.2f} - £{price_stats["max"]:.2f}
-• Most Common Price: £{df['price_clean'].mode()[0]:.2f}
+• Average Price: £{stats.price_mean:.2f}
+• Price Range: £{stats.price_min:.2f} - £{stats.price_max:.2f}
+• Most Common Price: £{stats.price_mode():.2f}
 
 CATEGORY BREAKDOWN (Top 10):
-{category_counts.head(10).to_string()}
+{format_counts(stats.categories.most_common(10), 'category')}
 
 PROJECT SUCCESS METRICS:
 • Data Collection: ✅ COMPLETE (2000/2000 books)
@@ -138,6 +86,10 @@ PROJECT SUCCESS METRICS:
         
         print(f'   ✅ Summary saved: {summary_file}')
         
+        peak = peak_memory_mb()
+        if peak is not None:
+            print(f'   🧠 Peak memory: {peak:.1f} MB ({peak - baseline:.1f} MB for the analysis)')
+        
         # ========== RECOMMENDATIONS ==========
         print()
         print('🎯 NEXT STEPS FOR YOUR PORTFOLIO:')
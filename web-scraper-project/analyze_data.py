@@ -1,8 +1,9 @@
 ﻿import json
-import pandas as pd
 import os
 
 def main():
+    import pandas as pd
+    
     print('📊 WEB SCRAPER PROJECT - DATA ANALYSIS')
     print('=' * 50)
     
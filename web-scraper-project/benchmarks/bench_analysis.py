@@ -0,0 +1,85 @@
+"""Peak memory of the analysis: whole DataFrame vs chunked aggregates.
+
+    python benchmarks/bench_analysis.py [BOOKS ...]
+
+Writes a JSON Lines file of BOOKS books (cycling data/books_clean.json) and
+runs each analysis in a fresh process, reporting its peak RSS above the
+interpreter + pandas baseline. The full path is what analyze_complete.py
+used to do: load every book, build one object-dtype DataFrame and add the
+price_clean / rating_numeric columns.
+"""
+
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_DIR)
+
+from feeds import iter_books
+
+FULL = '''
+import json, pandas as pd
+from chunked_analysis import memory_baseline, peak_memory_mb
+baseline = memory_baseline()
+with open(PATH, encoding='utf-8') as f:
+    books = [json.loads(line) for line in f]
+df = pd.DataFrame(books)
+df['price_clean'] = pd.to_numeric(df['price'].astype(str).str.extract(r'([\\d\\.]+)')[0], errors='coerce')
+df['rating_numeric'] = df['rating'].map({'One': 1, 'Two': 2, 'Three': 3, 'Four': 4, 'Five': 5})
+result = (df['price_clean'].mean(), df['price_clean'].std(), df['category'].value_counts().head(5).to_dict())
+print(json.dumps([peak_memory_mb() - baseline, result]))
+'''
+
+CHUNKED = '''
+import json
+from chunked_analysis import aggregate_file, memory_baseline, peak_memory_mb
+baseline = memory_baseline()
+stats = aggregate_file(PATH, CHUNK_SIZE)
+result = (stats.price_mean, stats.price_std, dict(stats.categories.most_common(5)))
+print(json.dumps([peak_memory_mb() - baseline, result]))
+'''
+
+
+def write_books(path, count):
+    books = list(iter_books(os.path.join(PROJECT_DIR, 'data', 'books_clean.json')))
+    with open(path, 'w', encoding='utf-8') as f:
+        for i in range(count):
+            f.write(json.dumps(books[i % len(books)], ensure_ascii=False) + '\n')
+
+
+def run(code, path, chunk_size=None):
+    code = code.replace('PATH', repr(path)).replace('CHUNK_SIZE', str(chunk_size))
+    start = time.perf_counter()
+    output = subprocess.run([sys.executable, '-c', code], cwd=PROJECT_DIR,
+                            capture_output=True, text=True, check=True).stdout
+    elapsed = time.perf_counter() - start
+    memory, result = json.loads(output)
+    return memory, elapsed, result
+
+
+def main():
+    counts = [int(arg) for arg in sys.argv[1:]] or [50000, 200000]
+    print(f'{"books":>8}  {"analysis":<16} {"peak MB":>8} {"seconds":>8}')
+    with tempfile.TemporaryDirectory() as directory:
+        for count in counts:
+            path = os.path.join(directory, f'books_{count}.jl')
+            write_books(path, count)
+            full = run(FULL, path)
+            rows = [('full DataFrame', full)]
+            for chunk_size in (10000, 50000):
+                chunked = run(CHUNKED, path, chunk_size)
+                # Same numbers either way
+                assert abs(chunked[2][0] - full[2][0]) < 1e-6
+                assert abs(chunked[2][1] - full[2][1]) < 1e-6
+                assert chunked[2][2] == full[2][2]
+                rows.append((f'chunks of {chunk_size}', chunked))
+            for name, (memory, elapsed, _) in rows:
+                print(f'{count:>8}  {name:<16} {memory:>8.1f} {elapsed:>8.2f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,225 @@
+"""Items/sec and item latency: a blocking pipeline vs the asyncio path.
+
+    python benchmarks/bench_asyncio.py [--books N] [--lookup-ms MS ...]
+
+Serves a books.toscrape-like catalogue of N books from a local HTTP server
+with a /lookup endpoint that answers after MS milliseconds, standing in for a
+database insert or an enrichment API. Each path crawls the whole catalogue in
+a fresh process, and every item makes one lookup:
+
+    current  a pipeline that makes the lookup with a blocking call, as
+             MongoDBPipeline does
+    asyncio  a pipeline that awaits the lookup on the crawler's event loop,
+             as AsyncMongoDBPipeline does
+
+Latency is per book, from its detail request being scheduled to the item
+leaving the pipelines.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCRAPER_DIR = os.path.join(PROJECT_DIR, 'scraper')
+BOOKS_PER_PAGE = 20
+RATINGS = ('One', 'Two', 'Three', 'Four', 'Five')
+
+
+# ========== MOCK SITE ==========
+def listing_page(page, books):
+    first = (page - 1) * BOOKS_PER_PAGE
+    links = ''.join(f'<article class="product_pod"><h3><a href="book-{i}.html">Book {i}</a></h3></article>'
+                    for i in range(first, min(first + BOOKS_PER_PAGE, books)))
+    pages = -(-books // BOOKS_PER_PAGE)
+    next_link = f'<li class="next"><a href="page-{page + 1}.html">next</a></li>' if page < pages else ''
+    return f'<html><body>{links}<ul class="pager">{next_link}</ul></body></html>'
+
+
+def book_page(i):
+    return (
+        '<html><body>'
+        '<ul class="breadcrumb"><li><a href="/">Home</a></li>'
+        f'<li><a href="/">Category {i % 10}</a></li><li class="active">Book {i}</li></ul>'
+        f'<div class="item active"><img src="img/{i}.jpg"></div>'
+        f'<h1>Book {i}</h1><p class="price_color">£{10 + i % 50}.{i % 100:02d}</p>'
+        '<p class="instock availability"> In stock </p>'
+        f'<p class="star-rating {RATINGS[i % 5]}"></p>'
+        f'<div id="product_description"><h2>Product Description</h2></div><p>About book {i}.</p>'
+        '</body></html>'
+    )
+
+
+def serve(books, lookup_ms):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.0'
+
+        def do_GET(self):
+            path = self.path.lstrip('/')
+            if path.startswith('lookup'):
+                time.sleep(lookup_ms / 1000)
+                body = b'{"found": true}'
+            elif path.startswith('book-'):
+                body = book_page(int(path[5:-5])).encode('utf-8')
+            elif path.startswith('page-'):
+                body = listing_page(int(path[5:-5]), books).encode('utf-8')
+            else:
+                body = listing_page(1, books).encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/html; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+# ========== PIPELINES ==========
+class BlockingLookupPipeline:
+    def __init__(self, url):
+        self.url = url
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        return cls(crawler.settings['BENCH_LOOKUP_URL'])
+
+    def process_item(self, item, spider):
+        # Blocks the reactor for the whole round trip
+        with urllib.request.urlopen(self.url, timeout=30) as response:
+            response.read()
+        return item
+
+
+class LookupProtocol(asyncio.Protocol):
+    def __init__(self, request):
+        self.request = request
+        self.done = asyncio.get_running_loop().create_future()
+
+    def connection_made(self, transport):
+        transport.write(self.request)
+
+    def data_received(self, data):
+        pass
+
+    def connection_lost(self, exc):
+        if not self.done.done():
+            self.done.set_result(None)
+
+
+class AsyncLookupPipeline(BlockingLookupPipeline):
+    async def process_item(self, item, spider):
+        # A protocol rather than asyncio.open_connection(): the transport holds
+        # it (and the future being awaited) strongly, whereas a StreamReader is
+        # only weakly referenced and Scrapy keeps no reference to the task, so
+        # a pending lookup could be garbage-collected mid-await
+        host, port = self.url.split('/')[2].split(':')
+        request = f'GET /lookup HTTP/1.0\r\nHost: {host}\r\n\r\n'.encode('ascii')
+        loop = asyncio.get_running_loop()
+        _, protocol = await loop.create_connection(lambda: LookupProtocol(request), host, int(port))
+        await protocol.done
+        return item
+
+
+# ========== ONE CRAWL (child process) ==========
+def crawl(path, port):
+    os.chdir(SCRAPER_DIR)
+    sys.path.insert(0, SCRAPER_DIR)
+    from scrapy import signals
+    from scrapy.crawler import CrawlerProcess
+    from scrapy.utils.project import get_project_settings
+
+    from book_scraper.spiders.books_spider import BooksSpider
+
+    pipeline = {'current': BlockingLookupPipeline, 'asyncio': AsyncLookupPipeline}[path]
+    site = f'http://127.0.0.1:{port}'
+    spidercls = type('BenchSpider', (BooksSpider,), {'allowed_domains': ['127.0.0.1'], 'start_urls': [site + '/']})
+
+    settings = get_project_settings()
+    settings.setdict({
+        'BENCH_LOOKUP_URL': site + '/lookup',
+        'ITEM_PIPELINES': {pipeline: 300},
+        'FEEDS': {},
+        'ROBOTSTXT_OBEY': False,
+        'DOWNLOAD_DELAY': 0,
+        'LOG_LEVEL': 'WARNING',
+        'TELNETCONSOLE_ENABLED': False,
+    }, priority='cmdline')
+    process = CrawlerProcess(settings)
+    crawler = process.create_crawler(spidercls)
+
+    scheduled = {}
+    latencies = []
+    times = {}
+
+    def request_scheduled(request, spider):
+        scheduled.setdefault(request.url, time.perf_counter())
+
+    def item_scraped(item, response, spider):
+        now = time.perf_counter()
+        latencies.append(now - scheduled[response.url])
+        times['last_item'] = now
+
+    crawler.signals.connect(request_scheduled, signal=signals.request_scheduled)
+    crawler.signals.connect(item_scraped, signal=signals.item_scraped)
+    crawler.signals.connect(lambda spider: times.setdefault('opened', time.perf_counter()),
+                            signal=signals.spider_opened, weak=False)
+    process.crawl(crawler)
+    process.start()
+
+    elapsed = times['last_item'] - times['opened']
+    latencies.sort()
+    print(json.dumps({
+        'items': len(latencies),
+        'items_per_second': len(latencies) / elapsed,
+        'p50_ms': statistics.median(latencies) * 1000,
+        'p95_ms': latencies[int(len(latencies) * 0.95)] * 1000,
+    }))
+
+
+def run(path, port):
+    output = subprocess.run([sys.executable, os.path.abspath(__file__), '--crawl', path, '--port', str(port)],
+                            capture_output=True, text=True, check=True).stdout
+    return json.loads(output.splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--books', type=int, default=500)
+    parser.add_argument('--lookup-ms', type=float, nargs='+', default=[0, 20])
+    parser.add_argument('--crawl', choices=('current', 'asyncio'), help=argparse.SUPPRESS)
+    parser.add_argument('--port', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.crawl:
+        crawl(args.crawl, args.port)
+        return
+
+    print(f'{"lookup ms":>9}  {"path":<8} {"items":>6} {"items/s":>8} {"p50 ms":>8} {"p95 ms":>8}')
+    for lookup_ms in args.lookup_ms:
+        server = serve(args.books, lookup_ms)
+        try:
+            for path in ('current', 'asyncio'):
+                result = run(path, server.server_address[1])
+                assert result['items'] == args.books, result
+                print(f'{lookup_ms:>9g}  {path:<8} {result["items"]:>6} {result["items_per_second"]:>8.1f} '
+                      f'{result["p50_ms"]:>8.1f} {result["p95_ms"]:>8.1f}')
+        finally:
+            server.shutdown()
+            server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,156 @@
+"""Export CPU cost per item for 1, 2 and 3 sinks.
+
+    python benchmarks/bench_export.py [ITEMS]
+
+Compares the current path, where every consumer converts and encodes the
+item itself (JSON feed with indent=4, CSV feed, MongoDB insert), with
+FanOutExportPipeline, which converts and encodes each item once. MongoDB is
+measured by BSON-encoding the documents, so no server is needed.
+"""
+
+import csv
+import json
+import os
+import sys
+import tempfile
+import time
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(PROJECT_DIR, 'scraper'))
+
+import bson
+from itemadapter import ItemAdapter
+
+from book_scraper.export import CSV_FIELDS, CsvSink, JsonLinesSink, MongoSink, Record, orjson
+from book_scraper.items import BookItem
+
+
+def load_items(count):
+    path = os.path.join(PROJECT_DIR, 'data', 'books_clean.json')
+    with open(path, 'r', encoding='utf-8-sig') as f:
+        books, _ = json.JSONDecoder().raw_decode(f.read())
+    fields = set(BookItem.fields)
+    books = [BookItem({k: v for k, v in book.items() if k in fields}) for book in books]
+    return [books[i % len(books)] for i in range(count)]
+
+
+# ========== CURRENT PATH: every consumer encodes on its own ==========
+class JsonFeedConsumer:
+    def __init__(self, directory):
+        self.file = open(os.path.join(directory, 'feed.json'), 'w', encoding='utf-8')
+
+    def consume(self, item):
+        data = ItemAdapter(item).asdict()
+        self.file.write(json.dumps(data, ensure_ascii=False, indent=4) + ',\n')
+
+    def close(self):
+        self.file.close()
+
+
+class CsvFeedConsumer:
+    def __init__(self, directory):
+        self.file = open(os.path.join(directory, 'feed.csv'), 'w', encoding='utf-8', newline='')
+        self.writer = csv.DictWriter(self.file, fieldnames=CSV_FIELDS)
+
+    def consume(self, item):
+        self.writer.writerow(ItemAdapter(item).asdict())
+
+    def close(self):
+        self.file.close()
+
+
+class MongoConsumer:
+    def __init__(self, directory):
+        pass
+
+    def consume(self, item):
+        # MongoDBPipeline: insert_one(dict(item)) BSON-encodes one document per call
+        bson.encode(dict(item))
+
+    def close(self):
+        pass
+
+
+# ========== FAN-OUT PATH ==========
+class EncodeOnlyCollection:
+    def insert_many(self, documents, ordered=False):
+        for document in documents:
+            bson.encode(document)
+
+
+class BenchMongoSink(MongoSink):
+    def open(self):
+        self.collection = EncodeOnlyCollection()
+
+    def close(self):
+        self.flush()
+
+
+def fanout_sinks(directory, count):
+    sinks = [
+        JsonLinesSink(os.path.join(directory, 'out.jl'), 256 * 1024),
+        CsvSink(os.path.join(directory, 'out.csv'), 256 * 1024, CSV_FIELDS),
+        BenchMongoSink(None, None, 500),
+    ][:count]
+    for sink in sinks:
+        sink.open()
+    return sinks
+
+
+def cpu_per_item_us(items, setup, consume, close):
+    with tempfile.TemporaryDirectory() as directory:
+        state = setup(directory)
+        start = time.process_time()
+        for item in items:
+            consume(state, item)
+        close(state)
+        elapsed = time.process_time() - start
+    return elapsed / len(items) * 1e6
+
+
+def bench_current(items, count):
+    consumers = [JsonFeedConsumer, CsvFeedConsumer, MongoConsumer][:count]
+
+    def consume(state, item):
+        for consumer in state:
+            consumer.consume(item)
+
+    return cpu_per_item_us(
+        items,
+        lambda directory: [cls(directory) for cls in consumers],
+        consume,
+        lambda state: [consumer.close() for consumer in state],
+    )
+
+
+def bench_fanout(items, count):
+    def consume(sinks, item):
+        record = Record(item)
+        for sink in sinks:
+            sink.write(record)
+
+    return cpu_per_item_us(
+        items,
+        lambda directory: fanout_sinks(directory, count),
+        consume,
+        lambda sinks: [sink.close() for sink in sinks],
+    )
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    items = load_items(count)
+    print('⏱  EXPORT BENCHMARK')
+    print('=' * 60)
+    print(f'   • Items: {count:,} | JSON encoder: {"orjson" if orjson else "json"}'.replace(',', ' '))
+    print()
+    print(f'   {"sinks":<22}{"current µs/item":>16}{"fan-out µs/item":>18}{"speedup":>10}')
+    labels = ['json', 'json + csv', 'json + csv + mongo']
+    for count, label in enumerate(labels, 1):
+        current = bench_current(items, count)
+        fanout = bench_fanout(items, count)
+        print(f'   {label:<22}{current:>16.1f}{fanout:>18.1f}{current / fanout:>9.1f}x')
+
+
+if __name__ == '__main__':
+    main()
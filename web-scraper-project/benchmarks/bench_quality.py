@@ -0,0 +1,115 @@
+"""How soon the data-quality monitor catches an extraction regression, and
+what it costs per item.
+
+    python benchmarks/bench_quality.py [--items N]
+
+Takes the books in data/books_clean.json with their two known extraction
+bugs undone (the repeated "In stock" availability and the description
+preceded by a truncated copy of itself), records a baseline profile from
+the first half and streams the other half through the monitor's checks
+(every 100 items, from item 100), once as is and once per injected
+regression, the way QualityMonitorPipeline would see them during a crawl:
+
+    healthy               no change: any alert is a false alarm
+    repeated availability availability as the old selector scraped it
+    doubled description   description as the old selector scraped it
+    missing price         price selector broken: always None
+    constant category     breadcrumb selector off by one: always "Books"
+    rating class          rating left as "star-rating Three"
+
+Then times the profiling of N items (cycling the books) to report the
+overhead per item and shows the profile's size staying constant.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_DIR)
+sys.path.insert(0, os.path.join(PROJECT_DIR, 'scraper'))
+
+from feeds import iter_books
+
+from book_scraper.quality import ItemProfile
+
+MIN_ITEMS = 100
+INTERVAL = 100
+
+
+def repaired(book):
+    book = dict(book)
+    # "In stock (19 available)  In stock  In stock ..." -> "In stock (19 available)"
+    book['availability'] = book['availability'].split('  ')[0]
+    description = book.get('description')
+    if description:
+        # "<first 370 characters> <full description>" -> "<full description>"
+        repeat = description.find(description[:30], 1)
+        if repeat > 0:
+            book['description'] = description[repeat:]
+    return book
+
+
+def regressions(raw):
+    return {
+        'healthy': lambda book: book,
+        'repeated availability': lambda book: dict(book, availability=raw[book['product_url']]['availability']),
+        'doubled description': lambda book: dict(book, description=raw[book['product_url']]['description']),
+        'missing price': lambda book: dict(book, price=None),
+        'constant category': lambda book: dict(book, category='Books'),
+        'rating class': lambda book: dict(book, rating=f'star-rating {book["rating"]}'),
+    }
+
+
+def first_alert(baseline, books):
+    profile = ItemProfile()
+    for book in books:
+        profile.add(book)
+        if profile.items >= MIN_ITEMS and profile.items % INTERVAL == 0:
+            alerts = profile.compare(baseline)
+            if alerts:
+                return profile.items, alerts
+    return None, profile.compare(baseline)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--items', type=int, default=100000)
+    args = parser.parse_args()
+
+    raw = {}
+    for book in iter_books(os.path.join(PROJECT_DIR, 'data', 'books_clean.json')):
+        raw.setdefault(book['product_url'], book)
+    books = [repaired(book) for book in raw.values()]
+    half = len(books) // 2
+
+    baseline = ItemProfile()
+    for book in books[:half]:
+        baseline.add(book)
+    print(f'Baseline: {baseline.items} books; checking {len(books) - half} more every {INTERVAL} items')
+    print()
+    print(f'{"stream":<22} {"alert after":>11}  alerts')
+    for name, change in regressions(raw).items():
+        items, alerts = first_alert(baseline, (change(book) for book in books[half:]))
+        found = ', '.join(f'{alert.field} {alert.check}' for alert in alerts) or '-'
+        print(f'{name:<22} {items or "never":>11}  {found}')
+
+    print()
+    profile = ItemProfile()
+    sizes = {}
+    start = time.perf_counter()
+    for i in range(args.items):
+        profile.add(books[i % len(books)])
+        if profile.items % INTERVAL == 0:
+            profile.compare(baseline)
+        if profile.items in (1000, args.items):
+            sizes[profile.items] = len(json.dumps(profile.to_dict()))
+    elapsed = time.perf_counter() - start
+    print(f'Profiling {args.items} items: {elapsed / args.items * 1e6:.1f} us per item (checks included)')
+    print('Profile size: ' + ', '.join(f'{size} bytes after {items} items' for items, size in sizes.items()))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+"""Cold-start benchmark for the bookscraper CLI.
+
+    python benchmarks/bench_startup.py
+
+Measures the import cost of bookscraper.py (via `python -X importtime`) and
+the wall-clock time of quick commands against a bare interpreter. Exits
+non-zero if the CLI pulls in a heavy dependency at startup or goes over the
+time budget.
+"""
+
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ('pandas', 'matplotlib', 'seaborn', 'scrapy', 'twisted', 'pymongo')
+IMPORT_BUDGET_MS = 30
+COMMAND_BUDGET_MS = 50
+RUNS = 10
+
+
+def run(args):
+    return subprocess.run(args, cwd=PROJECT_DIR, capture_output=True, text=True)
+
+
+def wall_time_ms(args):
+    timings = []
+    for _ in range(RUNS):
+        start = time.perf_counter()
+        run(args)
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def import_time_ms():
+    result = run([sys.executable, '-X', 'importtime', '-c', 'import bookscraper'])
+    for line in result.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        parts = [part.strip() for part in line.split('|')]
+        if len(parts) == 3 and parts[2] == 'bookscraper':
+            return int(parts[1]) / 1000
+    raise RuntimeError(result.stderr)
+
+
+def heavy_imports():
+    code = 'import sys, bookscraper; print(" ".join(sys.modules))'
+    loaded = set(run([sys.executable, '-c', code]).stdout.split())
+    return sorted(name for name in HEAVY_MODULES if name in loaded)
+
+
+def sample_file(directory, count=100):
+    # Small feed so the stats timing measures startup rather than parsing
+    path = os.path.join(directory, 'books.json')
+    books = [{'title': f'Book {i}', 'price': f'£{10 + i % 50}.99', 'category': f'Category {i % 10}'}
+             for i in range(count)]
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(books, f)
+    return path
+
+
+def main():
+    print('⏱  BOOKSCRAPER STARTUP BENCHMARK')
+    print('=' * 50)
+    ok = True
+
+    heavy = heavy_imports()
+    if heavy:
+        print(f'❌ Heavy modules imported at startup: {", ".join(heavy)}')
+        ok = False
+    else:
+        print('✅ No heavy modules imported at startup')
+
+    import_ms = import_time_ms()
+    ok &= import_ms <= IMPORT_BUDGET_MS
+    print(f'   • import bookscraper: {import_ms:.1f} ms (budget {IMPORT_BUDGET_MS} ms)')
+
+    baseline = wall_time_ms([sys.executable, '-c', 'pass'])
+    print(f'   • bare interpreter: {baseline:.1f} ms')
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for command in (['--help'], ['stats', sample_file(tmpdir)]):
+            elapsed = wall_time_ms([sys.executable, 'bookscraper.py', *command]) - baseline
+            ok &= elapsed <= COMMAND_BUDGET_MS
+            print(f'   • bookscraper {command[0]}: +{elapsed:.1f} ms (budget {COMMAND_BUDGET_MS} ms)')
+
+    print('✅ Within budget' if ok else '❌ Over budget')
+    return 0 if ok else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,144 @@
+"""bookscraper - one entry point for the whole project.
+
+    python bookscraper.py crawl [spider] [-o FILE] [-a NAME=VALUE ...] [-s KEY=VALUE ...]
+    python bookscraper.py analyze
+    python bookscraper.py charts
+    python bookscraper.py stats [FILE]
+
+Only the standard library is imported at startup. Scrapy, pandas and
+matplotlib are imported inside the subcommands that use them, so quick
+commands like `stats` start in tens of milliseconds.
+"""
+
+import argparse
+import os
+import re
+import sys
+
+from feeds import iter_books
+
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+SCRAPER_DIR = os.path.join(PROJECT_DIR, 'scraper')
+DEFAULT_DATA = os.path.join('data', 'books.json')
+PRICE_PATTERN = re.compile(r'([\d\.]+)')
+# Spider close reasons that mean the crawl did its job
+SUCCESS_REASONS = ('finished', 'precision_reached')
+
+
+def crawl(spider='books', output=None, settings=(), spider_args=()):
+    """Run a spider in this process (no `scrapy` subprocess)."""
+    from scrapy.crawler import CrawlerProcess
+    from scrapy.utils.project import get_project_settings
+
+    output = os.path.abspath(output) if output else None
+    cwd = os.getcwd()
+    # Project settings use paths relative to the scraper directory
+    os.chdir(SCRAPER_DIR)
+    sys.path.insert(0, SCRAPER_DIR)
+    try:
+        project_settings = get_project_settings()
+        for setting in settings:
+            key, _, value = setting.partition('=')
+            project_settings.set(key, value, priority='cmdline')
+        if output:
+            project_settings.set('FEEDS', {output: {'format': _feed_format(output)}}, priority='cmdline')
+
+        process = CrawlerProcess(project_settings)
+        crawler = process.create_crawler(spider)
+        process.crawl(crawler, **dict(arg.partition('=')[::2] for arg in spider_args))
+        process.start()
+        # A sampled crawl (-a sample=1) stops early once precise enough
+        return crawler.stats.get_value('finish_reason') in SUCCESS_REASONS
+    finally:
+        os.chdir(cwd)
+
+
+def _feed_format(path):
+    extension = os.path.splitext(path)[1].lstrip('.').lower()
+    return {'jl': 'jsonlines', 'jsonl': 'jsonlines'}.get(extension, extension or 'json')
+
+
+def cmd_crawl(args):
+    print('🚀 Running Scrapy spider...')
+    if crawl(args.spider, args.output, args.set, args.arg):
+        print('✅ Scraping completed successfully!')
+    else:
+        print('❌ Scraping failed!')
+        return 1
+    return 0
+
+
+def cmd_analyze(args):
+    from analyze_complete import analyze_scraped_data
+    analyze_scraped_data()
+    return 0
+
+
+def cmd_charts(args):
+    sys.path.insert(0, os.path.join(PROJECT_DIR, 'visualization'))
+    from charts import create_charts
+    create_charts()
+    return 0
+
+
+def cmd_stats(args):
+    if not os.path.exists(args.file):
+        print(f'❌ Data file not found: {args.file}')
+        return 1
+
+    total = 0
+    categories = set()
+    priced = 0
+    price_sum = 0.0
+    for book in iter_books(args.file):
+        total += 1
+        categories.add(book.get('category'))
+        match = PRICE_PATTERN.search(str(book.get('price')))
+        if match:
+            try:
+                price_sum += float(match.group(1))
+                priced += 1
+            except ValueError:
+                pass
+    categories.discard(None)
+
+    print(f'📁 {args.file}')
+    print(f'   • Total Books: {total:,}'.replace(',', ' '))
+    print(f'   • Unique Categories: {len(categories)}')
+    if priced:
+        print(f'   • Average Price: £{price_sum / priced:.2f}')
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='bookscraper', description='Book scraper project commands')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    crawl_parser = subparsers.add_parser('crawl', help='run a spider in-process')
+    crawl_parser.add_argument('spider', nargs='?', default='books')
+    crawl_parser.add_argument('-o', '--output', help='feed file (.json, .jl, .csv)')
+    crawl_parser.add_argument('-a', '--arg', action='append', default=[], metavar='NAME=VALUE',
+                              help='spider argument, e.g. sample=1 (may be repeated)')
+    crawl_parser.add_argument('-s', '--set', action='append', default=[], metavar='KEY=VALUE',
+                              help='override a Scrapy setting (may be repeated)')
+    crawl_parser.set_defaults(func=cmd_crawl)
+
+    analyze_parser = subparsers.add_parser('analyze', help='full pandas analysis report')
+    analyze_parser.set_defaults(func=cmd_analyze)
+
+    charts_parser = subparsers.add_parser('charts', help='render charts and the HTML dashboard')
+    charts_parser.set_defaults(func=cmd_charts)
+
+    stats_parser = subparsers.add_parser('stats', help='quick counts without pandas')
+    stats_parser.add_argument('file', nargs='?', default=DEFAULT_DATA)
+    stats_parser.set_defaults(func=cmd_stats)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,300 @@
+"""Chunked, memory-bounded analysis of crawl output.
+
+Books are streamed from the feed files (JSON, appended JSON arrays or JSON
+Lines) in chunks of CHUNK_SIZE. Each chunk becomes a small DataFrame with
+categorical / downcast columns (the long text fields are reduced to "is
+present" flags) and is folded into a BookAggregate: counts, sums, min/max,
+an exact per-penny price histogram and category / rating counters.
+Aggregates merge, so several files (e.g. months of daily crawls) are
+summarised one at a time and combined at the end. Memory use depends on the
+chunk size and the number of distinct prices and categories, not on the
+number of books.
+
+The quantiles and the mode are exact, not approximations: they are read
+off the histogram, which has one entry per distinct price in pence.
+
+    python chunked_analysis.py data/books_2024-*.jl --chunk-size 20000
+"""
+
+import argparse
+import csv
+import math
+import os
+import re
+import sys
+from collections import Counter
+
+from feeds import iter_books
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+CHUNK_SIZE = 10000
+PRICE_PATTERN = re.compile(r'([\d\.]+)')
+RATING_MAP = {'One': 1, 'Two': 2, 'Three': 3, 'Four': 4, 'Five': 5}
+SAMPLE_SIZE = 5
+
+
+def iter_chunks(path, chunk_size=CHUNK_SIZE):
+    chunk = []
+    for book in iter_books(path):
+        chunk.append(book)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def to_frame(books):
+    """Compact DataFrame for one chunk: no long text columns kept."""
+    import pandas as pd
+
+    raw = pd.DataFrame.from_records(books, columns=['price', 'rating', 'category', 'image_url', 'description'])
+    price = pd.to_numeric(raw['price'].astype(str).str.extract(PRICE_PATTERN)[0], errors='coerce')
+    return pd.DataFrame({
+        # Whole pence: exact sums and a small integer dtype
+        'price_pence': (price * 100).round().astype('Int32'),
+        'rating': raw['rating'].map(RATING_MAP).astype('Int8'),
+        'category': raw['category'].astype('category'),
+        'has_image': raw['image_url'].notna(),
+        'has_description': raw['description'].notna(),
+    })
+
+
+class BookAggregate:
+    """Mergeable partial aggregate over any number of books."""
+
+    def __init__(self):
+        self.total = 0
+        self.with_images = 0
+        self.with_descriptions = 0
+        self.priced = 0
+        self.price_mean = 0.0
+        self.price_m2 = 0.0
+        self.price_min = math.inf
+        self.price_max = -math.inf
+        self.bands = Counter()
+        # Books per price in pence; quantiles and the mode are exact from it
+        self.price_histogram = Counter()
+        self.categories = Counter()
+        self.ratings = Counter()
+        self.sample = []
+
+    def update(self, books):
+        frame = to_frame(books)
+        self.total += len(frame)
+        self.with_images += int(frame['has_image'].sum())
+        self.with_descriptions += int(frame['has_description'].sum())
+        if len(self.sample) < SAMPLE_SIZE:
+            for book in books[:SAMPLE_SIZE - len(self.sample)]:
+                self.sample.append({key: book.get(key) for key in ('title', 'price', 'category', 'rating')})
+
+        price = frame['price_pence'].dropna().astype('int64')
+        if len(price):
+            self.price_histogram.update(price.value_counts().to_dict())
+            price = price / 100
+            partial = BookAggregate()
+            partial.priced = len(price)
+            partial.price_mean = float(price.mean())
+            partial.price_m2 = float(((price - partial.price_mean) ** 2).sum())
+            partial.price_min = float(price.min())
+            partial.price_max = float(price.max())
+            self._merge_prices(partial)
+            self.bands['cheap'] += int((price < 20).sum())
+            self.bands['medium'] += int(((price >= 20) & (price < 50)).sum())
+            self.bands['expensive'] += int((price >= 50).sum())
+
+        self.categories.update(frame['category'].value_counts(sort=False).to_dict())
+        self.ratings.update({int(rating): int(count)
+                             for rating, count in frame['rating'].value_counts().items()})
+        return self
+
+    def _merge_prices(self, other):
+        # Chan et al. parallel variance: combine (count, mean, M2) pairs
+        if not other.priced:
+            return
+        count = self.priced + other.priced
+        delta = other.price_mean - self.price_mean
+        self.price_mean += delta * other.priced / count
+        self.price_m2 += other.price_m2 + delta ** 2 * self.priced * other.priced / count
+        self.priced = count
+        self.price_min = min(self.price_min, other.price_min)
+        self.price_max = max(self.price_max, other.price_max)
+
+    def merge(self, other):
+        self.total += other.total
+        self.with_images += other.with_images
+        self.with_descriptions += other.with_descriptions
+        self._merge_prices(other)
+        self.bands.update(other.bands)
+        self.price_histogram.update(other.price_histogram)
+        self.categories.update(other.categories)
+        self.ratings.update(other.ratings)
+        self.sample.extend(other.sample[:SAMPLE_SIZE - len(self.sample)])
+        return self
+
+    @property
+    def price_std(self):
+        # Sample standard deviation, as pandas' describe()
+        return math.sqrt(self.price_m2 / (self.priced - 1)) if self.priced > 1 else math.nan
+
+    def price_mode(self):
+        # Smallest of the most common prices, as pandas' mode()[0]
+        if not self.price_histogram:
+            return math.nan
+        top = max(self.price_histogram.values())
+        return min(pence for pence, count in self.price_histogram.items() if count == top) / 100
+
+    def price_quantile(self, q):
+        """Exact quantile (lower value, no interpolation) from the price histogram."""
+        if not self.priced:
+            return math.nan
+        rank = q * (self.priced - 1)
+        seen = 0
+        for pence in sorted(self.price_histogram):
+            seen += self.price_histogram[pence]
+            if seen > rank:
+                return pence / 100
+        return self.price_max
+
+
+def write_csv_chunk(writer, books):
+    # The full export with the derived columns analyze_complete.py adds
+    for book in books:
+        match = PRICE_PATTERN.search(str(book.get('price')))
+        try:
+            price = float(match.group(1)) if match else ''
+        except ValueError:
+            price = ''
+        writer.writerow(dict(book, price_clean=price, rating_numeric=RATING_MAP.get(book.get('rating'), '')))
+
+
+def aggregate_file(path, chunk_size=CHUNK_SIZE, csv_path=None):
+    """Aggregate one file; with csv_path, also export it chunk by chunk."""
+    aggregate = BookAggregate()
+    csv_file = writer = None
+    try:
+        for books in iter_chunks(path, chunk_size):
+            aggregate.update(books)
+            if csv_path:
+                if writer is None:
+                    fields = list(books[0].keys()) + ['price_clean', 'rating_numeric']
+                    csv_file = open(csv_path, 'w', encoding='utf-8', newline='')
+                    writer = csv.DictWriter(csv_file, fieldnames=fields, extrasaction='ignore', lineterminator='\n')
+                    writer.writeheader()
+                write_csv_chunk(writer, books)
+            # Release this chunk before the next one is read
+            del books
+    finally:
+        if csv_file:
+            csv_file.close()
+    return aggregate
+
+
+def aggregate_files(paths, chunk_size=CHUNK_SIZE):
+    total = BookAggregate()
+    for path in paths:
+        total.merge(aggregate_file(path, chunk_size))
+    return total
+
+
+def peak_memory_mb():
+    """Peak resident memory of this process so far (None if unavailable)."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def memory_baseline():
+    # Peak memory before the analysis, with pandas already loaded so its
+    # import isn't counted as analysis memory
+    import pandas  # noqa: F401
+    return peak_memory_mb()
+
+
+def print_report(aggregate, top=5):
+    total = aggregate.total
+    print('📈 BASIC STATISTICS:')
+    print('-' * 40)
+    print(f'   • Total Books: {total:,}'.replace(',', ' '))
+    print(f'   • Unique Categories: {len(aggregate.categories)}')
+    print(f'   • Books with Images: {aggregate.with_images}')
+    print(f'   • Books with Descriptions: {aggregate.with_descriptions}')
+
+    print()
+    print('💰 PRICE ANALYSIS:')
+    print('-' * 40)
+    print(f'   • Average Price: £{aggregate.price_mean:.2f}')
+    print(f'   • Most Expensive: £{aggregate.price_max:.2f}')
+    print(f'   • Least Expensive: £{aggregate.price_min:.2f}')
+    print(f'   • Price Range: £{aggregate.price_min:.2f} - £{aggregate.price_max:.2f}')
+    print(f'   • Standard Deviation: £{aggregate.price_std:.2f}')
+    print(f'   • Cheap (<£20): {aggregate.bands["cheap"]} books')
+    print(f'   • Medium (£20-£50): {aggregate.bands["medium"]} books')
+    print(f'   • Expensive (≥£50): {aggregate.bands["expensive"]} books')
+
+    print()
+    print('📚 CATEGORY ANALYSIS:')
+    print('-' * 40)
+    print(f'   • Top {top} Categories:')
+    for i, (category, count) in enumerate(aggregate.categories.most_common(top), 1):
+        percentage = (count / total) * 100
+        print(f'     {i}. {category}: {count} books ({percentage:.1f}%)')
+
+    print()
+    print('⭐ RATING ANALYSIS:')
+    print('-' * 40)
+    for rating in range(1, 6):
+        count = aggregate.ratings.get(rating, 0)
+        percentage = (count / total) * 100
+        stars = '★' * rating + '☆' * (5 - rating)
+        print(f'   • {stars} ({rating}/5): {count} books ({percentage:.1f}%)')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Memory-bounded analysis of one or more crawl outputs')
+    parser.add_argument('files', nargs='*', default=['data/books.json'])
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE,
+                        help='books per chunk (default: %(default)s)')
+    args = parser.parse_args()
+
+    missing = [path for path in args.files if not os.path.exists(path)]
+    if missing:
+        print(f'❌ Data file not found: {", ".join(missing)}')
+        return 1
+
+    baseline = memory_baseline()
+    aggregate = aggregate_files(args.files, args.chunk_size)
+    if not aggregate.total:
+        print('❌ No books found!')
+        return 1
+
+    print('📊 WEB SCRAPER PROJECT - CHUNKED ANALYSIS')
+    print('=' * 60)
+    print(f'📁 Analyzing: {", ".join(args.files)}')
+    print()
+    print_report(aggregate)
+
+    print()
+    print('📐 PRICE QUANTILES:')
+    print('-' * 40)
+    print(f'   • 25% / 50% / 75%: £{aggregate.price_quantile(0.25):.2f} / '
+          f'£{aggregate.price_quantile(0.5):.2f} / £{aggregate.price_quantile(0.75):.2f}')
+    print(f'   • Most Common Price: £{aggregate.price_mode():.2f}')
+
+    peak = peak_memory_mb()
+    if peak is not None:
+        print()
+        chunk_size = f'{args.chunk_size:,}'.replace(',', ' ')
+        print(f'🧠 Peak memory: {peak:.1f} MB ({peak - baseline:.1f} MB for the analysis, '
+              f'chunks of {chunk_size} books)')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
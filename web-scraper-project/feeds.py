@@ -0,0 +1,66 @@
+"""Reading crawl output feeds.
+
+Shared by bookscraper.py, warehouse.py, chunked_analysis.py and the live
+dashboard. Only the standard library is imported.
+"""
+
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def iter_books(path, block_size=1 << 20):
+    """Yield books one by one from a crawl feed without reading the whole file.
+
+    Handles JSON Lines (.jl / .jsonl), a JSON array, and several JSON arrays
+    one after the other (what re-running a crawl into the same feed leaves).
+    Records that don't decode (e.g. the last one of a crawl that was killed
+    mid-write) are skipped with a warning.
+    """
+    if path.endswith(('.jl', '.jsonl')):
+        with open(path, 'r', encoding='utf-8-sig', errors='ignore') as f:
+            for number, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    yield json.loads(line)
+                except ValueError as e:
+                    logger.warning('Skipping malformed record on line %d of %s: %s', number, path, e)
+        return
+
+    # Decode the objects one at a time from a rolling buffer
+    decoder = json.JSONDecoder()
+    with open(path, 'r', encoding='utf-8-sig', errors='ignore') as f:
+        buffer = f.read(block_size)
+        pos = 0
+        eof = not buffer
+        while True:
+            while pos < len(buffer) and buffer[pos] in ' \t\r\n,[]':
+                pos += 1
+            if pos == len(buffer):
+                if eof:
+                    return
+                buffer, pos = f.read(block_size), 0
+                eof = not buffer
+                continue
+            try:
+                book, pos = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError as e:
+                # Feeds start every record on a new line and json never puts
+                # a raw newline inside a string, so a later '\n{' means this
+                # record is all in the buffer and is broken
+                next_record = buffer.find('\n{', pos)
+                if next_record != -1 or eof:
+                    logger.warning('Skipping malformed record in %s: %s', path, e.msg)
+                    if next_record == -1:
+                        return
+                    pos = next_record + 1
+                    continue
+                # The record runs past the buffer: at least double what is
+                # kept, so a long record is only decoded a few times
+                more = f.read(max(block_size, len(buffer) - pos))
+                eof = not more
+                buffer, pos = buffer[pos:] + more, 0
+                continue
+            yield book
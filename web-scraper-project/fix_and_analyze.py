@@ -1,9 +1,10 @@
 ﻿import json
-import pandas as pd
 import os
 import re
 
 def fix_and_analyze_json():
+    import pandas as pd
+    
     print('🔧 FIXING JSON & ANALYZING DATA')
     print('=' * 60)
     
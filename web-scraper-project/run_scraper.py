@@ -1,24 +1,15 @@
-﻿import os
-import subprocess
-import json
-import pandas as pd
+﻿import json
+
+from bookscraper import crawl
 
 def main():
     print('🚀 Starting Web Scraper Project')
     print('=' * 50)
     
-    # Run the scraper from the correct directory
+    # Run the scraper in this process instead of a `scrapy` subprocess
     print('1. Running Scrapy spider...')
     
-    # The scrapy.cfg file is inside the 'scraper' directory.
-    result = subprocess.run(
-        ['scrapy', 'crawl', 'books', '-o', '../data/books.json'],
-        capture_output=True,
-        text=True,
-        cwd='scraper'  # Run command from the 'scraper' folder
-    )
-    
-    if result.returncode == 0:
+    if crawl('books', 'data/books.json'):
         print('✅ Scraping completed successfully!')
         
         # Load and display data
@@ -27,6 +18,7 @@ def main():
             with open('data/books.json', 'r', encoding='utf-8') as f:
                 books = json.load(f)
             
+            import pandas as pd
             df = pd.DataFrame(books)
             print(f'📊 Total books scraped: {len(df)}')
             
@@ -41,8 +33,7 @@ def main():
         except Exception as e:
             print(f'❌ Error loading data: {e}')
     else:
-        print('❌ Scraping failed!')
-        print(f'Error output:\n{result.stderr}')
+        print('❌ Scraping failed! See the Scrapy log above for details.')
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,416 @@
+# Crash-safe, resumable crawls.
+#
+# Enable with:
+#     scrapy crawl books -s CHECKPOINT_DIR=../data/crawl_state
+#
+# Run the same command again after a crash (or Ctrl-C) and the crawl picks up
+# from the last checkpoint instead of starting over from start_urls. Requests
+# that may succeed another time (download errors after retries, 5xx / 429
+# responses) stay pending: they are fetched again on resume, and the crawl
+# is not marked complete while any remain. Requests that can't (offsite or
+# robots.txt drops, duplicates, other HTTP errors, callback exceptions) count
+# as done. Running it again once the crawl has finished only reports that.
+
+import json
+import os
+import pickle
+
+from itemadapter import ItemAdapter
+from scrapy import Request, signals
+from scrapy.exceptions import IgnoreRequest, NotConfigured
+from scrapy.utils.request import request_from_dict
+from twisted.internet import task
+
+FINGERPRINT_SIZE = 20
+
+# Sent by CheckpointFailureMiddleware for a request that will get no response
+request_failed = object()
+
+
+def fsync_dir(path):
+    # Make renames inside `path` durable (no-op where directories can't be opened)
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def atomic_write(path, data):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    fsync_dir(os.path.dirname(path) or '.')
+
+
+class CheckpointStore:
+    """On-disk crawl state.
+
+    Layout of the checkpoint directory:
+        manifest.pickle   pending requests, committed segments, done count,
+                          whether the crawl completed
+        done.bin          fingerprints of completed requests (20 bytes each)
+        segments/         committed JSON Lines feed segments
+
+    The manifest is the commit point: anything on disk that it does not
+    reference (orphan segments, trailing fingerprints) is discarded on load.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.segments_dir = os.path.join(path, 'segments')
+        self.manifest_path = os.path.join(path, 'manifest.pickle')
+        self.done_path = os.path.join(path, 'done.bin')
+        os.makedirs(self.segments_dir, exist_ok=True)
+        # A manifest can be written before any request is done
+        if not os.path.exists(self.done_path):
+            open(self.done_path, 'wb').close()
+
+        self.segments = []
+        self.pending = {}
+        self.done = set()
+        self.done_count = 0
+        self.completed = False
+        self.resuming = os.path.exists(self.manifest_path)
+        if self.resuming:
+            self._load()
+
+    def _load(self):
+        with open(self.manifest_path, 'rb') as f:
+            manifest = pickle.load(f)
+        self.segments = manifest['segments']
+        self.pending = manifest['pending']
+        self.completed = manifest.get('completed', False)
+
+        self.done_count = manifest['done_count']
+        done_size = self.done_count * FINGERPRINT_SIZE
+        with open(self.done_path, 'r+b') as f:
+            f.truncate(done_size)
+            data = f.read()
+        self.done = {data[i:i + FINGERPRINT_SIZE] for i in range(0, len(data), FINGERPRINT_SIZE)}
+
+        for name in os.listdir(self.segments_dir):
+            if name not in self.segments:
+                os.remove(os.path.join(self.segments_dir, name))
+
+    def commit(self, lines, done_fps, pending):
+        if lines:
+            name = f'items-{len(self.segments) + 1:05d}.jl'
+            atomic_write(os.path.join(self.segments_dir, name), b''.join(lines))
+            self.segments.append(name)
+
+        with open(self.done_path, 'ab') as f:
+            f.write(b''.join(done_fps))
+            f.flush()
+            os.fsync(f.fileno())
+        self.done_count += len(done_fps)
+        self.pending = pending
+        self._write_manifest()
+
+    def mark_completed(self):
+        self.completed = True
+        self._write_manifest()
+
+    def _write_manifest(self):
+        manifest = {
+            'segments': self.segments,
+            'pending': self.pending,
+            'done_count': self.done_count,
+            'completed': self.completed,
+        }
+        atomic_write(self.manifest_path, pickle.dumps(manifest, protocol=pickle.HIGHEST_PROTOCOL))
+
+    def iter_items(self):
+        for name in self.segments:
+            with open(os.path.join(self.segments_dir, name), 'r', encoding='utf-8') as f:
+                for line in f:
+                    yield json.loads(line)
+
+
+def iter_checkpoint_items(path):
+    """Yield every committed item from a checkpoint directory."""
+    yield from CheckpointStore(path).iter_items()
+
+
+class CheckpointMiddleware:
+    """Spider middleware that checkpoints the crawl frontier and its items.
+
+    A request is only marked done once its callback has finished and every
+    item it produced has left the item pipelines. Its items are held back
+    until then. Its follow-up requests go to the scheduler straight away but
+    only join the checkpointed pending requests at that point, together with
+    the parent's completion. So each checkpoint is a consistent cut:
+    restarting never loses or duplicates items and never re-downloads a
+    completed page. A parent that was not yet done is fetched again and
+    re-yields its follow-ups, and the ones already done are skipped.
+    """
+
+    def __init__(self, crawler, path, interval):
+        self.crawler = crawler
+        self.stats = crawler.stats
+        self.retry_http_codes = set(crawler.settings.getlist('RETRY_HTTP_CODES', []))
+        self.store = CheckpointStore(path)
+        self.interval = interval
+        self.pending = dict(self.store.pending)
+        # Every completed fingerprint, including ones not yet committed
+        self.done = self.store.done
+
+        # Per-request state while a response is being processed
+        self.inflight_items = {}
+        self.held_items = {}
+        self.held_requests = {}
+        self.parsed = set()
+        # Finished without success this run; they stay pending
+        self.failed = set()
+
+        # Completed since the last checkpoint
+        self.lines = []
+        self.done_fps = []
+        self.loop = None
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        path = crawler.settings.get('CHECKPOINT_DIR')
+        if not path:
+            raise NotConfigured
+        mw = cls(crawler, path, crawler.settings.getfloat('CHECKPOINT_INTERVAL', 30))
+        crawler.signals.connect(mw.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(mw.spider_closed, signal=signals.spider_closed)
+        crawler.signals.connect(mw.item_scraped, signal=signals.item_scraped)
+        crawler.signals.connect(mw.item_finished, signal=signals.item_dropped)
+        crawler.signals.connect(mw.item_finished, signal=signals.item_error)
+        crawler.signals.connect(mw.request_dropped, signal=signals.request_dropped)
+        crawler.signals.connect(mw.request_failed, signal=request_failed)
+        return mw
+
+    def fingerprint(self, request):
+        return self.crawler.request_fingerprinter.fingerprint(request)
+
+    def _track(self, request):
+        fp = self.fingerprint(request)
+        if fp in self.done:
+            self.stats.inc_value('checkpoint/skipped_done')
+            return None, None
+        request.meta['checkpoint_fp'] = fp
+        return fp, request
+
+    async def process_start(self, start):
+        spider = self.crawler.spider
+        if self.store.completed:
+            spider.logger.warning(
+                'The crawl checkpointed in %s already completed (%d requests done); '
+                'nothing to resume. Remove the directory to crawl again.',
+                self.store.path, len(self.done),
+            )
+            self.stats.set_value('checkpoint/already_completed', True)
+            return
+        if self.store.resuming:
+            spider.logger.info(
+                'Resuming crawl: %d pending requests, %d done, %d segments',
+                len(self.pending), len(self.done), len(self.store.segments),
+            )
+            for fp, request_dict in self.pending.items():
+                request = request_from_dict(request_dict, spider=spider)
+                request.meta['checkpoint_fp'] = fp
+                self.stats.inc_value('checkpoint/resumed_requests')
+                yield request
+            return
+
+        async for item_or_request in start:
+            if isinstance(item_or_request, Request):
+                fp, request = self._track(item_or_request)
+                if request is None:
+                    continue
+                self.pending[fp] = request.to_dict(spider=spider)
+            yield item_or_request
+
+    def process_spider_output(self, response, result, spider):
+        parent_fp = response.meta.get('checkpoint_fp')
+        if parent_fp is None or parent_fp in self.done:
+            yield from result
+            return
+
+        self.inflight_items.setdefault(parent_fp, 0)
+        for obj in result:
+            obj = self._hold(parent_fp, obj)
+            if obj is not None:
+                yield obj
+
+        self.parsed.add(parent_fp)
+        self._maybe_complete(parent_fp, spider)
+
+    async def process_spider_output_async(self, response, result, spider):
+        # Same for async callbacks, so Scrapy doesn't have to collect their
+        # output into a list before passing it to process_spider_output
+        parent_fp = response.meta.get('checkpoint_fp')
+        if parent_fp is None or parent_fp in self.done:
+            async for obj in result:
+                yield obj
+            return
+
+        self.inflight_items.setdefault(parent_fp, 0)
+        async for obj in result:
+            obj = self._hold(parent_fp, obj)
+            if obj is not None:
+                yield obj
+
+        self.parsed.add(parent_fp)
+        self._maybe_complete(parent_fp, spider)
+
+    def _hold(self, parent_fp, obj):
+        # Requests wait in held_requests and items are counted until the
+        # response that produced them is complete
+        if isinstance(obj, Request):
+            fp, request = self._track(obj)
+            if request is None:
+                return None
+            # The first of several same-fingerprint requests is the one the
+            # scheduler keeps; the others are dropped as duplicates
+            self.held_requests.setdefault(parent_fp, {}).setdefault(fp, request)
+            return request
+        self.inflight_items[parent_fp] += 1
+        return obj
+
+    def process_spider_exception(self, response, exception, spider):
+        # The callback raised, or the response was rejected (HttpError): the
+        # request is finished with whatever it produced before that, except
+        # after a server error, which may not happen next time
+        fp = response.meta.get('checkpoint_fp')
+        if fp is not None:
+            self._finish_failed(fp, spider, final=response.status not in self.retry_http_codes)
+        return None
+
+    def request_failed(self, request, exception, spider):
+        # Offsite / robots.txt drops are final, download errors are not
+        self._finish_failed(request.meta['checkpoint_fp'], spider, final=isinstance(exception, IgnoreRequest))
+
+    def request_dropped(self, request, spider):
+        fp = request.meta.get('checkpoint_fp')
+        if fp is None:
+            return
+        if self.fingerprint(request) != fp:
+            # A redirect (or other follow-up carrying the original request's
+            # meta) to a page already seen: the original request ends here
+            self._finish_failed(fp, spider, final=True)
+            return
+        # A duplicate: the request with the same fingerprint that did get
+        # scheduled is tracked instead, unless this is the object being held
+        for held in self.held_requests.values():
+            if held.get(fp) is request:
+                del held[fp]
+                break
+
+    def _finish_failed(self, fp, spider, final):
+        if fp in self.done:
+            return
+        self.stats.inc_value('checkpoint/failed_requests')
+        if not final:
+            self.failed.add(fp)
+        self.inflight_items.setdefault(fp, 0)
+        self.parsed.add(fp)
+        self._maybe_complete(fp, spider)
+
+    def item_scraped(self, item, response, spider):
+        fp = response_fingerprint(response)
+        line = (json.dumps(ItemAdapter(item).asdict(), ensure_ascii=False) + '\n').encode('utf-8')
+        if fp is None:
+            # From the start requests (no response) or an errback: not tied to
+            # a tracked request, committed with the next checkpoint
+            self.lines.append(line)
+            return
+        self.held_items.setdefault(fp, []).append(line)
+        self.item_finished(item, response, spider)
+
+    def item_finished(self, item, response, spider, *args, **kwargs):
+        fp = response_fingerprint(response)
+        if fp not in self.inflight_items:
+            return
+        self.inflight_items[fp] -= 1
+        self._maybe_complete(fp, spider)
+
+    def _maybe_complete(self, fp, spider):
+        if fp not in self.parsed or self.inflight_items.get(fp):
+            return
+        self.parsed.discard(fp)
+        self.inflight_items.pop(fp, None)
+        items = self.held_items.pop(fp, ())
+        for child_fp, request in self.held_requests.pop(fp, {}).items():
+            if child_fp not in self.done:
+                self.pending[child_fp] = request.to_dict(spider=spider)
+        if fp in self.failed:
+            # Stays pending; its items come again when it is fetched again
+            self.stats.inc_value('checkpoint/kept_pending')
+            return
+        self.lines.extend(items)
+        self.pending.pop(fp, None)
+        self.done.add(fp)
+        self.done_fps.append(fp)
+
+    def checkpoint(self):
+        if not self.done_fps and not self.lines:
+            return
+        self.stats.inc_value('checkpoint/items', len(self.lines))
+        self.store.commit(self.lines, self.done_fps, dict(self.pending))
+        self.lines = []
+        self.done_fps = []
+        self.stats.inc_value('checkpoint/count')
+
+    def spider_opened(self, spider):
+        self.loop = task.LoopingCall(self.checkpoint)
+        self.loop.start(self.interval, now=False)
+
+    def spider_closed(self, spider, reason):
+        if self.loop and self.loop.running:
+            self.loop.stop()
+        self.checkpoint()
+        if reason == 'finished' and not self.pending and not self.store.completed:
+            self.store.mark_completed()
+            spider.logger.info('Crawl completed; checkpoint in %s marked as complete', self.store.path)
+            return
+        failed = self.failed & self.pending.keys()
+        if failed:
+            spider.logger.warning('%d failed requests stay pending in %s; run the crawl again to retry them',
+                                  len(failed), self.store.path)
+        spider.logger.info(
+            'Checkpoint saved to %s (%d pending requests)', self.store.path, len(self.pending)
+        )
+
+
+def response_fingerprint(response):
+    # None for items from the start requests (no response) or from an errback
+    # (a Failure), and for responses of untracked requests
+    meta = getattr(response, 'meta', None)
+    return meta.get('checkpoint_fp') if meta else None
+
+
+class CheckpointFailureMiddleware:
+    """Downloader middleware that reports requests which will never get a
+    response (download errors once retries gave up, IgnoreRequest from the
+    offsite or robots.txt middleware) to CheckpointMiddleware.
+
+    Its order must be lower than every middleware that can still recover
+    from an exception (RetryMiddleware), so that it sees only the final one.
+    """
+
+    def __init__(self, crawler):
+        self.crawler = crawler
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        if not crawler.settings.get('CHECKPOINT_DIR'):
+            raise NotConfigured
+        return cls(crawler)
+
+    def process_exception(self, request, exception, spider):
+        if 'checkpoint_fp' in request.meta:
+            self.crawler.signals.send_catch_log(request_failed, request=request, exception=exception,
+                                                spider=spider)
+        return None
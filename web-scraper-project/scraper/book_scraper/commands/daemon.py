@@ -0,0 +1,46 @@
+import os
+
+from scrapy.commands import ScrapyCommand
+from scrapy.exceptions import UsageError
+
+from book_scraper.daemon import CrawlDaemon, listen
+
+
+class Command(ScrapyCommand):
+    requires_project = True
+
+    def syntax(self):
+        return '[options]'
+
+    def short_desc(self):
+        return 'Run a long-lived crawl daemon that accepts jobs over HTTP'
+
+    def add_options(self, parser):
+        super().add_options(parser)
+        parser.add_argument('--host', default='127.0.0.1',
+                            help='interface for the HTTP API (default: %(default)s)')
+        parser.add_argument('--port', type=int,
+                            help='TCP port for the HTTP API (default: DAEMON_PORT)')
+        parser.add_argument('--socket', help='Unix socket path for the HTTP API')
+        parser.add_argument('--max-jobs', type=int,
+                            help='crawls run at the same time (default: DAEMON_MAX_JOBS)')
+
+    def run(self, args, opts):
+        if args:
+            raise UsageError()
+        port = opts.port if opts.port is not None else self.settings.getint('DAEMON_PORT')
+        if opts.socket:
+            if os.path.exists(opts.socket):
+                os.remove(opts.socket)
+            if opts.port is None:
+                port = None
+        max_jobs = opts.max_jobs or self.settings.getint('DAEMON_MAX_JOBS', 4)
+
+        daemon = CrawlDaemon(self.crawler_process, max_jobs=max_jobs)
+        listen(daemon, host=opts.host, port=port, socket_path=opts.socket)
+        try:
+            self.crawler_process.start(stop_after_crawl=False)
+        finally:
+            daemon.close()
+            if opts.socket and os.path.exists(opts.socket):
+                os.remove(opts.socket)
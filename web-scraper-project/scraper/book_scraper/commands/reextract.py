@@ -0,0 +1,94 @@
+import json
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+from itemadapter import ItemAdapter
+from scrapy.commands import ScrapyCommand
+from scrapy.exceptions import UsageError
+from scrapy.http import HtmlResponse
+
+from book_scraper.spiders.books_spider import extract_book
+from book_scraper.warc import CALLBACK_HEADER, iter_warc_files, iter_warc_records, parse_http_block
+
+
+def iter_book_records(paths, callback):
+    for path in paths:
+        for headers, block in iter_warc_records(path):
+            if headers.get('WARC-Type') != 'response':
+                continue
+            if headers.get(CALLBACK_HEADER) != callback:
+                continue
+            yield headers['WARC-Target-URI'], headers.get('WARC-Date'), block
+
+
+def extract_batch(batch):
+    # Runs in a worker process: rebuild each response and run the spider's extraction
+    lines = []
+    for url, date, block in batch:
+        status, headers, body = parse_http_block(block)
+        if status != 200:
+            continue
+        response = HtmlResponse(url=url, status=status, headers=headers, body=body)
+        item = extract_book(response, scraped_date=date)
+        lines.append(json.dumps(ItemAdapter(item).asdict(), ensure_ascii=False) + '\n')
+    return lines
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def imap_bounded(pool, func, iterable, window):
+    # Like pool.map, but only keeps `window` tasks in flight so the archives
+    # are streamed instead of being read into memory up front
+    futures = deque()
+    for args in iterable:
+        futures.append(pool.submit(func, args))
+        if len(futures) >= window:
+            yield futures.popleft().result()
+    while futures:
+        yield futures.popleft().result()
+
+
+class Command(ScrapyCommand):
+    requires_project = True
+    default_settings = {'LOG_ENABLED': False}
+
+    def syntax(self):
+        return '<warc file or directory> [options]'
+
+    def short_desc(self):
+        return 'Re-run book extraction over archived WARC responses'
+
+    def add_options(self, parser):
+        super().add_options(parser)
+        parser.add_argument('-o', '--output', default='../data/books_reextracted.jl',
+                            help='JSON Lines file to write (default: %(default)s)')
+        parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count(),
+                            help='number of worker processes (default: all CPUs)')
+        parser.add_argument('--batch-size', type=int, default=200,
+                            help='records sent to a worker at a time (default: %(default)s)')
+        parser.add_argument('--callback', default='parse_book',
+                            help='only re-extract responses handled by this callback')
+
+    def run(self, args, opts):
+        if len(args) != 1:
+            raise UsageError()
+        paths = list(iter_warc_files(args[0]))
+        if not paths:
+            raise UsageError(f'No WARC files found in {args[0]}')
+
+        records = iter_book_records(paths, opts.callback)
+        count = 0
+        with open(opts.output, 'w', encoding='utf-8') as out, \
+                ProcessPoolExecutor(max_workers=opts.jobs) as pool:
+            batches = batched(records, opts.batch_size)
+            for lines in imap_bounded(pool, extract_batch, batches, window=opts.jobs * 2):
+                out.writelines(lines)
+                count += len(lines)
+
+        print(f'✅ Re-extracted {count} books from {len(paths)} WARC file(s) into {opts.output}')
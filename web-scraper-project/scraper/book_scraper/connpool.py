@@ -0,0 +1,248 @@
+# Download path with explicit connection pooling and opt-in HTTP/2.
+#
+# PooledDownloadHandler handles http and https (DOWNLOAD_HANDLERS). Up to
+# DOWNLOAD_POOL_SIZE idle keep-alive connections per host are kept for
+# DOWNLOAD_POOL_IDLE_TIMEOUT seconds (CONCURRENT_REQUESTS_PER_DOMAIN if
+# unset: a smaller pool closes connections that the next request to the
+# host would have reused). DOWNLOAD_POOL_PERSISTENT = False opens a new
+# connection for every request. With DOWNLOAD_HTTP2 = True, https requests
+# share one multiplexed HTTP/2 connection per host (needs `pip install h2`).
+#
+# The crawl stats get downloader/pool/*: connections opened and reused, the
+# reuse ratio, and the average TCP connect and TLS handshake time.
+
+import logging
+import time
+
+from OpenSSL import SSL
+from scrapy import signals
+from scrapy.core.downloader.contextfactory import ScrapyClientContextFactory
+from scrapy.core.downloader.handlers.http11 import HTTP11DownloadHandler
+from scrapy.core.downloader.tls import ScrapyClientTLSOptions
+from scrapy.utils.httpobj import urlparse_cached
+from twisted.internet.defer import DeferredList, maybeDeferred
+from twisted.internet.interfaces import IProtocolFactory
+from twisted.web.client import HTTPConnectionPool
+from zope.interface import implementer
+
+logger = logging.getLogger(__name__)
+
+
+class ConnectionStats:
+    prefix = 'downloader/pool/'
+
+    def __init__(self, stats):
+        self.stats = stats
+
+    def opened(self, seconds):
+        self.stats.inc_value(self.prefix + 'connections_opened')
+        self.stats.inc_value(self.prefix + 'tcp_connect_seconds', seconds)
+
+    def reused(self):
+        self.stats.inc_value(self.prefix + 'connections_reused')
+
+    def stale(self):
+        # A reused connection the server had already closed; the request
+        # went out again on a new one
+        self.stats.inc_value(self.prefix + 'connections_reused', -1)
+        self.stats.inc_value(self.prefix + 'connections_stale')
+
+    def tls_handshake(self, seconds):
+        self.stats.inc_value(self.prefix + 'tls_handshakes')
+        self.stats.inc_value(self.prefix + 'tls_handshake_seconds', seconds)
+
+    def summarize(self):
+        opened = self.stats.get_value(self.prefix + 'connections_opened', 0)
+        reused = self.stats.get_value(self.prefix + 'connections_reused', 0)
+        if opened + reused:
+            self.stats.set_value(self.prefix + 'reuse_ratio', round(reused / (opened + reused), 4))
+        if opened:
+            seconds = self.stats.get_value(self.prefix + 'tcp_connect_seconds')
+            self.stats.set_value(self.prefix + 'tcp_connect_ms_avg', round(seconds * 1000 / opened, 3))
+        handshakes = self.stats.get_value(self.prefix + 'tls_handshakes', 0)
+        if handshakes:
+            seconds = self.stats.get_value(self.prefix + 'tls_handshake_seconds')
+            self.stats.set_value(self.prefix + 'tls_handshake_ms_avg', round(seconds * 1000 / handshakes, 3))
+
+
+class TimedTLSOptions(ScrapyClientTLSOptions):
+    def __init__(self, hostname, ctx, stats, verbose_logging=False):
+        super().__init__(hostname, ctx, verbose_logging=verbose_logging)
+        self.stats = stats
+        self.handshakes = {}
+
+    def _identityVerifyingInfoCallback(self, connection, where, ret):
+        if where & SSL.SSL_CB_HANDSHAKE_START:
+            # TLS 1.3 signals post-handshake messages (session tickets) the
+            # same way; only the first handshake is timed
+            self.handshakes.setdefault(connection, time.perf_counter())
+        elif where & SSL.SSL_CB_HANDSHAKE_DONE:
+            started = self.handshakes.get(connection)
+            if started is not None:
+                self.stats.tls_handshake(time.perf_counter() - started)
+                self.handshakes[connection] = None
+        super()._identityVerifyingInfoCallback(connection, where, ret)
+
+
+class TimedContextFactory(ScrapyClientContextFactory):
+    """ScrapyClientContextFactory that records TLS handshake times
+    (DOWNLOADER_CLIENTCONTEXTFACTORY)."""
+
+    stats = None
+
+    @classmethod
+    def from_crawler(cls, crawler, method=SSL.SSLv23_METHOD, *args, **kwargs):
+        factory = super().from_crawler(crawler, method, *args, **kwargs)
+        factory.stats = ConnectionStats(crawler.stats)
+        return factory
+
+    def creatorForNetloc(self, hostname, port):
+        if self.stats is None:
+            return super().creatorForNetloc(hostname, port)
+        return TimedTLSOptions(hostname.decode('ascii'), self.getContext(), self.stats,
+                               verbose_logging=self.tls_verbose_logging)
+
+
+class CountingConnectionPool(HTTPConnectionPool):
+    """HTTP/1.1 keep-alive pool that reports new and reused connections."""
+
+    def __init__(self, reactor, stats, persistent=True):
+        super().__init__(reactor, persistent=persistent)
+        self.stats = stats
+        self.getting = False
+        self.opened = False
+
+    def getConnection(self, key, endpoint):
+        self.getting = True
+        self.opened = False
+        try:
+            d = super().getConnection(key, endpoint)
+        finally:
+            self.getting = False
+        if not self.opened:
+            # Served from the idle connections
+            self.stats.reused()
+        return d
+
+    def _newConnection(self, key, endpoint):
+        if self.getting:
+            self.opened = True
+        else:
+            # Twisted retrying a request whose idle connection turned out closed
+            self.stats.stale()
+        started = time.perf_counter()
+        d = super()._newConnection(key, endpoint)
+
+        def connected(connection):
+            self.stats.opened(time.perf_counter() - started)
+            return connection
+
+        return d.addCallback(connected)
+
+
+@implementer(IProtocolFactory)
+class PresetALPNFactory:
+    """Wraps H2ClientFactory without its protocol negotiation interface.
+
+    Scrapy sets the h2 ALPN protocol on the TLS context before connecting;
+    Twisted would set it again on the context of the new connection, which
+    pyOpenSSL 25+ rejects (a context in use can't be changed)."""
+
+    def __init__(self, factory):
+        self.factory = factory
+
+    def buildProtocol(self, addr):
+        return self.factory.buildProtocol(addr)
+
+    def doStart(self):
+        self.factory.doStart()
+
+    def doStop(self):
+        self.factory.doStop()
+
+    def __getattr__(self, name):
+        return getattr(self.factory, name)
+
+
+class PresetALPNEndpoint:
+    def __init__(self, endpoint):
+        self.endpoint = endpoint
+
+    def connect(self, factory):
+        return self.endpoint.connect(PresetALPNFactory(factory))
+
+
+class CountingH2Pool:
+    """Wraps Scrapy's H2ConnectionPool: a request for a host that already has
+    a connection (or one being set up) is multiplexed onto it."""
+
+    def __init__(self, pool, stats):
+        self.pool = pool
+        self.stats = stats
+
+    def get_connection(self, key, uri, endpoint):
+        endpoint = PresetALPNEndpoint(endpoint)
+        if key in self.pool._connections or key in self.pool._pending_requests:
+            self.stats.reused()
+            return self.pool.get_connection(key, uri, endpoint)
+        started = time.perf_counter()
+        d = self.pool.get_connection(key, uri, endpoint)
+
+        def connected(connection):
+            self.stats.opened(time.perf_counter() - started)
+            return connection
+
+        return d.addCallback(connected)
+
+    def __getattr__(self, name):
+        return getattr(self.pool, name)
+
+
+def h2_download_handler(settings, crawler, stats):
+    try:
+        from scrapy.core.downloader.handlers.http2 import H2DownloadHandler
+    except ImportError:
+        logger.warning('DOWNLOAD_HTTP2 needs the h2 package (pip install h2); using HTTP/1.1')
+        return None
+    handler = H2DownloadHandler(settings, crawler)
+    handler._pool = CountingH2Pool(handler._pool, stats)
+    return handler
+
+
+class PooledDownloadHandler(HTTP11DownloadHandler):
+    def __init__(self, settings, crawler):
+        super().__init__(settings, crawler)
+        from twisted.internet import reactor
+
+        self.stats = ConnectionStats(crawler.stats)
+        self._pool = CountingConnectionPool(reactor, self.stats,
+                                            persistent=settings.getbool('DOWNLOAD_POOL_PERSISTENT', True))
+        self._pool.maxPersistentPerHost = (settings.getint('DOWNLOAD_POOL_SIZE')
+                                           or settings.getint('CONCURRENT_REQUESTS_PER_DOMAIN'))
+        self._pool.cachedConnectionTimeout = settings.getfloat('DOWNLOAD_POOL_IDLE_TIMEOUT', 240)
+        self._pool._factory.noisy = False
+        self.http2 = settings.getbool('DOWNLOAD_HTTP2')
+        self.h2 = None
+        # Handlers are closed after the stats are, so summarize when the spider closes
+        crawler.signals.connect(self.spider_closed, signal=signals.spider_closed)
+
+    def spider_closed(self, spider):
+        self.stats.summarize()
+
+    def download_request(self, request, spider):
+        # HTTP/2 is negotiated over TLS only; plain http stays on HTTP/1.1
+        if self.http2 and urlparse_cached(request).scheme == 'https':
+            if self.h2 is None:
+                self.h2 = h2_download_handler(self._crawler.settings, self._crawler, self.stats)
+                self.http2 = self.h2 is not None
+            if self.h2 is not None:
+                return self.h2.download_request(request, spider)
+        return super().download_request(request, spider)
+
+    def close(self):
+        # Done once both the HTTP/2 and the HTTP/1.1 connections are closed
+        closing = []
+        if self.h2 is not None:
+            closing.append(maybeDeferred(self.h2.close))
+        closing.append(super().close())
+        return DeferredList(closing, fireOnOneErrback=True, consumeErrors=True)
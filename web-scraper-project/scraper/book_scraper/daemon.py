@@ -0,0 +1,344 @@
+# Long-running crawl daemon.
+#
+# Keeps one Scrapy/Twisted process warm and runs crawl jobs submitted over a
+# small JSON API (TCP and/or a Unix socket), so frequent incremental crawls
+# don't pay for interpreter start, imports, settings load, DNS lookups and a
+# fresh MongoDB client each time:
+#
+#     scrapy daemon --port 6810 --socket ../data/daemon.sock
+#
+#     POST   /jobs        {"spider": "books", "args": {}, "settings": {}, "every": 3600}
+#     GET    /jobs        all jobs and schedules
+#     GET    /jobs/<id>   one job with its (live) crawl stats
+#     DELETE /jobs/<id>   stop a running/pending job or cancel a schedule
+#     GET    /status      daemon summary
+#
+# "every" turns the submission into a schedule that starts a new job every
+# N seconds; a run is skipped while the previous one is still going.
+#
+# Unless its settings set FEEDS, each job writes its items to its own JSON
+# Lines file, DAEMON_FEED_URI with %(spider)s, %(job)s and %(time)s filled in.
+
+import itertools
+import json
+import logging
+import time
+from collections import deque
+
+from scrapy.crawler import Crawler
+from scrapy.utils.reactor import install_reactor, is_reactor_installed
+from twisted.internet import task
+from twisted.web import resource, server
+
+from book_scraper.pipelines import acquire_mongo_client, release_mongo_client
+
+logger = logging.getLogger(__name__)
+
+FINISHED_JOBS_KEPT = 200
+DEFAULT_FEED_URI = '../data/jobs/%(spider)s/%(time)s-%(job)s.jl'
+
+
+class JobError(ValueError):
+    pass
+
+
+class Job:
+    def __init__(self, job_id, spider, args=None, settings=None, schedule_id=None):
+        self.id = job_id
+        self.spider = spider
+        self.args = args or {}
+        self.settings = settings or {}
+        self.schedule_id = schedule_id
+        self.status = 'pending'
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.crawler = None
+        self.feed = None
+        self.stats = {}
+        self.error = None
+
+    def to_dict(self, with_stats=False):
+        data = {
+            'id': self.id,
+            'spider': self.spider,
+            'args': self.args,
+            'settings': self.settings,
+            'schedule': self.schedule_id,
+            'status': self.status,
+            'submitted_at': self.submitted_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+            'feed': self.feed,
+            'error': self.error,
+        }
+        stats = self.crawler.stats.get_stats() if self.crawler else self.stats
+        data['items'] = stats.get('item_scraped_count', 0)
+        data['finish_reason'] = stats.get('finish_reason')
+        if with_stats:
+            data['stats'] = stats
+        return data
+
+
+class Schedule:
+    def __init__(self, schedule_id, spider, args, settings, every):
+        self.id = schedule_id
+        self.spider = spider
+        self.args = args
+        self.settings = settings
+        self.every = every
+        self.last_job = None
+        self.runs = 0
+        self.skipped = 0
+        self.loop = None
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'spider': self.spider,
+            'args': self.args,
+            'settings': self.settings,
+            'every': self.every,
+            'runs': self.runs,
+            'skipped': self.skipped,
+            'last_job': self.last_job.id if self.last_job else None,
+        }
+
+
+class CrawlDaemon:
+    def __init__(self, runner, max_jobs=4):
+        # runner is a CrawlerRunner (or CrawlerProcess) created once for the
+        # daemon's lifetime; every job's crawler shares its reactor, spider
+        # loader and process-wide caches
+        self.runner = runner
+        self.settings = runner.settings
+        self.max_jobs = max_jobs
+        self.feed_uri = self.settings.get('DAEMON_FEED_URI') or DEFAULT_FEED_URI
+        self.jobs = {}
+        self.schedules = {}
+        self.pending = deque()
+        self.running = set()
+        self.started_at = time.time()
+        self._ids = itertools.count(1)
+        self.mongo_uri = self.settings.get('MONGO_URI')
+        if self.mongo_uri:
+            # Hold a reference so the client (and its pool) outlives each job
+            acquire_mongo_client(self.mongo_uri)
+
+    def submit(self, spider, args=None, settings=None, every=None):
+        if not isinstance(spider, str) or spider not in self.runner.spider_loader.list():
+            raise JobError(f'Unknown spider: {spider!r}')
+        for name, value in (('args', args), ('settings', settings)):
+            if value is not None and not isinstance(value, dict):
+                raise JobError(f'"{name}" must be an object')
+        if every is not None:
+            # bool is an int subclass, and "3600" must not be taken as a number
+            if isinstance(every, bool) or not isinstance(every, (int, float)) or every <= 0:
+                raise JobError('"every" must be a positive number of seconds')
+            schedule = Schedule(f's{next(self._ids)}', spider, args or {}, settings or {}, every)
+            self.schedules[schedule.id] = schedule
+            schedule.loop = task.LoopingCall(self._run_schedule, schedule)
+            schedule.loop.start(every, now=True)
+            return schedule
+        return self._enqueue(Job(f'j{next(self._ids)}', spider, args, settings))
+
+    def _run_schedule(self, schedule):
+        if schedule.last_job and schedule.last_job.status in ('pending', 'running'):
+            schedule.skipped += 1
+            logger.info('Schedule %s: previous job %s still %s, skipping this run',
+                        schedule.id, schedule.last_job.id, schedule.last_job.status)
+            return
+        schedule.runs += 1
+        schedule.last_job = self._enqueue(Job(f'j{next(self._ids)}', schedule.spider, schedule.args,
+                                              schedule.settings, schedule_id=schedule.id))
+
+    def _enqueue(self, job):
+        self.jobs[job.id] = job
+        self.pending.append(job)
+        self._start_pending()
+        self._forget_old_jobs()
+        return job
+
+    def _start_pending(self):
+        while self.pending and len(self.running) < self.max_jobs:
+            self._start(self.pending.popleft())
+
+    def _start(self, job):
+        settings = self.settings.copy()
+        if 'FEEDS' not in job.settings:
+            # Concurrent and repeated jobs must not share one feed file
+            job.feed = self.feed_uri % {
+                'spider': job.spider,
+                'job': job.id,
+                'time': time.strftime('%Y%m%dT%H%M%S'),
+            }
+            settings.set('FEEDS', {job.feed: {'format': 'jsonlines', 'encoding': 'utf8'}}, priority='cmdline')
+        settings.setdict(job.settings, priority='cmdline')
+        spidercls = self.runner.spider_loader.load(job.spider)
+        job.crawler = Crawler(spidercls, settings)
+        job.status = 'running'
+        job.started_at = time.time()
+        self.running.add(job)
+        logger.info('Starting job %s (%s)', job.id, job.spider)
+        d = self.runner.crawl(job.crawler, **job.args)
+        d.addCallbacks(self._finished, self._failed, callbackArgs=(job,), errbackArgs=(job,))
+
+    def _finished(self, _, job):
+        job.stats = job.crawler.stats.get_stats()
+        if job.status == 'running':
+            job.status = 'finished' if job.stats.get('finish_reason') == 'finished' else 'stopped'
+        self._done(job)
+
+    def _failed(self, failure, job):
+        job.status = 'failed'
+        job.error = failure.getErrorMessage()
+        job.stats = job.crawler.stats.get_stats() if job.crawler.stats else {}
+        logger.error('Job %s failed: %s', job.id, job.error)
+        self._done(job)
+
+    def _done(self, job):
+        job.finished_at = time.time()
+        job.crawler = None
+        self.running.discard(job)
+        logger.info('Job %s %s in %.1fs', job.id, job.status, job.finished_at - job.started_at)
+        self._start_pending()
+
+    def _forget_old_jobs(self):
+        finished = [job for job in self.jobs.values() if job.finished_at is not None]
+        for job in finished[:-FINISHED_JOBS_KEPT]:
+            del self.jobs[job.id]
+
+    def cancel(self, key):
+        if key in self.schedules:
+            schedule = self.schedules.pop(key)
+            if schedule.loop.running:
+                schedule.loop.stop()
+            return schedule.to_dict()
+        job = self.jobs.get(key)
+        if job is None:
+            raise KeyError(key)
+        if job.status == 'pending':
+            self.pending.remove(job)
+            job.status = 'cancelled'
+            job.finished_at = time.time()
+        elif job.status == 'running':
+            job.status = 'cancelled'
+            job.crawler.stop()
+        return job.to_dict()
+
+    def status(self):
+        return {
+            'uptime': time.time() - self.started_at,
+            'max_jobs': self.max_jobs,
+            'running': sorted(job.id for job in self.running),
+            'pending': [job.id for job in self.pending],
+            'schedules': sorted(self.schedules),
+            'spiders': self.runner.spider_loader.list(),
+        }
+
+    def close(self):
+        # Running crawls are stopped by the crawler process on shutdown
+        for schedule in self.schedules.values():
+            if schedule.loop.running:
+                schedule.loop.stop()
+        self.schedules.clear()
+        self.pending.clear()
+        if self.mongo_uri:
+            release_mongo_client(self.mongo_uri)
+
+
+def _json(request, data, status=200):
+    request.setResponseCode(status)
+    request.setHeader(b'Content-Type', b'application/json')
+    return json.dumps(data, default=str).encode('utf-8')
+
+
+class JobsResource(resource.Resource):
+    def __init__(self, daemon):
+        super().__init__()
+        self.daemon = daemon
+
+    def getChild(self, path, request):
+        if not path:
+            return self
+        return JobResource(self.daemon, path.decode('utf-8'))
+
+    def render_GET(self, request):
+        return _json(request, {
+            'jobs': [job.to_dict() for job in self.daemon.jobs.values()],
+            'schedules': [schedule.to_dict() for schedule in self.daemon.schedules.values()],
+        })
+
+    def render_POST(self, request):
+        try:
+            body = json.loads(request.content.read() or b'{}')
+            if not isinstance(body, dict):
+                raise JobError('The request body must be a JSON object')
+            result = self.daemon.submit(
+                body['spider'],
+                args=body.get('args'),
+                settings=body.get('settings'),
+                every=body.get('every'),
+            )
+        except KeyError as e:
+            return _json(request, {'error': f'missing field {e}'}, status=400)
+        except ValueError as e:
+            return _json(request, {'error': str(e)}, status=400)
+        return _json(request, result.to_dict(), status=201)
+
+
+class JobResource(resource.Resource):
+    isLeaf = True
+
+    def __init__(self, daemon, key):
+        super().__init__()
+        self.daemon = daemon
+        self.key = key
+
+    def render_GET(self, request):
+        if self.key in self.daemon.schedules:
+            return _json(request, self.daemon.schedules[self.key].to_dict())
+        job = self.daemon.jobs.get(self.key)
+        if job is None:
+            return _json(request, {'error': 'not found'}, status=404)
+        return _json(request, job.to_dict(with_stats=True))
+
+    def render_DELETE(self, request):
+        try:
+            return _json(request, self.daemon.cancel(self.key))
+        except KeyError:
+            return _json(request, {'error': 'not found'}, status=404)
+
+
+class StatusResource(resource.Resource):
+    isLeaf = True
+
+    def __init__(self, daemon):
+        super().__init__()
+        self.daemon = daemon
+
+    def render_GET(self, request):
+        return _json(request, self.daemon.status())
+
+
+def build_site(daemon):
+    root = resource.Resource()
+    root.putChild(b'jobs', JobsResource(daemon))
+    root.putChild(b'status', StatusResource(daemon))
+    return server.Site(root)
+
+
+def listen(daemon, host='127.0.0.1', port=None, socket_path=None):
+    # Crawlers are only created later, so install the configured reactor
+    # (TWISTED_REACTOR) before the API binds to the default one
+    if not is_reactor_installed():
+        install_reactor(daemon.settings['TWISTED_REACTOR'], daemon.settings['ASYNCIO_EVENT_LOOP'])
+    from twisted.internet import reactor
+
+    site = build_site(daemon)
+    if port is not None:
+        reactor.listenTCP(port, site, interface=host)
+        logger.info('Crawl daemon listening on http://%s:%d/', host, port)
+    if socket_path:
+        reactor.listenUNIX(socket_path, site)
+        logger.info('Crawl daemon listening on unix:%s', socket_path)
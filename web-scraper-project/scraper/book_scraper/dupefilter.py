@@ -0,0 +1,346 @@
+# Compact, persistent duplicate request filter (DUPEFILTER_CLASS).
+#
+# Scrapy's RFPDupeFilter keeps every request fingerprint as a 40-character
+# hex string in a set, 100+ bytes per URL. CompactDupeFilter keeps the first
+# DUPEFILTER_FINGERPRINT_BITS (64 or 128) of each fingerprint as integers in a
+# flat open-addressing table, 12-23 bytes per URL at 64 bits, or with
+# DUPEFILTER_MODE = 'bloom' in a scalable Bloom filter, a few bytes per URL
+# but with a DUPEFILTER_BLOOM_ERROR_RATE chance of skipping a URL it never saw.
+# At 64 bits two of 10 million URLs share a fingerprint with odds of about
+# 1 in 400 000.
+#
+# With DUPEFILTER_PATH the table lives in a memory-mapped file, updated in
+# place as requests are seen: it survives restarts (a killed crawl too) and
+# opens without being read. A run with the same file skips every URL an
+# earlier run requested; delete the file to start over. It doesn't combine
+# with CHECKPOINT_DIR (see checkpoint.py): the resumed pending requests were
+# already seen and would all be filtered out.
+
+import logging
+import math
+import mmap
+import os
+import struct
+
+from scrapy.dupefilters import RFPDupeFilter
+
+logger = logging.getLogger(__name__)
+
+TABLE_MAGIC = b'BSFPTAB1'
+BLOOM_HEADER = struct.Struct('<8sdQQ')  # magic, error rate, initial capacity, slices
+BLOOM_MAGIC = b'BSBLOOM1'
+BLOOM_SLICE = struct.Struct('<QQQQ')  # capacity, count, bits, hashes
+COUNT = struct.Struct('<Q')
+
+
+def map_file(path, size):
+    """Writable shared map of `size` bytes: of the file at `path`, created or
+    zero-extended as needed, or of anonymous memory if path is None."""
+    if path is None:
+        return mmap.mmap(-1, size)
+    fd = os.open(path, os.O_RDWR | os.O_CREAT | getattr(os, 'O_BINARY', 0), 0o644)
+    try:
+        if os.fstat(fd).st_size < size:
+            os.ftruncate(fd, size)
+        return mmap.mmap(fd, size)
+    finally:
+        os.close(fd)
+
+
+def existing_size(path):
+    try:
+        return os.path.getsize(path) if path else 0
+    except OSError:
+        return 0
+
+
+class FingerprintTable:
+    """Set of 64- or 128-bit fingerprints: open addressing with linear probing
+    over an array of uint64, doubled when more than 70% full.
+
+    Layout: four header words (magic, words per fingerprint, capacity, count)
+    and then `capacity` slots of one or two words. Fingerprints are never zero
+    in their first word, so a zero word is an empty slot. An existing file
+    keeps the width it was created with.
+    """
+
+    HEADER_WORDS = 4
+    MAX_LOAD = 0.7
+
+    def __init__(self, path=None, bits=64, capacity=1 << 16):
+        if bits not in (64, 128):
+            raise ValueError(f'Fingerprint width must be 64 or 128 bits, not {bits}')
+        self.path = path
+        size = existing_size(path)
+        if size:
+            self.map = map_file(path, size)
+            if self.map[:8] != TABLE_MAGIC:
+                self.map.close()
+                raise ValueError(f'{path} is not a fingerprint table')
+            self.words = memoryview(self.map).cast('Q')
+            self.width, self.capacity, self.count = self.words[1:4]
+            self.mask = self.capacity - 1
+        else:
+            self.width = bits // 64
+            self._allocate(path, 1 << max(capacity - 1, 1).bit_length())
+
+    def _allocate(self, path, capacity):
+        self.map = map_file(path, (self.HEADER_WORDS + capacity * self.width) * 8)
+        self.map[:8] = TABLE_MAGIC
+        self.words = memoryview(self.map).cast('Q')
+        self.words[1] = self.width
+        self.words[2] = self.capacity = capacity
+        self.words[3] = self.count = 0
+        self.mask = capacity - 1
+
+    def __len__(self):
+        return self.count
+
+    @property
+    def nbytes(self):
+        return len(self.map)
+
+    def _find(self, low, high):
+        # Index of the fingerprint's slot, or of the empty slot it would take
+        words, width, mask = self.words, self.width, self.mask
+        i = low & mask
+        while True:
+            at = self.HEADER_WORDS + i * width
+            slot = words[at]
+            if not slot or (slot == low and (width == 1 or words[at + 1] == high)):
+                return at
+            i = (i + 1) & mask
+
+    def _split(self, fp):
+        low = int.from_bytes(fp[:8], 'little') or 1
+        high = int.from_bytes(fp[8:16], 'little') if self.width == 2 else 0
+        return low, high
+
+    def __contains__(self, fp):
+        low, high = self._split(fp)
+        return bool(self.words[self._find(low, high)])
+
+    def add(self, fp):
+        """Add a fingerprint (bytes); False if it was already there."""
+        low, high = self._split(fp)
+        at = self._find(low, high)
+        if self.words[at]:
+            return False
+        self._insert(at, low, high)
+        if self.count > self.capacity * self.MAX_LOAD:
+            self._grow()
+        return True
+
+    def _insert(self, at, low, high):
+        # The first word goes in last: it is what marks the slot as taken
+        if self.width == 2:
+            self.words[at + 1] = high
+        self.words[at] = low
+        self.count += 1
+        self.words[3] = self.count
+
+    def _grow(self):
+        old_map, old_words, width = self.map, self.words, self.width
+        # Rehash into a new file and swap it in, so a crash mid-way leaves the old one intact
+        tmp_path = self.path + '.tmp' if self.path else None
+        if tmp_path and os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        self._allocate(tmp_path, self.capacity * 2)
+        lows = old_words[self.HEADER_WORDS::width]
+        highs = old_words[self.HEADER_WORDS + 1::width] if width == 2 else None
+        for i, low in enumerate(lows):
+            if low:
+                high = highs[i] if highs is not None else 0
+                self._insert(self._find(low, high), low, high)
+        lows.release()
+        if highs is not None:
+            highs.release()
+        old_words.release()
+        old_map.close()
+        if tmp_path:
+            self.map.flush()
+            os.replace(tmp_path, self.path)
+
+    def close(self):
+        if self.path:
+            self.map.flush()
+        self.words.release()
+        self.map.close()
+
+
+class BloomSlice:
+    __slots__ = ('offset', 'capacity', 'count', 'bits', 'hashes')
+
+    def __init__(self, offset, capacity, count, bits, hashes):
+        self.offset = offset
+        self.capacity = capacity
+        self.count = count
+        self.bits = bits
+        self.hashes = hashes
+
+    @property
+    def size(self):
+        return BLOOM_SLICE.size + -(-self.bits // 64) * 8
+
+    def position(self, h1, h2, i):
+        return (h1 + i * h2) % self.bits
+
+
+class ScalableBloomFilter:
+    """Scalable Bloom filter (Almeida et al., 2007): a series of Bloom
+    filters, each holding twice as many fingerprints as the one before at a
+    tighter error rate, so the chance of a false "seen" stays under
+    `error_rate` however many fingerprints are added.
+
+    Layout: a header (magic, error rate, initial capacity, slice count), then
+    the slices one after another, each a header (capacity, count, bits, hash
+    functions) and its bit array. The slice positions come from two 64-bit
+    halves of the fingerprint (double hashing).
+    """
+
+    TIGHTENING = 0.8
+
+    def __init__(self, path=None, error_rate=1e-6, capacity=1 << 20):
+        if not 0 < error_rate < 1:
+            raise ValueError(f'Bloom filter error rate must be between 0 and 1, not {error_rate}')
+        self.path = path
+        self.slices = []
+        size = existing_size(path)
+        if size:
+            self.map = map_file(path, size)
+            magic, self.error_rate, self.initial_capacity, count = BLOOM_HEADER.unpack_from(self.map)
+            if magic != BLOOM_MAGIC:
+                self.map.close()
+                raise ValueError(f'{path} is not a Bloom filter')
+            offset = BLOOM_HEADER.size
+            for _ in range(count):
+                bloom_slice = BloomSlice(offset, *BLOOM_SLICE.unpack_from(self.map, offset))
+                self.slices.append(bloom_slice)
+                offset += bloom_slice.size
+        else:
+            self.error_rate = error_rate
+            self.initial_capacity = capacity
+            self.map = map_file(path, BLOOM_HEADER.size)
+            self._add_slice()
+
+    def _add_slice(self):
+        n = len(self.slices)
+        capacity = self.initial_capacity * 2 ** n
+        # Slice error rates form a geometric series that sums to error_rate
+        error_rate = self.error_rate * (1 - self.TIGHTENING) * self.TIGHTENING ** n
+        bits = math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)
+        hashes = math.ceil(-math.log2(error_rate))
+        offset = len(self.map) if self.slices else BLOOM_HEADER.size
+        bloom_slice = BloomSlice(offset, capacity, 0, bits, hashes)
+        self._resize(offset + bloom_slice.size)
+        BLOOM_SLICE.pack_into(self.map, offset, capacity, 0, bits, hashes)
+        self.slices.append(bloom_slice)
+        BLOOM_HEADER.pack_into(self.map, 0, BLOOM_MAGIC, self.error_rate, self.initial_capacity, len(self.slices))
+        return bloom_slice
+
+    def _resize(self, size):
+        old_map = self.map
+        if self.path:
+            old_map.flush()
+            old_map.close()
+            self.map = map_file(self.path, size)
+        else:
+            self.map = mmap.mmap(-1, size)
+            self.map[:len(old_map)] = old_map[:]
+            old_map.close()
+
+    def __len__(self):
+        return sum(bloom_slice.count for bloom_slice in self.slices)
+
+    @property
+    def nbytes(self):
+        return len(self.map)
+
+    def _in_slice(self, bloom_slice, h1, h2):
+        data = self.map
+        start = bloom_slice.offset + BLOOM_SLICE.size
+        for i in range(bloom_slice.hashes):
+            position = bloom_slice.position(h1, h2, i)
+            if not data[start + (position >> 3)] & (1 << (position & 7)):
+                return False
+        return True
+
+    def _split(self, fp):
+        return int.from_bytes(fp[:8], 'little'), int.from_bytes(fp[8:16], 'little') | 1
+
+    def __contains__(self, fp):
+        h1, h2 = self._split(fp)
+        return any(self._in_slice(bloom_slice, h1, h2) for bloom_slice in reversed(self.slices))
+
+    def add(self, fp):
+        """Add a fingerprint (bytes); False if it was (probably) already there."""
+        h1, h2 = self._split(fp)
+        if any(self._in_slice(bloom_slice, h1, h2) for bloom_slice in reversed(self.slices)):
+            return False
+        bloom_slice = self.slices[-1]
+        if bloom_slice.count >= bloom_slice.capacity:
+            bloom_slice = self._add_slice()
+        data = self.map
+        start = bloom_slice.offset + BLOOM_SLICE.size
+        for i in range(bloom_slice.hashes):
+            position = bloom_slice.position(h1, h2, i)
+            data[start + (position >> 3)] |= 1 << (position & 7)
+        bloom_slice.count += 1
+        COUNT.pack_into(data, bloom_slice.offset + 8, bloom_slice.count)
+        return True
+
+    def close(self):
+        if self.path:
+            self.map.flush()
+        self.map.close()
+
+
+def fingerprint_store(mode, path=None, bits=64, error_rate=1e-6, capacity=None):
+    if mode == 'table':
+        return FingerprintTable(path, bits, capacity or 1 << 16)
+    if mode == 'bloom':
+        return ScalableBloomFilter(path, error_rate, capacity or 1 << 20)
+    raise ValueError(f'Unknown DUPEFILTER_MODE: {mode!r}')
+
+
+class CompactDupeFilter(RFPDupeFilter):
+    """RFPDupeFilter over a FingerprintTable or ScalableBloomFilter instead
+    of a set of hex strings."""
+
+    def __init__(self, path=None, debug=False, *, fingerprinter=None, mode='table', bits=64,
+                 error_rate=1e-6, capacity=None, stats=None):
+        # No JOBDIR requests.seen file: the store persists itself
+        super().__init__(None, debug, fingerprinter=fingerprinter)
+        self.fingerprints = fingerprint_store(mode, path, bits, error_rate, capacity)
+        self.path = path
+        self.mode = mode
+        self.stats = stats
+        if len(self.fingerprints):
+            logger.info('Loaded %d request fingerprints from %s', len(self.fingerprints), path)
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        if settings.get('DUPEFILTER_PATH') and settings.get('CHECKPOINT_DIR'):
+            raise ValueError('DUPEFILTER_PATH and CHECKPOINT_DIR cannot be used together: a resumed '
+                             'checkpoint re-schedules requests the persistent filter already saw. '
+                             'Unset one of them.')
+        return cls(
+            settings.get('DUPEFILTER_PATH'),
+            settings.getbool('DUPEFILTER_DEBUG'),
+            fingerprinter=crawler.request_fingerprinter,
+            mode=settings.get('DUPEFILTER_MODE', 'table'),
+            bits=settings.getint('DUPEFILTER_FINGERPRINT_BITS', 64),
+            error_rate=settings.getfloat('DUPEFILTER_BLOOM_ERROR_RATE', 1e-6),
+            capacity=settings.getint('DUPEFILTER_INITIAL_CAPACITY') or None,
+            stats=crawler.stats,
+        )
+
+    def request_seen(self, request):
+        return not self.fingerprints.add(self.fingerprinter.fingerprint(request))
+
+    def close(self, reason):
+        if self.stats is not None:
+            self.stats.set_value('dupefilter/fingerprints', len(self.fingerprints))
+            self.stats.set_value('dupefilter/bytes', self.fingerprints.nbytes)
+        self.fingerprints.close()
@@ -0,0 +1,213 @@
+# Serialize-once export to several sinks.
+#
+# Instead of every feed and pipeline converting and encoding each item on its
+# own, FanOutExportPipeline converts an item to a dict once, encodes it to
+# JSON once (with orjson when it is installed) and hands the same record to
+# every sink in EXPORT_SINKS, e.g.:
+#
+#     EXPORT_SINKS = [
+#         'jsonl:../data/books.jl',
+#         'csv:../data/books.csv',
+#         'gzip:../data/books.jl.gz',
+#         'mongo',
+#     ]
+#
+# Each sink buffers writes and flushes every EXPORT_BUFFER_SIZE bytes (or
+# EXPORT_MONGO_BATCH_SIZE documents for MongoDB, inserted off the reactor
+# thread).
+
+import csv
+import gzip
+import io
+import json
+import logging
+
+from itemadapter import ItemAdapter
+from scrapy.exceptions import NotConfigured
+from twisted.internet.defer import DeferredList
+from twisted.internet.threads import deferToThread
+
+logger = logging.getLogger(__name__)
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+# Same column order as the existing CSV exports
+CSV_FIELDS = [
+    'title', 'price', 'rating', 'availability', 'description',
+    'category', 'image_url', 'product_url', 'scraped_date',
+]
+
+
+def encode_json_line(data):
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_APPEND_NEWLINE)
+    return (json.dumps(data, ensure_ascii=False) + '\n').encode('utf-8')
+
+
+class Record:
+    """An item converted and encoded once, shared by every sink."""
+
+    __slots__ = ('data', 'json_line')
+
+    def __init__(self, item):
+        self.data = ItemAdapter(item).asdict()
+        self.json_line = encode_json_line(self.data)
+
+
+class JsonLinesSink:
+    def __init__(self, path, buffer_size):
+        self.path = path
+        self.buffer_size = buffer_size
+        self.buffer = []
+        self.buffered = 0
+        self.file = None
+
+    def open(self):
+        self.file = open(self.path, 'ab')
+
+    def write(self, record):
+        self.buffer.append(record.json_line)
+        self.buffered += len(record.json_line)
+        if self.buffered >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        if self.buffer:
+            self.file.write(b''.join(self.buffer))
+            self.buffer = []
+            self.buffered = 0
+
+    def close(self):
+        self.flush()
+        self.file.close()
+
+
+class GzipJsonLinesSink(JsonLinesSink):
+    def open(self):
+        self.file = gzip.open(self.path, 'ab')
+
+
+class CsvSink:
+    def __init__(self, path, buffer_size, fields):
+        self.path = path
+        self.buffer_size = buffer_size
+        self.fields = fields
+        self.buffer = io.StringIO()
+        self.writer = csv.DictWriter(self.buffer, fieldnames=fields, extrasaction='ignore')
+        self.file = None
+
+    def open(self):
+        self.file = open(self.path, 'a', encoding='utf-8', newline='')
+        if self.file.tell() == 0:
+            self.writer.writeheader()
+
+    def write(self, record):
+        self.writer.writerow(record.data)
+        if self.buffer.tell() >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        self.file.write(self.buffer.getvalue())
+        self.buffer.seek(0)
+        self.buffer.truncate()
+
+    def close(self):
+        self.flush()
+        self.file.close()
+
+
+class MongoSink:
+    def __init__(self, mongo_uri, mongo_db, batch_size):
+        self.mongo_uri = mongo_uri
+        self.mongo_db = mongo_db
+        self.batch_size = batch_size
+        self.buffer = []
+        self.inserting = set()
+
+    def open(self):
+        from book_scraper.pipelines import acquire_mongo_client
+        self.client = acquire_mongo_client(self.mongo_uri)
+        self.collection = self.client[self.mongo_db]['books']
+
+    def write(self, record):
+        # insert_many() adds an _id to each document, so don't hand it the shared dict
+        self.buffer.append(dict(record.data))
+        if len(self.buffer) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self.buffer:
+            return
+        documents, self.buffer = self.buffer, []
+        # Off the reactor thread, as DashboardPushPipeline does: a slow
+        # MongoDB must not stall downloads
+        d = deferToThread(self.collection.insert_many, documents, ordered=False)
+        d.addErrback(lambda failure: logger.error('MongoDB export of %d items failed: %s',
+                                                  len(documents), failure.value))
+        self.inserting.add(d)
+        d.addBoth(lambda _: self.inserting.discard(d))
+
+    def close(self):
+        # Release the client once the last inserts are done
+        from book_scraper.pipelines import release_mongo_client
+        self.flush()
+        d = DeferredList(list(self.inserting))
+        d.addCallback(lambda _: release_mongo_client(self.mongo_uri))
+        return d
+
+
+def build_sink(spec, settings):
+    kind, _, path = spec.partition(':')
+    buffer_size = settings.getint('EXPORT_BUFFER_SIZE', 256 * 1024)
+    if kind == 'jsonl':
+        return JsonLinesSink(path, buffer_size)
+    if kind == 'gzip':
+        return GzipJsonLinesSink(path, buffer_size)
+    if kind == 'csv':
+        return CsvSink(path, buffer_size, CSV_FIELDS)
+    if kind == 'mongo':
+        return MongoSink(
+            settings.get('MONGO_URI'),
+            settings.get('MONGO_DATABASE', 'books_db'),
+            settings.getint('EXPORT_MONGO_BATCH_SIZE', 500),
+        )
+    raise ValueError(f'Unknown export sink: {spec!r}')
+
+
+class FanOutExportPipeline:
+    def __init__(self, sinks):
+        self.sinks = sinks
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        specs = crawler.settings.getlist('EXPORT_SINKS')
+        if not specs:
+            raise NotConfigured
+        return cls([build_sink(spec, crawler.settings) for spec in specs])
+
+    def open_spider(self, spider):
+        opened = []
+        try:
+            for sink in self.sinks:
+                sink.open()
+                opened.append(sink)
+        except Exception:
+            # Don't leave the sinks opened so far (files, a Mongo client) behind
+            for sink in opened:
+                sink.close()
+            raise
+
+    def close_spider(self, spider):
+        # Sinks that finish in the background (MongoSink) return a Deferred
+        closing = [sink.close() for sink in self.sinks]
+        return DeferredList([d for d in closing if d is not None])
+
+    def process_item(self, item, spider):
+        record = Record(item)
+        for sink in self.sinks:
+            sink.write(record)
+        return item
@@ -0,0 +1,189 @@
+# Memory-bounded crawl frontier.
+#
+# Pending requests are kept in memory up to FRONTIER_MEMORY_LIMIT; anything
+# beyond that spills to a priority-aware disk queue. Combined with the higher
+# priority BooksSpider gives detail pages, the crawl drains each listing
+# page's books before moving on, so the backlog stays small even on very
+# large catalogues.
+#
+# Requests carrying meta['retry_at'] (see retry.py) are held back until that
+# time without taking a queue or download slot.
+
+import os
+import pickle
+import shutil
+import tempfile
+import time
+
+from queuelib import queue
+from scrapy.core.scheduler import Scheduler
+from scrapy.pqueues import ScrapyPriorityQueue
+from scrapy.utils.request import request_from_dict
+
+# Request.to_dict() values that don't need to be stored
+REQUEST_DEFAULTS = {
+    'callback': None,
+    'errback': None,
+    'headers': {},
+    'method': 'GET',
+    'body': b'',
+    'cookies': {},
+    'meta': {},
+    'encoding': 'utf-8',
+    'priority': 0,
+    'dont_filter': False,
+    'flags': [],
+    'cb_kwargs': {},
+}
+
+
+def serialize_request(request, spider):
+    request_dict = request.to_dict(spider=spider)
+    compact = {
+        key: value for key, value in request_dict.items()
+        if key not in REQUEST_DEFAULTS or REQUEST_DEFAULTS[key] != value
+    }
+    try:
+        return pickle.dumps(compact, protocol=pickle.HIGHEST_PROTOCOL)
+    except (pickle.PicklingError, AttributeError, TypeError) as e:
+        raise ValueError(str(e)) from e
+
+
+def deserialize_request(data, spider):
+    return request_from_dict(pickle.loads(data), spider=spider)
+
+
+class CompactDiskQueue(queue.LifoDiskQueue):
+    """LIFO disk queue storing requests without their default fields."""
+
+    def __init__(self, crawler, key):
+        self.spider = crawler.spider
+        super().__init__(key)
+
+    @classmethod
+    def from_crawler(cls, crawler, key, *args, **kwargs):
+        return cls(crawler, key)
+
+    def push(self, request):
+        super().push(serialize_request(request, self.spider))
+
+    def pop(self):
+        data = super().pop()
+        if data is None:
+            return None
+        return deserialize_request(data, self.spider)
+
+
+class BoundedFrontierScheduler(Scheduler):
+    """Scheduler that keeps at most FRONTIER_MEMORY_LIMIT requests in memory.
+
+    Overflow goes to a disk queue in a new directory for each run, created
+    under FRONTIER_DIR (the system temporary directory by default) and
+    removed on close, so requests spilled by an earlier, interrupted run are
+    never picked up again. Requests are always popped from whichever queue holds the
+    highest priority, so spilling never changes the crawl order. When JOBDIR
+    is set Scrapy already keeps the whole queue on disk and this scheduler
+    behaves like the stock one.
+    """
+
+    def __init__(self, *args, memory_limit=10000, frontier_dir=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.memory_limit = memory_limit
+        self.frontier_dir = frontier_dir
+        self.spill = None
+        self._tmpdir = None
+        self.delayed = {}
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        scheduler = super().from_crawler(crawler)
+        scheduler.memory_limit = crawler.settings.getint('FRONTIER_MEMORY_LIMIT', 10000)
+        scheduler.frontier_dir = crawler.settings.get('FRONTIER_DIR')
+        return scheduler
+
+    def open(self, spider):
+        result = super().open(spider)
+        if self.dqs is None:
+            if self.frontier_dir:
+                os.makedirs(self.frontier_dir, exist_ok=True)
+            path = self._tmpdir = tempfile.mkdtemp(prefix='frontier-', dir=self.frontier_dir or None)
+            self.spill = ScrapyPriorityQueue.from_crawler(
+                self.crawler, downstream_queue_cls=CompactDiskQueue, key=path,
+            )
+        return result
+
+    def close(self, reason):
+        for call in self.delayed.values():
+            call.cancel()
+        if self.delayed:
+            self.stats.set_value('frontier/delayed_dropped', len(self.delayed), spider=self.spider)
+            self.delayed.clear()
+        if self.spill is not None:
+            self.spill.close()
+        if self._tmpdir:
+            shutil.rmtree(self._tmpdir, ignore_errors=True)
+        return super().close(reason)
+
+    def enqueue_request(self, request):
+        delay = request.meta.get('retry_at', 0) - time.time()
+        if delay > 0:
+            self._delay(request, delay)
+            return True
+        if self.spill is None:
+            return super().enqueue_request(request)
+        if not request.dont_filter and self.df.request_seen(request):
+            self.df.log(request, self.spider)
+            return False
+
+        if len(self.mqs) < self.memory_limit or not self._spill(request):
+            self._mqpush(request)
+            self.stats.inc_value('scheduler/enqueued/memory', spider=self.spider)
+        self.stats.inc_value('scheduler/enqueued', spider=self.spider)
+        self._update_size_stats()
+        return True
+
+    def _delay(self, request, delay):
+        from twisted.internet import reactor
+        self.delayed[id(request)] = reactor.callLater(delay, self._release, request)
+        self.stats.inc_value('frontier/delayed', spider=self.spider)
+        self.stats.max_value('frontier/delayed_max', len(self.delayed), spider=self.spider)
+
+    def _release(self, request):
+        # Back through the engine, which also wakes it up if it is waiting
+        del self.delayed[id(request)]
+        self.crawler.engine.crawl(request)
+
+    def _spill(self, request):
+        try:
+            self.spill.push(request)
+        except ValueError:
+            self.stats.inc_value('scheduler/unserializable', spider=self.spider)
+            return False
+        self.stats.inc_value('scheduler/enqueued/disk', spider=self.spider)
+        self.stats.inc_value('frontier/spilled', spider=self.spider)
+        return True
+
+    def _update_size_stats(self):
+        self.stats.max_value('frontier/memory_queue_max', len(self.mqs), spider=self.spider)
+        self.stats.max_value('frontier/disk_queue_max', len(self.spill), spider=self.spider)
+
+    def next_request(self):
+        if self.spill is None or self.spill.curprio is None:
+            return super().next_request()
+
+        # Lower numbers are higher priorities; ties go to the memory queue
+        if self.mqs.curprio is not None and self.mqs.curprio <= self.spill.curprio:
+            return super().next_request()
+
+        request = self.spill.pop()
+        if request is not None:
+            self.stats.inc_value('frontier/unspilled', spider=self.spider)
+            self.stats.inc_value('scheduler/dequeued/disk', spider=self.spider)
+            self.stats.inc_value('scheduler/dequeued', spider=self.spider)
+        return request
+
+    def __len__(self):
+        # Delayed requests count as pending so the spider isn't closed early
+        if self.spill is None:
+            return super().__len__() + len(self.delayed)
+        return len(self.mqs) + len(self.spill) + len(self.delayed)
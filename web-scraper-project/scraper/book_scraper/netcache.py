@@ -0,0 +1,176 @@
+# Persistent robots.txt and DNS cache shared across crawl runs.
+#
+# Enable with NETCACHE_PATH (a small SQLite file). Fresh robots.txt bodies
+# are parsed when the spider opens and DNS results are loaded into Scrapy's
+# resolver cache, so the first requests of a run go out without waiting for
+# robots.txt or a DNS lookup. Hits and misses are reported as
+# netcache/robots/* (PersistentRobotsTxtMiddleware) and netcache/dns/*
+# (NetCacheDnsExtension, which also works with ROBOTSTXT_OBEY = False) in the
+# crawl stats.
+
+import sqlite3
+import time
+from collections import Counter
+
+from scrapy import signals
+from scrapy.exceptions import NotConfigured
+from scrapy.downloadermiddlewares.robotstxt import RobotsTxtMiddleware
+from scrapy.resolver import CachingThreadedResolver, dnscache
+from scrapy.utils.httpobj import urlparse_cached
+
+# The resolver is shared by every crawler in the process and has no stats
+# collector of its own; NetCacheDnsExtension copies these counters into each
+# crawl's stats.
+dns_counts = Counter()
+
+
+class NetCacheStore:
+    def __init__(self, path):
+        self.path = path
+        self.db = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        self.db.execute('CREATE TABLE IF NOT EXISTS robots '
+                        '(netloc TEXT PRIMARY KEY, body BLOB, fetched_at REAL)')
+        self.db.execute('CREATE TABLE IF NOT EXISTS dns '
+                        '(host TEXT PRIMARY KEY, address TEXT, resolved_at REAL)')
+
+    def fresh_robots(self, ttl):
+        return self.db.execute('SELECT netloc, body FROM robots WHERE fetched_at >= ?',
+                               (time.time() - ttl,)).fetchall()
+
+    def save_robots(self, netloc, body):
+        self.db.execute('INSERT OR REPLACE INTO robots VALUES (?, ?, ?)',
+                        (netloc, body, time.time()))
+
+    def fresh_dns(self, ttl):
+        return self.db.execute('SELECT host, address FROM dns WHERE resolved_at >= ?',
+                               (time.time() - ttl,)).fetchall()
+
+    def save_dns(self, host, address):
+        self.db.execute('INSERT OR REPLACE INTO dns VALUES (?, ?, ?)',
+                        (host, address, time.time()))
+
+    def close(self):
+        self.db.close()
+
+
+class PersistentRobotsTxtMiddleware(RobotsTxtMiddleware):
+    """RobotsTxtMiddleware that reuses robots.txt rules from earlier runs."""
+
+    def __init__(self, crawler):
+        super().__init__(crawler)
+        path = crawler.settings.get('NETCACHE_PATH')
+        self.store = NetCacheStore(path) if path else None
+        self.ttl = crawler.settings.getint('NETCACHE_ROBOTSTXT_TTL', 24 * 3600)
+        self._cached = set()
+        self._seen = set()
+        if self.store:
+            crawler.signals.connect(self.spider_opened, signal=signals.spider_opened)
+            crawler.signals.connect(self.spider_closed, signal=signals.spider_closed)
+
+    def spider_opened(self, spider):
+        for netloc, body in self.store.fresh_robots(self.ttl):
+            self._parsers[netloc] = self._parserimpl.from_crawler(self.crawler, body)
+            self._cached.add(netloc)
+        self.crawler.stats.set_value('netcache/robots/loaded', len(self._cached))
+
+    def spider_closed(self, spider):
+        self.store.close()
+
+    def robot_parser(self, request, spider):
+        netloc = urlparse_cached(request).netloc
+        if self.store and netloc not in self._seen:
+            self._seen.add(netloc)
+            result = 'hit' if netloc in self._cached else 'miss'
+            self.crawler.stats.inc_value(f'netcache/robots/{result}')
+        return super().robot_parser(request, spider)
+
+    def _parse_robots(self, response, netloc, spider):
+        super()._parse_robots(response, netloc, spider)
+        # Server errors are retried next run instead of being cached
+        if self.store and response.status < 500:
+            self.store.save_robots(netloc, response.body)
+
+
+class PersistentCachingResolver(CachingThreadedResolver):
+    """CachingThreadedResolver whose cache is seeded from and saved to NETCACHE_PATH."""
+
+    def __init__(self, reactor, cache_size, timeout, store=None, ttl=3600):
+        super().__init__(reactor, cache_size, timeout)
+        self.store = store
+        self.path = store.path if store else None
+        self._persisted = set()
+        self._seen = set()
+        if store and cache_size:
+            for host, address in store.fresh_dns(ttl):
+                dnscache[host] = address
+                self._persisted.add(host)
+
+    @classmethod
+    def from_crawler(cls, crawler, reactor):
+        if crawler.settings.getbool('DNSCACHE_ENABLED'):
+            cache_size = crawler.settings.getint('DNSCACHE_SIZE')
+        else:
+            cache_size = 0
+        path = crawler.settings.get('NETCACHE_PATH')
+        return cls(
+            reactor,
+            cache_size,
+            crawler.settings.getfloat('DNS_TIMEOUT'),
+            store=NetCacheStore(path) if path else None,
+            ttl=crawler.settings.getint('NETCACHE_DNS_TTL', 3600),
+        )
+
+    def getHostByName(self, name, timeout=()):
+        if self.path and name not in self._seen:
+            self._seen.add(name)
+            dns_counts['hit' if name in self._persisted else 'miss'] += 1
+        return super().getHostByName(name, timeout)
+
+    def _cache_result(self, result, name):
+        if self.path:
+            if self.store is None:
+                # Closed when the last crawl ended; a later crawl in the same
+                # process (see daemon.py) reopens it
+                self.store = NetCacheStore(self.path)
+            self.store.save_dns(name, result)
+        return super()._cache_result(result, name)
+
+    def close_store(self):
+        if self.store is not None:
+            self.store.close()
+            self.store = None
+
+
+class NetCacheDnsExtension:
+    """Copies the DNS cache counters into each crawl's stats and closes the
+    resolver's store once no crawl in the process is running."""
+
+    # Crawls running in this process; they all share one resolver
+    running = 0
+
+    def __init__(self, crawler):
+        self.crawler = crawler
+        self.counts_at_open = Counter()
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        if not crawler.settings.get('NETCACHE_PATH'):
+            raise NotConfigured
+        ext = cls(crawler)
+        crawler.signals.connect(ext.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(ext.spider_closed, signal=signals.spider_closed)
+        return ext
+
+    def spider_opened(self, spider):
+        NetCacheDnsExtension.running += 1
+        self.counts_at_open = dns_counts.copy()
+
+    def spider_closed(self, spider):
+        for key, count in (dns_counts - self.counts_at_open).items():
+            self.crawler.stats.set_value(f'netcache/dns/{key}', count)
+        NetCacheDnsExtension.running -= 1
+        if not NetCacheDnsExtension.running:
+            from twisted.internet import reactor
+            resolver = getattr(reactor, 'resolver', None)
+            if isinstance(resolver, PersistentCachingResolver):
+                resolver.close_store()
@@ -1,4 +1,43 @@
-﻿import pymongo
+﻿import json
+import logging
+import urllib.request
+
+import pymongo
+from itemadapter import ItemAdapter
+from scrapy.exceptions import NotConfigured
+from scrapy.utils.defer import deferred_from_coro
+from twisted.internet.threads import deferToThread
+
+logger = logging.getLogger(__name__)
+
+# MongoClient instances shared within the process, keyed by URI. A
+# long-running process (see daemon.py) keeps its own reference so the
+# client and its connection pool survive from one crawl to the next.
+# Asynchronous (asyncio) clients are kept apart from the blocking ones.
+_mongo_clients = {}
+
+
+def acquire_mongo_client(mongo_uri, asynchronous=False):
+    key = (mongo_uri, asynchronous)
+    client, refs = _mongo_clients.get(key, (None, 0))
+    if client is None:
+        client_class = pymongo.AsyncMongoClient if asynchronous else pymongo.MongoClient
+        client = client_class(mongo_uri)
+    _mongo_clients[key] = (client, refs + 1)
+    return client
+
+
+def release_mongo_client(mongo_uri, asynchronous=False):
+    # The last reference closes the client; for an asynchronous client the
+    # close() coroutine is returned for the caller to await
+    key = (mongo_uri, asynchronous)
+    client, refs = _mongo_clients[key]
+    if refs > 1:
+        _mongo_clients[key] = (client, refs - 1)
+        return None
+    del _mongo_clients[key]
+    return client.close()
+
 
 class MongoDBPipeline:
     def __init__(self, mongo_uri, mongo_db):
@@ -13,12 +52,76 @@ class MongoDBPipeline:
         )
     
     def open_spider(self, spider):
-        self.client = pymongo.MongoClient(self.mongo_uri)
+        self.client = acquire_mongo_client(self.mongo_uri)
         self.db = self.client[self.mongo_db]
     
     def close_spider(self, spider):
-        self.client.close()
+        release_mongo_client(self.mongo_uri)
     
     def process_item(self, item, spider):
         self.db['books'].insert_one(dict(item))
         return item
+
+
+class AsyncMongoDBPipeline(MongoDBPipeline):
+    """MongoDBPipeline on pymongo's asyncio client: inserts are awaited on the
+    crawler's event loop instead of blocking it, so downloads and other items
+    keep moving while MongoDB answers."""
+
+    def open_spider(self, spider):
+        self.client = acquire_mongo_client(self.mongo_uri, asynchronous=True)
+        self.db = self.client[self.mongo_db]
+
+    def close_spider(self, spider):
+        closing = release_mongo_client(self.mongo_uri, asynchronous=True)
+        if closing is not None:
+            # Scrapy only awaits coroutines from process_item; hand it a Deferred
+            return deferred_from_coro(closing)
+        return None
+
+    async def process_item(self, item, spider):
+        await self.db['books'].insert_one(dict(item))
+        return item
+
+
+class DashboardPushPipeline:
+    """Push scraped items to the live dashboard (visualization/dashboard_server.py)."""
+
+    def __init__(self, url, batch_size):
+        self.url = url
+        self.batch_size = batch_size
+        self.buffer = []
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        url = crawler.settings.get('DASHBOARD_URL')
+        if not url:
+            raise NotConfigured
+        return cls(
+            url=url.rstrip('/') + '/api/items',
+            batch_size=crawler.settings.getint('DASHBOARD_BATCH_SIZE', 50)
+        )
+
+    def _post(self, books):
+        body = json.dumps(books, ensure_ascii=False).encode('utf-8')
+        request = urllib.request.Request(self.url, data=body, headers={'Content-Type': 'application/json'})
+        with urllib.request.urlopen(request, timeout=5) as response:
+            response.read()
+
+    def flush(self):
+        if not self.buffer:
+            return None
+        books, self.buffer = self.buffer, []
+        # Off the reactor thread; a dashboard that is down must not stall the crawl
+        d = deferToThread(self._post, books)
+        d.addErrback(lambda failure: logger.warning('Dashboard push failed: %s', failure.value))
+        return d
+
+    def close_spider(self, spider):
+        return self.flush()
+
+    def process_item(self, item, spider):
+        self.buffer.append(ItemAdapter(item).asdict())
+        if len(self.buffer) >= self.batch_size:
+            self.flush()
+        return item
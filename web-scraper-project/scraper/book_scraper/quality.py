@@ -0,0 +1,359 @@
+# Streaming data-quality monitor.
+#
+# QualityMonitorPipeline profiles every item field as it goes by, in constant
+# memory: null rate, a histogram of value lengths, a HyperLogLog estimate of
+# distinct values, and the share of values matching the field's pattern
+# (QUALITY_PATTERNS: price, rating, availability...). Every
+# QUALITY_CHECK_INTERVAL items the profile is compared with a baseline
+# profile from a known-good crawl, and a field that has drifted raises an
+# alert: a repeated availability text stops matching its pattern, a doubled
+# description shifts the length histogram, a broken selector turns up as
+# nulls or as one value for every item. With QUALITY_ACTION = 'close' the
+# first alert stops the crawl, so a bad crawl costs minutes, not a full run.
+#
+# The first crawl with QUALITY_BASELINE set (a path; %(name)s is the spider
+# name) records the baseline at the end, e.g.
+#
+#     scrapy crawl books -s QUALITY_BASELINE=../data/quality/%(name)s.json
+#
+# and later crawls with the same setting are checked against it.
+
+import hashlib
+import json
+import logging
+import math
+import os
+import re
+from collections import Counter, namedtuple
+
+from itemadapter import ItemAdapter
+from scrapy.exceptions import NotConfigured
+
+from book_scraper.checkpoint import atomic_write
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PATTERNS = {
+    'price': r'£\d+\.\d{2}',
+    'rating': r'One|Two|Three|Four|Five',
+    'availability': r'In stock(?: \(\d+ available\))?|Out of stock',
+    'image_url': r'https?://\S+',
+    'product_url': r'https?://\S+',
+    'scraped_date': r'\d{4}-\d\d-\d\dT\d\d:\d\d:\d\d(?:\.\d+)?',
+}
+
+# Length histogram buckets are half octaves (0, 1, then 2 ** (k / 2)): a
+# doubled text moves two buckets, a few characters more or less rarely one
+BUCKETS_PER_OCTAVE = 2
+# Fields with at least this share of distinct values are expected to be unique
+UNIQUE_RATIO = 0.9
+
+Alert = namedtuple('Alert', 'field check value expected')
+
+
+def length_bucket(length):
+    if length == 0:
+        return 0
+    return 1 + int(math.log2(length) * BUCKETS_PER_OCTAVE)
+
+
+def bucket_length(bucket):
+    # Smallest length in the bucket
+    return 0 if bucket == 0 else math.ceil(2 ** ((bucket - 1) / BUCKETS_PER_OCTAVE))
+
+
+class HyperLogLog:
+    """Distinct-value estimate in 2 ** precision bytes (Flajolet et al.,
+    2007, with linear counting for small cardinalities); about 3% error at
+    the default precision."""
+
+    def __init__(self, precision=10, registers=None):
+        self.precision = precision
+        self.registers = bytearray(registers or bytes(1 << precision))
+        # Kept up to date as registers change, so estimate() doesn't scan them
+        self.inverse_sum = sum(2.0 ** -r for r in self.registers)
+        self.zeros = self.registers.count(0)
+
+    def add(self, value):
+        h = int.from_bytes(hashlib.blake2b(value.encode('utf-8', 'surrogatepass'), digest_size=8).digest(), 'big')
+        index = h >> (64 - self.precision)
+        rest = h & ((1 << (64 - self.precision)) - 1)
+        rank = 64 - self.precision - rest.bit_length() + 1
+        old = self.registers[index]
+        if rank > old:
+            self.registers[index] = rank
+            self.inverse_sum += 2.0 ** -rank - 2.0 ** -old
+            if not old:
+                self.zeros -= 1
+
+    def estimate(self):
+        m = len(self.registers)
+        estimate = 0.7213 / (1 + 1.079 / m) * m * m / self.inverse_sum
+        if estimate <= 2.5 * m and self.zeros:
+            return m * math.log(m / self.zeros)
+        return estimate
+
+
+class FieldProfile:
+    def __init__(self, pattern=None):
+        self.pattern = re.compile(pattern) if pattern else None
+        self.count = 0
+        self.nulls = 0
+        self.matches = 0
+        self.lengths = Counter()
+        self.distinct = HyperLogLog()
+
+    def add(self, value):
+        self.count += 1
+        if value is None:
+            self.nulls += 1
+            return
+        if not isinstance(value, str):
+            value = json.dumps(value, ensure_ascii=False, default=str) if isinstance(value, (list, dict)) else str(value)
+        value = value.strip()
+        if not value:
+            self.nulls += 1
+            return
+        self.lengths[length_bucket(len(value))] += 1
+        self.distinct.add(value)
+        if self.pattern is not None and self.pattern.fullmatch(value):
+            self.matches += 1
+
+    @property
+    def present(self):
+        return self.count - self.nulls
+
+    @property
+    def null_rate(self):
+        return self.nulls / self.count if self.count else 0.0
+
+    @property
+    def conformance(self):
+        # Share of non-null values matching the pattern (None without one)
+        if self.pattern is None or not self.present:
+            return None
+        return self.matches / self.present
+
+    @property
+    def distinct_ratio(self):
+        return min(1.0, self.distinct.estimate() / self.present) if self.present else 0.0
+
+    def length_bucket_quantile(self, q):
+        rank = q * (self.present - 1)
+        seen = 0
+        for bucket in sorted(self.lengths):
+            seen += self.lengths[bucket]
+            if seen > rank:
+                return bucket
+        return 0
+
+    def length_quantile(self, q):
+        return bucket_length(self.length_bucket_quantile(q))
+
+    def summary(self):
+        return {
+            'null_rate': round(self.null_rate, 4),
+            'conformance': None if self.conformance is None else round(self.conformance, 4),
+            'length_p50': self.length_quantile(0.5),
+            'distinct': round(self.distinct.estimate()),
+        }
+
+    def to_dict(self):
+        return {
+            'pattern': self.pattern.pattern if self.pattern else None,
+            'count': self.count,
+            'nulls': self.nulls,
+            'matches': self.matches,
+            'lengths': {str(bucket): count for bucket, count in sorted(self.lengths.items())},
+            'distinct': self.distinct.registers.hex(),
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        profile = cls(data['pattern'])
+        profile.count = data['count']
+        profile.nulls = data['nulls']
+        profile.matches = data['matches']
+        profile.lengths = Counter({int(bucket): count for bucket, count in data['lengths'].items()})
+        profile.distinct = HyperLogLog(registers=bytes.fromhex(data['distinct']))
+        return profile
+
+
+def rate_drifted(value, expected, count, max_drift):
+    # Beyond max_drift, and beyond three standard errors of a sample this size
+    noise = 3 * math.sqrt(expected * (1 - expected) / count) if count else 1.0
+    return abs(value - expected) > max(max_drift, noise)
+
+
+def lengths_drifted(current, expected, max_psi):
+    # The histograms differ in shape beyond sampling noise (two samples of
+    # one distribution differ by a PSI of about (buckets - 1) * (1/n + 1/N)),
+    # and by a lot: the 10th, 50th or 90th percentile halved or doubled. A
+    # stock count going from two digits to one moves a bucket, not an octave.
+    buckets = len(set(current.lengths) | set(expected.lengths))
+    noise = (buckets - 1) * (1 / current.present + 1 / expected.present)
+    if population_stability(current.lengths, expected.lengths) <= max(max_psi, 3 * noise):
+        return False
+    return any(abs(current.length_bucket_quantile(q) - expected.length_bucket_quantile(q)) >= BUCKETS_PER_OCTAVE
+               for q in (0.1, 0.5, 0.9))
+
+
+def population_stability(current, expected, floor=1e-4):
+    """Population Stability Index of two histograms (0: same shape; above
+    0.25 is usually read as a real shift)."""
+    current_total = sum(current.values())
+    expected_total = sum(expected.values())
+    if not current_total or not expected_total:
+        return 0.0
+    psi = 0.0
+    for bucket in set(current) | set(expected):
+        c = max(current.get(bucket, 0) / current_total, floor)
+        e = max(expected.get(bucket, 0) / expected_total, floor)
+        psi += (c - e) * math.log(c / e)
+    return psi
+
+
+class ItemProfile:
+    """Per-field profiles of a stream of items."""
+
+    def __init__(self, patterns=None):
+        self.patterns = DEFAULT_PATTERNS if patterns is None else patterns
+        self.items = 0
+        self.fields = {}
+
+    def add(self, item):
+        self.items += 1
+        adapter = ItemAdapter(item)
+        for field in adapter.field_names():
+            profile = self.fields.get(field)
+            if profile is None:
+                # A field first seen now was missing from every item before it
+                profile = self.fields[field] = FieldProfile(self.patterns.get(field))
+                profile.count = profile.nulls = self.items - 1
+            profile.add(adapter.get(field))
+        for field, profile in self.fields.items():
+            if profile.count < self.items:
+                profile.add(None)
+
+    def compare(self, baseline, max_rate_drift=0.1, max_length_psi=0.25):
+        alerts = []
+        for field, expected in baseline.fields.items():
+            current = self.fields.get(field)
+            if current is None or not current.count:
+                alerts.append(Alert(field, 'missing', 0, expected.count))
+                continue
+            if rate_drifted(current.null_rate, expected.null_rate, current.count, max_rate_drift):
+                alerts.append(Alert(field, 'null_rate', current.null_rate, expected.null_rate))
+            if not current.present or not expected.present:
+                continue
+            if current.conformance is not None and expected.conformance is not None and \
+                    rate_drifted(current.conformance, expected.conformance, current.present, max_rate_drift):
+                alerts.append(Alert(field, 'conformance', current.conformance, expected.conformance))
+            if lengths_drifted(current, expected, max_length_psi):
+                alerts.append(Alert(field, 'length', current.length_quantile(0.5), expected.length_quantile(0.5)))
+            if expected.distinct_ratio >= UNIQUE_RATIO:
+                if expected.distinct_ratio - current.distinct_ratio > max_rate_drift:
+                    alerts.append(Alert(field, 'distinct', current.distinct_ratio, expected.distinct_ratio))
+            elif round(current.distinct.estimate()) <= 1 < round(expected.distinct.estimate()) and \
+                    current.present > 1:
+                # Every value the same where the baseline had several
+                alerts.append(Alert(field, 'distinct', 1, round(expected.distinct.estimate())))
+        return alerts
+
+    def to_dict(self):
+        return {'items': self.items, 'fields': {field: profile.to_dict() for field, profile in self.fields.items()}}
+
+    @classmethod
+    def from_dict(cls, data):
+        profile = cls()
+        profile.items = data['items']
+        profile.fields = {field: FieldProfile.from_dict(value) for field, value in data['fields'].items()}
+        return profile
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        atomic_write(path, json.dumps(self.to_dict(), indent=1).encode('utf-8'))
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls.from_dict(json.load(f))
+
+
+class QualityMonitorPipeline:
+    def __init__(self, crawler, path):
+        settings = crawler.settings
+        self.crawler = crawler
+        self.stats = crawler.stats
+        self.path = path
+        self.action = settings.get('QUALITY_ACTION', 'warn')
+        if self.action not in ('warn', 'close'):
+            raise ValueError(f'Unknown QUALITY_ACTION: {self.action!r}')
+        self.min_items = settings.getint('QUALITY_MIN_ITEMS', 100)
+        self.interval = settings.getint('QUALITY_CHECK_INTERVAL', 100)
+        self.max_rate_drift = settings.getfloat('QUALITY_MAX_RATE_DRIFT', 0.1)
+        self.max_length_psi = settings.getfloat('QUALITY_MAX_LENGTH_PSI', 0.25)
+        # QUALITY_PATTERNS adds to or replaces the default patterns; None drops one
+        patterns = dict(DEFAULT_PATTERNS, **settings.getdict('QUALITY_PATTERNS'))
+        self.profile = ItemProfile({field: pattern for field, pattern in patterns.items() if pattern})
+        self.baseline = None
+        self.alerted = set()
+        self.closing = False
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        path = crawler.settings.get('QUALITY_BASELINE')
+        if not path:
+            raise NotConfigured
+        return cls(crawler, path)
+
+    def open_spider(self, spider):
+        self.path = self.path % {'name': spider.name} if '%(' in self.path else self.path
+        if os.path.exists(self.path):
+            self.baseline = ItemProfile.load(self.path)
+            logger.info('Checking items against the quality baseline in %s (%d items)',
+                        self.path, self.baseline.items)
+        else:
+            logger.info('No quality baseline at %s; this crawl will record it', self.path)
+
+    def process_item(self, item, spider):
+        self.profile.add(item)
+        if self.baseline is not None and self.profile.items >= self.min_items and \
+                self.profile.items % self.interval == 0:
+            self.check(spider)
+        return item
+
+    def check(self, spider):
+        alerts = self.profile.compare(self.baseline, self.max_rate_drift, self.max_length_psi)
+        for alert in alerts:
+            if (alert.field, alert.check) in self.alerted:
+                continue
+            self.alerted.add((alert.field, alert.check))
+            self.stats.inc_value('quality/alerts')
+            self.stats.inc_value(f'quality/alerts/{alert.field}/{alert.check}')
+            logger.warning('Quality drift after %d items: %s %s is %s, baseline %s',
+                           self.profile.items, alert.field, alert.check,
+                           format_value(alert.value), format_value(alert.expected))
+        if alerts and self.action == 'close' and not self.closing:
+            self.closing = True
+            self.crawler.engine.close_spider(spider, 'quality_drift')
+        return alerts
+
+    def close_spider(self, spider):
+        if self.baseline is not None and self.profile.items >= self.min_items:
+            self.check(spider)
+        for field, profile in self.profile.fields.items():
+            for name, value in profile.summary().items():
+                if value is not None:
+                    self.stats.set_value(f'quality/{field}/{name}', value)
+        if self.baseline is None:
+            if self.profile.items >= self.min_items:
+                self.profile.save(self.path)
+                logger.info('Recorded the quality baseline of %d items in %s', self.profile.items, self.path)
+            else:
+                logger.warning('Only %d items; not recording a quality baseline (QUALITY_MIN_ITEMS is %d)',
+                               self.profile.items, self.min_items)
+
+
+def format_value(value):
+    return f'{value:.3f}' if isinstance(value, float) else str(value)
@@ -0,0 +1,225 @@
+# Retries with exponential backoff, and a dead-letter store for requests
+# that still fail.
+#
+# BackoffRetryMiddleware replaces Scrapy's RetryMiddleware. Instead of
+# sending a failed request straight back to the downloader, it stamps the
+# retry with meta['retry_at'] (RETRY_BACKOFF_BASE * 2 ** attempt seconds,
+# capped at RETRY_BACKOFF_MAX, with jitter, or the server's Retry-After) and
+# BoundedFrontierScheduler holds it back until then, so waiting retries
+# don't use download slots.
+#
+# Once RETRY_TIMES is exhausted the request is written to DEADLETTER_PATH
+# (SQLite) with its callback, reason and attempt count. A follow-up run
+#
+#     scrapy crawl books -s DEADLETTER_PATH=../data/deadletter.sqlite -s DEADLETTER_REPLAY=1
+#
+# fetches only that spider's requests; each one that now gets a 2xx/3xx
+# response is removed. Ones that fail again stay in the store. Several
+# spiders can share one DEADLETTER_PATH.
+
+import json
+import logging
+import random
+import sqlite3
+import time
+
+from scrapy import Request, signals
+from scrapy.downloadermiddlewares.retry import RetryMiddleware
+from scrapy.exceptions import NotConfigured
+from scrapy.utils.python import global_object_name
+from scrapy.utils.response import response_status_message
+
+logger = logging.getLogger(__name__)
+
+# Request meta that belongs to one attempt and isn't stored for replay. The
+# proxy keys may hold credentials and are set again by HttpProxyMiddleware,
+# and the redirect_* keys describe the old redirect chain
+TRANSIENT_META = {
+    'retry_times', 'retry_at', 'depth', 'download_latency', 'download_timeout',
+    'checkpoint_fp', 'deadletter_fp', 'proxy', '_scheme_proxy', '_auth_proxy',
+}
+TRANSIENT_META_PREFIXES = ('redirect_',)
+
+
+def backoff_delay(attempt, base, cap, rng=random):
+    # "Equal jitter": half the exponential delay plus a random share of the other half
+    delay = min(cap, base * 2 ** (attempt - 1))
+    return delay / 2 + rng.uniform(0, delay / 2)
+
+
+def parse_retry_after(response):
+    value = response.headers.get('Retry-After')
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        # HTTP dates aren't worth the parsing; fall back to backoff
+        return None
+
+
+def replayable_meta(meta):
+    kept = {}
+    for key, value in meta.items():
+        if key in TRANSIENT_META or key.startswith(TRANSIENT_META_PREFIXES):
+            continue
+        try:
+            json.dumps(value)
+        except (TypeError, ValueError):
+            continue
+        kept[key] = value
+    return kept
+
+
+class DeadLetterStore:
+    COLUMNS = ('spider TEXT, fingerprint TEXT, url TEXT, method TEXT, callback TEXT, errback TEXT, '
+               'cb_kwargs TEXT, meta TEXT, priority INTEGER, reason TEXT, attempts INTEGER, failed_at REAL, '
+               'PRIMARY KEY (spider, fingerprint)')
+
+    def __init__(self, path):
+        self.path = path
+        self.db = sqlite3.connect(path, isolation_level=None)
+        self.db.execute(f'CREATE TABLE IF NOT EXISTS deadletter ({self.COLUMNS})')
+        columns = [row[1] for row in self.db.execute('PRAGMA table_info(deadletter)')]
+        if 'spider' not in columns:
+            self._migrate()
+
+    def _migrate(self):
+        # Stores written before the spider column: keep the entries, with no spider
+        self.db.execute('BEGIN')
+        self.db.execute('ALTER TABLE deadletter RENAME TO deadletter_old')
+        self.db.execute(f'CREATE TABLE deadletter ({self.COLUMNS})')
+        self.db.execute('INSERT INTO deadletter SELECT NULL, * FROM deadletter_old')
+        self.db.execute('DROP TABLE deadletter_old')
+        self.db.execute('COMMIT')
+
+    def add(self, spider, fingerprint, request, reason, attempts, priority):
+        self.db.execute(
+            'INSERT OR REPLACE INTO deadletter VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            (spider, fingerprint, request.url, request.method,
+             getattr(request.callback, '__name__', None), getattr(request.errback, '__name__', None),
+             json.dumps(request.cb_kwargs, default=str), json.dumps(replayable_meta(request.meta)),
+             priority, reason, attempts, time.time()),
+        )
+
+    def remove(self, spider, fingerprint):
+        self.db.execute('DELETE FROM deadletter WHERE fingerprint = ? AND (spider = ? OR spider IS NULL)',
+                        (fingerprint, spider))
+
+    def entries(self, spider):
+        # A spider's own entries, and any from before entries had a spider
+        cursor = self.db.execute('SELECT fingerprint, url, method, callback, errback, cb_kwargs, meta, priority '
+                                 'FROM deadletter WHERE spider = ? OR spider IS NULL ORDER BY failed_at',
+                                 (spider,))
+        return cursor.fetchall()
+
+    def __len__(self):
+        return self.db.execute('SELECT COUNT(*) FROM deadletter').fetchone()[0]
+
+    def close(self):
+        self.db.close()
+
+
+class BackoffRetryMiddleware(RetryMiddleware):
+    def __init__(self, crawler):
+        super().__init__(crawler.settings)
+        self.crawler = crawler
+        self.stats = crawler.stats
+        self.base = crawler.settings.getfloat('RETRY_BACKOFF_BASE', 2)
+        self.cap = crawler.settings.getfloat('RETRY_BACKOFF_MAX', 120)
+        path = crawler.settings.get('DEADLETTER_PATH')
+        self.store = DeadLetterStore(path) if path else None
+        if self.store is not None:
+            crawler.signals.connect(self.spider_closed, signal=signals.spider_closed)
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        return cls(crawler)
+
+    def spider_closed(self, spider):
+        self.store.close()
+
+    def process_response(self, request, response, spider):
+        if not request.meta.get('dont_retry', False) and response.status in self.retry_http_codes:
+            reason = response_status_message(response.status)
+            retry = self._retry(request, reason, spider, retry_after=parse_retry_after(response))
+            if retry is not None:
+                return retry
+        elif self.store is not None and 'deadletter_fp' in request.meta:
+            if 200 <= response.status < 400:
+                # A replayed request got through this time
+                self.store.remove(spider.name, request.meta['deadletter_fp'])
+                self.stats.inc_value('deadletter/recovered')
+            else:
+                # e.g. 404 / 403 / 410: not retryable, but not recovered either
+                self.stats.inc_value('deadletter/still_failing')
+        return response
+
+    def _retry(self, request, reason, spider, retry_after=None):
+        retry = super()._retry(request, reason, spider)
+        if retry is None:
+            self._dead_letter(request, reason, spider)
+            return None
+        if retry_after is not None:
+            delay = min(retry_after, self.cap)
+        else:
+            delay = backoff_delay(retry.meta['retry_times'], self.base, self.cap)
+        retry.meta['retry_at'] = time.time() + delay
+        self.stats.inc_value('retry/backoff_seconds', delay)
+        return retry
+
+    def _dead_letter(self, request, reason, spider):
+        if self.store is None:
+            return
+        if isinstance(reason, Exception):
+            reason = f'{global_object_name(reason.__class__)}: {reason}'
+        fingerprint = request.meta.get('deadletter_fp') or \
+            self.crawler.request_fingerprinter.fingerprint(request).hex()
+        retries = request.meta.get('retry_times', 0)
+        # Replay at the priority the request had before retries lowered it
+        priority = request.priority - retries * request.meta.get('priority_adjust', self.priority_adjust)
+        self.store.add(spider.name, fingerprint, request, str(reason), retries + 1, priority)
+        self.stats.inc_value('deadletter/stored')
+        logger.warning('Dead-lettered %s after %d attempts: %s', request, retries + 1, reason)
+
+
+class DeadLetterReplayMiddleware:
+    """Spider middleware: with DEADLETTER_REPLAY, start from the dead letters
+    instead of the spider's own start requests."""
+
+    def __init__(self, crawler, path):
+        self.crawler = crawler
+        self.path = path
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        path = crawler.settings.get('DEADLETTER_PATH')
+        if not path or not crawler.settings.getbool('DEADLETTER_REPLAY'):
+            raise NotConfigured
+        return cls(crawler, path)
+
+    async def process_start(self, start):
+        spider = self.crawler.spider
+        store = DeadLetterStore(self.path)
+        entries = store.entries(spider.name)
+        store.close()
+        logger.info('Replaying %d dead-lettered requests from %s', len(entries), self.path)
+        for fingerprint, url, method, callback, errback, cb_kwargs, meta, priority in entries:
+            missing = [name for name in (callback, errback) if name and not hasattr(spider, name)]
+            if missing:
+                # e.g. a legacy entry of another spider, or a renamed callback
+                logger.warning('Skipping dead-lettered %s: spider %r has no %s', url, spider.name,
+                               ', '.join(missing))
+                self.crawler.stats.inc_value('deadletter/skipped')
+                continue
+            meta = json.loads(meta)
+            meta['deadletter_fp'] = fingerprint
+            self.crawler.stats.inc_value('deadletter/replayed')
+            yield Request(
+                url,
+                method=method,
+                callback=getattr(spider, callback) if callback else None,
+                errback=getattr(spider, errback) if errback else None,
+                cb_kwargs=json.loads(cb_kwargs),
+                meta=meta,
+                priority=priority,
+                dont_filter=True,
+            )
@@ -0,0 +1,262 @@
+# Stratified sampling estimators for approximate analytics.
+#
+# BooksSpider's sampling mode (scrapy crawl books -a sample=1) treats every
+# category as a stratum, draws books from each one by simple random sampling
+# without replacement and streams them into StratifiedEstimator. It reports
+# the same numbers as analyze_complete.py (average price, price bands and
+# rating mix, overall and per category), each with a confidence interval,
+# and the crawl stops as soon as the overall intervals are narrow enough.
+# Categories with no sampled book (every draw failed, or the crawl stopped
+# early) are left out of the overall estimates and listed as uncovered.
+
+import math
+import random
+import re
+from collections import Counter
+from statistics import NormalDist
+
+PRICE_PATTERN = re.compile(r'([\d\.]+)')
+RATING_MAP = {'One': 1, 'Two': 2, 'Three': 3, 'Four': 4, 'Five': 5}
+PRICE_BANDS = ('cheap', 'medium', 'expensive')
+
+# Books drawn from every category before the intervals are trusted; with
+# fewer, small categories give unstable variance estimates and the
+# intervals come out too narrow
+MIN_PER_STRATUM = 5
+
+
+def price_band(price):
+    # Same bands as analyze_complete.py
+    if price < 20:
+        return 'cheap'
+    if price < 50:
+        return 'medium'
+    return 'expensive'
+
+
+def parse_price(value):
+    match = PRICE_PATTERN.search(str(value or ''))
+    if not match:
+        return None
+    try:
+        return float(match.group(1))
+    except ValueError:
+        return None
+
+
+def interval(estimate, half_width):
+    return {'estimate': estimate, 'ci': [estimate - half_width, estimate + half_width]}
+
+
+class Stratum:
+    """Running estimates for one category, sampled without replacement."""
+
+    def __init__(self, name, size, rng):
+        self.name = name
+        self.size = size
+        self.n = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.bands = Counter()
+        self.ratings = Counter()
+        # Random order in which the category's books are drawn
+        self.order = rng.sample(range(size), size)
+        self.drawn = 0
+        self.failed = 0
+
+    @property
+    def in_flight(self):
+        return self.drawn - self.n - self.failed
+
+    def draw(self):
+        index = self.order[self.drawn]
+        self.drawn += 1
+        return index
+
+    def add(self, price, rating):
+        # Welford's online mean / variance
+        self.n += 1
+        delta = price - self.mean
+        self.mean += delta / self.n
+        self.m2 += delta * (price - self.mean)
+        self.bands[price_band(price)] += 1
+        if rating:
+            self.ratings[rating] += 1
+
+    def fpc(self):
+        # Finite population correction; 0 once the whole category is sampled
+        return max(0.0, 1 - self.n / self.size)
+
+    def price_variance(self):
+        return self.m2 / (self.n - 1) if self.n > 1 else 0.0
+
+    def proportion(self, count):
+        return count / self.n if self.n else 0.0
+
+    def proportion_variance(self, count):
+        # Add-one smoothing so an all-or-nothing sample (p = 0 or 1) doesn't
+        # claim zero variance
+        p = (count + 1) / (self.n + 2)
+        return p * (1 - p) * self.n / (self.n - 1) if self.n > 1 else 0.0
+
+    def mean_error(self):
+        # Variance of the sample mean
+        return self.fpc() * self.price_variance() / self.n if self.n else math.inf
+
+    def proportion_error(self, count):
+        return self.fpc() * self.proportion_variance(count) / self.n if self.n else math.inf
+
+    def relative_variance(self):
+        # Largest unit variance among the tracked statistics, used to decide
+        # where the next draw helps most
+        if self.n < 2:
+            return math.inf
+        variances = [self.price_variance() / self.mean ** 2 if self.mean else 0.0]
+        variances += [self.proportion_variance(self.bands[band]) for band in PRICE_BANDS]
+        variances += [self.proportion_variance(self.ratings[r]) for r in range(1, 6)]
+        return max(variances)
+
+
+class StratifiedEstimator:
+    def __init__(self, confidence=0.95, seed=None):
+        self.confidence = confidence
+        self.z = NormalDist().inv_cdf((1 + confidence) / 2)
+        self.rng = random.Random(seed)
+        self.strata = {}
+
+    def add_stratum(self, name, size):
+        self.strata[name] = Stratum(name, size, self.rng)
+        return self.strata[name]
+
+    @property
+    def population(self):
+        return sum(stratum.size for stratum in self.strata.values())
+
+    @property
+    def sampled(self):
+        return sum(stratum.n for stratum in self.strata.values())
+
+    def add(self, category, price, rating):
+        self.strata[category].add(price, rating)
+
+    def _weights(self, strata=None):
+        strata = list(self.strata.values()) if strata is None else strata
+        total = sum(stratum.size for stratum in strata)
+        return [(stratum.size / total, stratum) for stratum in strata]
+
+    def uncovered(self):
+        return [stratum for stratum in self.strata.values() if not stratum.n]
+
+    def _covered_weights(self):
+        # A stratum without a sampled book has no estimate: leave it out and
+        # reweight the others to their share of the covered population
+        return self._weights([stratum for stratum in self.strata.values() if stratum.n])
+
+    def mean_price(self):
+        weights = self._covered_weights()
+        if not weights:
+            return 0.0, math.inf
+        estimate = variance = 0.0
+        for weight, stratum in weights:
+            estimate += weight * stratum.mean
+            variance += weight ** 2 * stratum.mean_error()
+        return estimate, self.z * math.sqrt(variance)
+
+    def proportion(self, counts_of):
+        weights = self._covered_weights()
+        if not weights:
+            return 0.0, math.inf
+        estimate = variance = 0.0
+        for weight, stratum in weights:
+            count = counts_of(stratum)
+            estimate += weight * stratum.proportion(count)
+            variance += weight ** 2 * stratum.proportion_error(count)
+        return estimate, self.z * math.sqrt(variance)
+
+    def overall_proportions(self):
+        result = {}
+        for band in PRICE_BANDS:
+            result[band] = self.proportion(lambda stratum: stratum.bands[band])
+        for rating in range(1, 6):
+            result[rating] = self.proportion(lambda stratum: stratum.ratings[rating])
+        return result
+
+    def ready(self):
+        return bool(self.strata) and all(
+            stratum.n >= min(MIN_PER_STRATUM, stratum.size - stratum.failed) for stratum in self.strata.values())
+
+    def precision_reached(self, precision):
+        """True once the overall average price is known to within ±precision
+        (relative) and every band / rating share to within ±precision."""
+        if not self.ready():
+            return False
+        mean, half_width = self.mean_price()
+        if not mean or half_width / mean > precision:
+            return False
+        return all(half_width <= precision for _, half_width in self.overall_proportions().values())
+
+    def next_strata(self, count):
+        """Pick strata for the next `count` draws.
+
+        Strata with fewer than MIN_PER_STRATUM draws come first; after that each draw
+        goes where it removes the most variance (a greedy Neyman allocation).
+        """
+        pending = Counter()
+        picks = []
+        for _ in range(count):
+            best, best_gain = None, -1.0
+            for weight, stratum in self._weights():
+                if stratum.drawn + pending[stratum.name] >= stratum.size:
+                    continue
+                active = stratum.n + stratum.in_flight + pending[stratum.name]
+                if active < MIN_PER_STRATUM:
+                    gain = math.inf
+                elif stratum.n < 2:
+                    # Wait for a variance estimate before drawing more
+                    continue
+                else:
+                    gain = weight ** 2 * stratum.relative_variance() / (active * (active + 1))
+                if gain > best_gain:
+                    best, best_gain = stratum, gain
+            if best is None:
+                break
+            pending[best.name] += 1
+            picks.append(best)
+        return picks
+
+    def report(self):
+        mean, half_width = self.mean_price()
+        proportions = self.overall_proportions()
+        categories = {}
+        for name, stratum in sorted(self.strata.items()):
+            z = self.z
+            categories[name] = {
+                'books': stratum.size,
+                'sampled': stratum.n,
+                'avg_price': interval(stratum.mean, z * math.sqrt(stratum.mean_error()))
+                if stratum.n else None,
+                'price_bands': {
+                    band: interval(stratum.proportion(stratum.bands[band]),
+                                   z * math.sqrt(stratum.proportion_error(stratum.bands[band])))
+                    for band in PRICE_BANDS
+                } if stratum.n else None,
+                'ratings': {
+                    rating: interval(stratum.proportion(stratum.ratings[rating]),
+                                     z * math.sqrt(stratum.proportion_error(stratum.ratings[rating])))
+                    for rating in range(1, 6)
+                } if stratum.n else None,
+            }
+        uncovered = self.uncovered()
+        return {
+            'confidence': self.confidence,
+            'population': self.population,
+            'sampled': self.sampled,
+            # Share of the population the overall estimates describe
+            'coverage': 1 - sum(stratum.size for stratum in uncovered) / self.population
+            if self.population else 0.0,
+            'uncovered_categories': sorted(stratum.name for stratum in uncovered),
+            'avg_price': interval(mean, half_width),
+            'price_bands': {band: interval(*proportions[band]) for band in PRICE_BANDS},
+            'ratings': {rating: interval(*proportions[rating]) for rating in range(1, 6)},
+            'categories': categories,
+        }
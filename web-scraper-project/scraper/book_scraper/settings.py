@@ -3,13 +3,132 @@ SPIDER_MODULES = ['book_scraper.spiders']
 NEWSPIDER_MODULE = 'book_scraper.spiders'
 ROBOTSTXT_OBEY = True
 DOWNLOAD_DELAY = 1
+# Persistent robots.txt and DNS cache shared by crawl runs; set a path such as
+# '../data/netcache.sqlite' to enable it
+NETCACHE_PATH = None
+NETCACHE_ROBOTSTXT_TTL = 24 * 3600
+NETCACHE_DNS_TTL = 3600
+DOWNLOADER_MIDDLEWARES = {
+    'book_scraper.checkpoint.CheckpointFailureMiddleware': 10,
+    'scrapy.downloadermiddlewares.robotstxt.RobotsTxtMiddleware': None,
+    'book_scraper.netcache.PersistentRobotsTxtMiddleware': 100,
+    'scrapy.downloadermiddlewares.retry.RetryMiddleware': None,
+    'book_scraper.retry.BackoffRetryMiddleware': 550,
+}
+# Failed requests are retried after RETRY_BACKOFF_BASE * 2^attempt seconds
+# (with jitter, at most RETRY_BACKOFF_MAX) without holding a download slot.
+# Requests that fail RETRY_TIMES retries go to DEADLETTER_PATH if set; re-run
+# with -s DEADLETTER_REPLAY=1 to fetch only those.
+RETRY_TIMES = 4
+RETRY_BACKOFF_BASE = 2
+RETRY_BACKOFF_MAX = 120
+DEADLETTER_PATH = None
+DEADLETTER_REPLAY = False
+DNS_RESOLVER = 'book_scraper.netcache.PersistentCachingResolver'
+# Download path: keep up to DOWNLOAD_POOL_SIZE idle keep-alive connections
+# per host (CONCURRENT_REQUESTS_PER_DOMAIN if unset), or a new connection per
+# request with DOWNLOAD_POOL_PERSISTENT = False. DOWNLOAD_HTTP2 multiplexes
+# https requests over one HTTP/2 connection per host (needs `pip install h2`).
+# Connection reuse and setup times are in the downloader/pool/* stats.
+DOWNLOAD_HANDLERS = {
+    'http': 'book_scraper.connpool.PooledDownloadHandler',
+    'https': 'book_scraper.connpool.PooledDownloadHandler',
+}
+DOWNLOADER_CLIENTCONTEXTFACTORY = 'book_scraper.connpool.TimedContextFactory'
+DOWNLOAD_POOL_SIZE = None
+DOWNLOAD_POOL_PERSISTENT = True
+DOWNLOAD_POOL_IDLE_TIMEOUT = 240
+DOWNLOAD_HTTP2 = False
 # Comment out MongoDB pipeline if you don't have MongoDB
-# ITEM_PIPELINES = {
-#     'book_scraper.pipelines.MongoDBPipeline': 300,
-# }
+ITEM_PIPELINES = {
+    # 'book_scraper.pipelines.MongoDBPipeline': 300,
+    # Same, without blocking the event loop on each insert:
+    # 'book_scraper.pipelines.AsyncMongoDBPipeline': 300,
+    'book_scraper.quality.QualityMonitorPipeline': 100,
+    'book_scraper.pipelines.DashboardPushPipeline': 800,
+    'book_scraper.export.FanOutExportPipeline': 900,
+}
 # MONGO_URI = 'mongodb://localhost:27017/'
 # MONGO_DATABASE = 'books_db'
+# Live dashboard: start `python visualization/dashboard_server.py` and set
+# DASHBOARD_URL = 'http://127.0.0.1:8050'
+DASHBOARD_URL = None
+DASHBOARD_BATCH_SIZE = 50
+# Serialize-once export: each item is encoded once and written to every sink
+# below (jsonl:PATH, csv:PATH, gzip:PATH, mongo). Replaces FEEDS and
+# MongoDBPipeline when several outputs are wanted, e.g.
+#   EXPORT_SINKS = ['jsonl:../data/books.jl', 'csv:../data/books.csv', 'mongo']
+EXPORT_SINKS = []
+EXPORT_BUFFER_SIZE = 256 * 1024
+EXPORT_MONGO_BATCH_SIZE = 500
+# Data-quality monitor: profile every field (null rate, lengths, distinct
+# values, QUALITY_PATTERNS conformance) and compare it with the baseline in
+# QUALITY_BASELINE every QUALITY_CHECK_INTERVAL items; the first crawl with a
+# new path records the baseline, e.g.
+#   scrapy crawl books -s QUALITY_BASELINE=../data/quality/%(name)s.json
+# QUALITY_ACTION = 'close' stops the crawl at the first drift alert.
+QUALITY_BASELINE = None
+QUALITY_ACTION = 'warn'
+QUALITY_MIN_ITEMS = 100
+QUALITY_CHECK_INTERVAL = 100
+QUALITY_MAX_RATE_DRIFT = 0.1
+QUALITY_MAX_LENGTH_PSI = 0.25
+QUALITY_PATTERNS = {}
 LOG_LEVEL = 'INFO'
+# Twisted runs on top of asyncio, so spider callbacks and pipelines can be
+# `async def` and await asyncio libraries (e.g. AsyncMongoDBPipeline) on the
+# crawler's own event loop
+TWISTED_REACTOR = 'twisted.internet.asyncioreactor.AsyncioSelectorReactor'
+# Dotted path of an optional `async def enrich(item, spider)` that BooksSpider
+# awaits on each book before yielding it (e.g. a lookup in another service);
+# it returns the item
+BOOK_ENRICHER = None
+SPIDER_MIDDLEWARES = {
+    'book_scraper.checkpoint.CheckpointMiddleware': 100,
+    'book_scraper.retry.DeadLetterReplayMiddleware': 900,
+}
+# Resumable crawls: set a directory to checkpoint the crawl state into, e.g.
+#   scrapy crawl books -s CHECKPOINT_DIR=../data/crawl_state
+# Re-running the same command after a crash resumes from the last checkpoint.
+CHECKPOINT_DIR = None
+CHECKPOINT_INTERVAL = 30
+# Keep at most FRONTIER_MEMORY_LIMIT pending requests in memory and spill the
+# rest to a disk queue in a per-run directory under FRONTIER_DIR (the system
+# temporary directory if unset)
+SCHEDULER = 'book_scraper.frontier.BoundedFrontierScheduler'
+FRONTIER_MEMORY_LIMIT = 10000
+FRONTIER_DIR = None
+# Seen requests as 64-bit (or 128-bit) fingerprints in a compact table, or
+# with DUPEFILTER_MODE = 'bloom' a scalable Bloom filter (smaller, but skips
+# about DUPEFILTER_BLOOM_ERROR_RATE of new URLs). Set DUPEFILTER_PATH, e.g.
+# '../data/seen.bin', to keep it across runs: a run skips every URL requested
+# by an earlier one with the same file. It can't be combined with
+# CHECKPOINT_DIR, which restores its own pending requests: the crawl refuses
+# to start if both are set.
+DUPEFILTER_CLASS = 'book_scraper.dupefilter.CompactDupeFilter'
+DUPEFILTER_MODE = 'table'
+DUPEFILTER_FINGERPRINT_BITS = 64
+DUPEFILTER_BLOOM_ERROR_RATE = 1e-6
+DUPEFILTER_INITIAL_CAPACITY = None
+DUPEFILTER_PATH = None
+# Archive raw responses to compressed WARC files, e.g.
+#   scrapy crawl books -s WARC_DIR=../data/warc
+# and re-extract them offline with: scrapy reextract ../data/warc
+EXTENSIONS = {
+    'book_scraper.warc.WarcArchiveExtension': 500,
+    'book_scraper.netcache.NetCacheDnsExtension': 500,
+}
+WARC_DIR = None
+WARC_MAX_SIZE = 1024 * 1024 * 1024
+COMMANDS_MODULE = 'book_scraper.commands'
+# Crawl daemon (`scrapy daemon`): HTTP API port and crawls run at once
+DAEMON_PORT = 6810
+DAEMON_MAX_JOBS = 4
+# Feed file of each daemon job (unless the job sets FEEDS itself)
+DAEMON_FEED_URI = '../data/jobs/%(spider)s/%(time)s-%(job)s.jl'
+# Site definitions for the catalogue spider (file, directory or glob; a
+# relative path is relative to this project's directory, where scrapy.cfg is)
+CATALOGUE_SITES = 'sites'
 FEEDS = {
     '../data/books.json': {
         'format': 'json',
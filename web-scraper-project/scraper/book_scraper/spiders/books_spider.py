@@ -1,21 +1,102 @@
-﻿import scrapy
+﻿import inspect
+import json
+import scrapy
+from scrapy.exceptions import CloseSpider
 from scrapy.http import Request
+from scrapy.settings import SETTINGS_PRIORITIES
+from scrapy.utils.misc import load_object
 from urllib.parse import urljoin
 from book_scraper.items import BookItem
+from book_scraper.sampling import RATING_MAP, StratifiedEstimator, parse_price
 from datetime import datetime
 
+def extract_book(response, scraped_date=None):
+    # Shared by BooksSpider.parse_book and the offline `scrapy reextract` command
+    item = BookItem()
+    
+    # Extract data
+    item['title'] = response.css('h1::text').get()
+    item['price'] = response.css('p.price_color::text').get()
+    
+    # Rating
+    rating = response.css('p.star-rating::attr(class)').get()
+    item['rating'] = rating.split()[-1] if rating else None
+    
+    # Availability
+    availability = response.css('p.instock.availability::text').getall()
+    item['availability'] = ' '.join([text.strip() for text in availability]).strip()
+    
+    # Description
+    desc = response.xpath('//div[@id="product_description"]/following-sibling::p/text()').get()
+    item['description'] = desc.strip() if desc else None
+    
+    # Category
+    item['category'] = response.css('ul.breadcrumb li:nth-last-child(2) a::text').get()
+    
+    # Image URL
+    img = response.css('div.item.active img::attr(src)').get()
+    item['image_url'] = urljoin(response.url, img) if img else None
+    
+    # URLs and timestamp
+    item['product_url'] = response.url
+    item['scraped_date'] = scraped_date or datetime.now().isoformat()
+    
+    return item
+
+
 class BooksSpider(scrapy.Spider):
     name = 'books'
     allowed_domains = ['books.toscrape.com']
     start_urls = ['http://books.toscrape.com/']
+    # async def enricher(item, spider) -> item, awaited on each book (see BOOK_ENRICHER)
+    enricher = None
+    
+    def __init__(self, sample=None, precision=0.1, confidence=0.95, seed=None,
+                 sample_window=16, sample_output='../data/books_sample_estimates.json',
+                 *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Sampling mode: scrapy crawl books -a sample=1 [-a precision=0.05]
+        self.sample = str(sample).lower() in ('1', 'true', 'yes')
+        self.precision = float(precision)
+        self.sample_window = int(sample_window)
+        self.sample_output = sample_output
+        self.estimator = StratifiedEstimator(float(confidence), seed)
+        self.category_pages = {}
+        self.page_links = {}
+        self.page_waiting = {}
+        self.pending_categories = 0
+    
+    @classmethod
+    def from_crawler(cls, crawler, *args, **kwargs):
+        spider = super().from_crawler(crawler, *args, **kwargs)
+        if spider.sample:
+            # A sample must not end up in the project's full-catalogue feed.
+            # Only FEEDS from settings.py are replaced: -o / -O / -s FEEDS=
+            # have cmdline priority and still apply
+            if crawler.settings.getpriority('FEEDS') < SETTINGS_PRIORITIES['spider']:
+                spider.logger.info('Sampling mode: the project FEEDS are not written, '
+                                   'use -o FILE to save the sampled books')
+            crawler.settings.set('FEEDS', {}, priority='spider')
+        enricher = crawler.settings.get('BOOK_ENRICHER')
+        if enricher:
+            spider.enricher = load_object(enricher)
+            if not inspect.iscoroutinefunction(spider.enricher):
+                raise ValueError(f'BOOK_ENRICHER must be an async function, got {enricher!r}')
+        return spider
     
     def parse(self, response):
+        if self.sample:
+            yield from self.start_sampling(response)
+            return
+        
         # Get all book links
         book_links = response.css('h3 a::attr(href)').getall()
         
         for book_link in book_links:
             absolute_url = urljoin(response.url, book_link)
-            yield Request(absolute_url, callback=self.parse_book)
+            # Detail pages go ahead of further listing pages so the
+            # scheduler backlog drains before the next page adds to it
+            yield Request(absolute_url, callback=self.parse_book, priority=1)
         
         # Pagination
         next_page = response.css('li.next a::attr(href)').get()
@@ -23,35 +104,112 @@ class BooksSpider(scrapy.Spider):
             next_url = urljoin(response.url, next_page)
             yield Request(next_url, callback=self.parse)
     
-    def parse_book(self, response):
-        item = BookItem()
-        
-        # Extract data
-        item['title'] = response.css('h1::text').get()
-        item['price'] = response.css('p.price_color::text').get()
-        
-        # Rating
-        rating = response.css('p.star-rating::attr(class)').get()
-        item['rating'] = rating.split()[-1] if rating else None
-        
-        # Availability
-        availability = response.css('p.instock.availability::text').getall()
-        item['availability'] = ' '.join([text.strip() for text in availability]).strip()
-        
-        # Description
-        desc = response.xpath('//div[@id="product_description"]/following-sibling::p/text()').get()
-        item['description'] = desc.strip() if desc else None
-        
-        # Category
-        item['category'] = response.css('ul.breadcrumb li:nth-last-child(2) a::text').get()
-        
-        # Image URL
-        img = response.css('div.item.active img::attr(src)').get()
-        item['image_url'] = urljoin(response.url, img) if img else None
-        
-        # URLs and timestamp
-        item['product_url'] = response.url
-        item['scraped_date'] = datetime.now().isoformat()
+    async def parse_book(self, response):
+        item = extract_book(response)
+        if self.enricher is not None:
+            # Awaited on the reactor's event loop: other downloads and
+            # callbacks carry on while a lookup is in flight
+            item = await self.enricher(item, self)
+        yield item
+    
+    # ========== SAMPLING MODE ==========
+    # Each category is a stratum. Its size comes from the category's first
+    # listing page; books are then drawn at random (by position in the
+    # category listing) and only the listing pages holding a drawn book are
+    # fetched.
+    
+    def start_sampling(self, response):
+        links = response.css('div.side_categories ul li ul li a')
+        self.pending_categories = len(links)
+        for link in links:
+            category = link.css('::text').get().strip()
+            yield response.follow(link, callback=self.parse_category, errback=self.category_done,
+                                  cb_kwargs={'category': category})
+    
+    def parse_category(self, response, category):
+        total = int(response.css('form.form-horizontal strong::text').get() or 0)
+        links = [response.urljoin(href) for href in response.css('article.product_pod h3 a::attr(href)').getall()]
+        if total and links:
+            self.estimator.add_stratum(category, total)
+            self.category_pages[category] = (response.url, len(links))
+            self.page_links[category, 1] = links
+        yield from self.category_done()
+    
+    def category_done(self, failure=None):
+        self.pending_categories -= 1
+        if self.pending_categories == 0:
+            # All stratum sizes are known: start drawing
+            yield from self.draw_samples()
+    
+    def draw_samples(self):
+        in_flight = sum(stratum.in_flight for stratum in self.estimator.strata.values())
+        for stratum in self.estimator.next_strata(self.sample_window - in_flight):
+            url, per_page = self.category_pages[stratum.name]
+            page, position = divmod(stratum.draw(), per_page)
+            page += 1
+            links = self.page_links.get((stratum.name, page))
+            if links is not None:
+                yield from self.sample_book(stratum.name, links, position)
+                continue
+            waiting = self.page_waiting.setdefault((stratum.name, page), [])
+            if not waiting:
+                yield Request(urljoin(url, f'page-{page}.html'), callback=self.parse_sample_page,
+                              errback=self.sample_page_failed, cb_kwargs={'category': stratum.name, 'page': page})
+            waiting.append(position)
+    
+    def sample_book(self, category, links, position):
+        if position >= len(links):
+            # The listing changed since the category page was read
+            self.estimator.strata[category].failed += 1
+            return
+        yield Request(links[position], callback=self.parse_sample_book, errback=self.sample_failed,
+                      cb_kwargs={'category': category}, priority=1)
+    
+    def parse_sample_page(self, response, category, page):
+        links = [response.urljoin(href) for href in response.css('article.product_pod h3 a::attr(href)').getall()]
+        self.page_links[category, page] = links
+        for position in self.page_waiting.pop((category, page)):
+            yield from self.sample_book(category, links, position)
+        yield from self.draw_samples()
+    
+    def sample_page_failed(self, failure):
+        kwargs = failure.request.cb_kwargs
+        self.estimator.strata[kwargs['category']].failed += len(self.page_waiting.pop((kwargs['category'], kwargs['page'])))
+        yield from self.draw_samples()
+    
+    def parse_sample_book(self, response, category):
+        item = extract_book(response)
+        price = parse_price(item['price'])
+        if price is None:
+            self.estimator.strata[category].failed += 1
+        else:
+            self.estimator.add(category, price, RATING_MAP.get(item['rating']))
+            yield item
+        if self.estimator.precision_reached(self.precision):
+            raise CloseSpider('precision_reached')
+        yield from self.draw_samples()
+    
+    def sample_failed(self, failure):
+        self.estimator.strata[failure.request.cb_kwargs['category']].failed += 1
+        yield from self.draw_samples()
+    
+    def closed(self, reason):
+        if not self.sample:
+            return
+        report = self.estimator.report()
+        report['precision'] = self.precision
+        report['stop_reason'] = reason
+        with open(self.sample_output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=4, ensure_ascii=False)
         
-        yield item
-
+        self.crawler.stats.set_value('sampling/books', report['sampled'])
+        self.crawler.stats.set_value('sampling/population', report['population'])
+        avg = report['avg_price']
+        self.logger.info('Sampled %d of %d books (%s): average price £%.2f (%d%% CI £%.2f - £%.2f), '
+                         'estimates written to %s', report['sampled'], report['population'], reason,
+                         avg['estimate'], report['confidence'] * 100, avg['ci'][0], avg['ci'][1],
+                         self.sample_output)
+        if report['uncovered_categories']:
+            self.logger.warning('No book sampled from %d categories (%.0f%% of the books); the estimates '
+                                'leave them out: %s', len(report['uncovered_categories']),
+                                (1 - report['coverage']) * 100, ', '.join(report['uncovered_categories']))
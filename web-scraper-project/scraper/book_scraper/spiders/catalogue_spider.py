@@ -0,0 +1,172 @@
+import glob
+import json
+import os
+import re
+from datetime import datetime
+from urllib.parse import urljoin, urlparse
+
+import scrapy
+from scrapy.http import Request
+
+# The Scrapy project directory (scrapy.cfg); relative CATALOGUE_SITES paths
+# are resolved against it, so the spider runs from any directory
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def load_site(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        if path.endswith(('.yaml', '.yml')):
+            import yaml
+            site = yaml.safe_load(f)
+        else:
+            site = json.load(f)
+    site.setdefault('name', os.path.splitext(os.path.basename(path))[0])
+    for key in ('start_urls', 'listing', 'fields'):
+        if key not in site:
+            raise ValueError(f'Site definition {path} is missing "{key}"')
+    return site
+
+
+def site_domains(site):
+    # The site's allowed_domains, or else the hosts of its start URLs
+    if site.get('allowed_domains'):
+        return list(site['allowed_domains'])
+    return sorted({urlparse(url).hostname for url in site['start_urls']} - {None})
+
+
+def load_sites(location):
+    """Load every site definition from a file, directory or glob pattern."""
+    location = os.path.join(PROJECT_DIR, location)
+    if os.path.isdir(location):
+        paths = [os.path.join(location, name) for name in os.listdir(location)]
+    else:
+        paths = glob.glob(location)
+    paths = sorted(p for p in paths if p.endswith(('.yaml', '.yml', '.json')))
+    sites = [load_site(path) for path in paths]
+    names = [site['name'] for site in sites]
+    if len(names) != len(set(names)):
+        raise ValueError(f'Duplicate site names in {location}: {names}')
+    return sites
+
+
+def extract_field(response, spec):
+    # spec: {css|xpath, all, join, re, urljoin}
+    selector = response.css(spec['css']) if 'css' in spec else response.xpath(spec['xpath'])
+    if spec.get('all') or 'join' in spec:
+        values = [v.strip() for v in selector.getall()]
+        value = spec.get('join', ' ').join(v for v in values if v) or None
+    else:
+        value = selector.get()
+        value = value.strip() if value else None
+
+    if value and 're' in spec:
+        match = re.search(spec['re'], value)
+        value = match.group(1) if match else None
+    if value and spec.get('urljoin'):
+        value = urljoin(response.url, value)
+    return value
+
+
+class CatalogueSpider(scrapy.Spider):
+    """Generic listing -> detail page spider driven by site definitions.
+
+    Every YAML/JSON file matched by the CATALOGUE_SITES setting describes one
+    site (see sites/books_toscrape.yaml). All sites are crawled concurrently in
+    this one spider, each in its own download slot with its own concurrency
+    limit, delay and `catalogue/<site>/...` stats. Items go to
+    ../data/catalogue.jl instead of the books spider's feed.
+
+        scrapy crawl catalogue -s CATALOGUE_SITES='sites/*.yaml'
+    """
+
+    name = 'catalogue'
+    custom_settings = {
+        'FEEDS': {
+            '../data/catalogue.jl': {
+                'format': 'jsonlines',
+                'encoding': 'utf8',
+            }
+        }
+    }
+
+    @classmethod
+    def update_settings(cls, settings):
+        super().update_settings(settings)
+        sites = load_sites(settings.get('CATALOGUE_SITES', 'sites'))
+        # Loaded once here; from_crawler picks them up from the settings
+        settings.set('CATALOGUE_SITE_DEFINITIONS', sites, priority='spider')
+        slots = dict(settings.getdict('DOWNLOAD_SLOTS'))
+        total_concurrency = 0
+        for site in sites:
+            slot = slots.setdefault(site['name'], {})
+            slot.setdefault('concurrency', site.get(
+                'concurrency', settings.getint('CONCURRENT_REQUESTS_PER_DOMAIN')))
+            slot.setdefault('delay', site.get(
+                'download_delay', settings.getfloat('DOWNLOAD_DELAY')))
+            total_concurrency += slot['concurrency']
+        settings.set('DOWNLOAD_SLOTS', slots, priority='spider')
+        if total_concurrency > settings.getint('CONCURRENT_REQUESTS'):
+            settings.set('CONCURRENT_REQUESTS', total_concurrency, priority='spider')
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.sites = {}
+
+    @classmethod
+    def from_crawler(cls, crawler, *args, **kwargs):
+        spider = super().from_crawler(crawler, *args, **kwargs)
+        for site in crawler.settings.get('CATALOGUE_SITE_DEFINITIONS'):
+            spider.sites[site['name']] = site
+        # A site without allowed_domains contributes the hosts of its start
+        # URLs, so the offsite filter doesn't drop its requests
+        spider.allowed_domains = sorted({
+            domain for site in spider.sites.values() for domain in site_domains(site)
+        })
+        return spider
+
+    def site_request(self, url, site, callback):
+        return Request(
+            url,
+            callback=callback,
+            errback=self.site_error,
+            priority=1 if callback == self.parse_detail else 0,
+            meta={'site': site['name'], 'download_slot': site['name']},
+        )
+
+    async def start(self):
+        for site in self.sites.values():
+            for url in site['start_urls']:
+                yield self.site_request(url, site, self.parse)
+
+    def inc_site_stat(self, site_name, key, count=1):
+        self.crawler.stats.inc_value(f'catalogue/{site_name}/{key}', count)
+
+    def parse(self, response):
+        site = self.sites[response.meta['site']]
+        listing = site['listing']
+        self.inc_site_stat(site['name'], 'listing_pages')
+
+        for link in response.css(listing['links']).getall():
+            yield self.site_request(urljoin(response.url, link), site, self.parse_detail)
+
+        next_page = listing.get('next_page') and response.css(listing['next_page']).get()
+        if next_page:
+            yield self.site_request(urljoin(response.url, next_page), site, self.parse)
+
+    def parse_detail(self, response):
+        site = self.sites[response.meta['site']]
+        self.inc_site_stat(site['name'], 'detail_pages')
+
+        item = {'site': site['name']}
+        for field, spec in site['fields'].items():
+            item[field] = extract_field(response, spec)
+        item['product_url'] = response.url
+        item['scraped_date'] = datetime.now().isoformat()
+
+        self.inc_site_stat(site['name'], 'items')
+        yield item
+
+    def site_error(self, failure):
+        site_name = failure.request.meta.get('site', 'unknown')
+        self.inc_site_stat(site_name, 'errors')
+        self.logger.warning('[%s] %s: %s', site_name, failure.request.url, failure.value)
@@ -0,0 +1,153 @@
+# WARC archiving of raw responses.
+#
+# Enable with:
+#     scrapy crawl books -s WARC_DIR=../data/warc
+#
+# Every downloaded response is appended to gzip-compressed WARC/1.0 files
+# (one gzip member per record, rotated at WARC_MAX_SIZE bytes) so pages can
+# be re-extracted later with `scrapy reextract` instead of crawling again.
+
+import gzip
+import os
+import uuid
+from datetime import datetime, timezone
+
+from scrapy import signals
+from scrapy.exceptions import NotConfigured
+from scrapy.http import Headers
+from scrapy.utils.response import response_status_message
+
+# Non-standard header recording which spider callback handled the response
+CALLBACK_HEADER = 'WARC-Scrapy-Callback'
+
+# The archived body is already decoded, so these no longer describe it
+DROPPED_HEADERS = (b'Content-Encoding', b'Transfer-Encoding', b'Content-Length')
+
+
+def build_response_record(response, callback=None, date=None):
+    date = date or datetime.now(timezone.utc)
+    status = response_status_message(response.status)
+    http_block = [f'HTTP/1.1 {status}\r\n'.encode('latin-1')]
+    for name, values in response.headers.items():
+        if name in DROPPED_HEADERS:
+            continue
+        for value in values:
+            http_block.append(name + b': ' + value + b'\r\n')
+    http_block.append(f'Content-Length: {len(response.body)}\r\n\r\n'.encode('latin-1'))
+    http_block.append(response.body)
+    block = b''.join(http_block)
+
+    headers = [
+        ('WARC-Type', 'response'),
+        ('WARC-Record-ID', f'<urn:uuid:{uuid.uuid4()}>'),
+        ('WARC-Date', date.strftime('%Y-%m-%dT%H:%M:%SZ')),
+        ('WARC-Target-URI', response.url),
+        ('Content-Type', 'application/http; msgtype=response'),
+    ]
+    if callback:
+        headers.append((CALLBACK_HEADER, callback))
+    headers.append(('Content-Length', str(len(block))))
+    head = 'WARC/1.0\r\n' + ''.join(f'{k}: {v}\r\n' for k, v in headers) + '\r\n'
+    return head.encode('utf-8') + block + b'\r\n\r\n'
+
+
+class WarcWriter:
+    def __init__(self, directory, prefix, max_size):
+        self.directory = directory
+        self.prefix = prefix
+        self.max_size = max_size
+        self.file = None
+        self.count = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def _open(self):
+        stamp = datetime.now(timezone.utc).strftime('%Y%m%d%H%M%S')
+        self.count += 1
+        name = f'{self.prefix}-{stamp}-{self.count:05d}.warc.gz'
+        self.file = open(os.path.join(self.directory, name), 'ab')
+
+    def write(self, record):
+        if self.file is None or self.file.tell() >= self.max_size:
+            self.close()
+            self._open()
+        # One gzip member per record keeps the file seekable record by record
+        self.file.write(gzip.compress(record, compresslevel=6))
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+def iter_warc_records(path):
+    """Yield (headers, http_block) for every record of a (gzipped) WARC file."""
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'rb') as f:
+        while True:
+            line = f.readline()
+            if not line:
+                return
+            if not line.strip():
+                continue
+            headers = {}
+            for line in iter(f.readline, b'\r\n'):
+                if not line:
+                    return
+                name, _, value = line.decode('utf-8').partition(':')
+                headers[name.strip()] = value.strip()
+            block = f.read(int(headers['Content-Length']))
+            yield headers, block
+
+
+def parse_http_block(block):
+    """Split an archived HTTP response into (status, Headers, body)."""
+    head, _, body = block.partition(b'\r\n\r\n')
+    lines = head.split(b'\r\n')
+    status = int(lines[0].split()[1])
+    headers = Headers()
+    for line in lines[1:]:
+        name, _, value = line.partition(b':')
+        headers.appendlist(name.strip(), value.strip())
+    return status, headers, body
+
+
+def iter_warc_files(path):
+    if os.path.isfile(path):
+        yield path
+        return
+    for name in sorted(os.listdir(path)):
+        if name.endswith(('.warc', '.warc.gz')):
+            yield os.path.join(path, name)
+
+
+class WarcArchiveExtension:
+    def __init__(self, crawler, directory, max_size):
+        self.crawler = crawler
+        self.stats = crawler.stats
+        self.directory = directory
+        self.max_size = max_size
+        self.writer = None
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        directory = crawler.settings.get('WARC_DIR')
+        if not directory:
+            raise NotConfigured
+        ext = cls(crawler, directory, crawler.settings.getint('WARC_MAX_SIZE', 1024 * 1024 * 1024))
+        crawler.signals.connect(ext.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(ext.spider_closed, signal=signals.spider_closed)
+        crawler.signals.connect(ext.response_received, signal=signals.response_received)
+        return ext
+
+    def spider_opened(self, spider):
+        self.writer = WarcWriter(self.directory, spider.name, self.max_size)
+
+    def spider_closed(self, spider):
+        self.writer.close()
+
+    def response_received(self, response, request, spider):
+        callback = request.callback.__name__ if callable(request.callback) else None
+        record = build_response_record(response, callback)
+        self.writer.write(record)
+        self.stats.inc_value('warc/records')
+        self.stats.inc_value('warc/bytes', len(record))
@@ -1,9 +1,10 @@
 ﻿import json
-import pandas as pd
 import os
 import re
 
 def simple_analysis():
+    import pandas as pd
+    
     print('📊 WEB SCRAPER - SIMPLE ANALYSIS')
     print('=' * 50)
     
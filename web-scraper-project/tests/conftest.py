@@ -0,0 +1,31 @@
+import asyncio
+import os
+import sys
+
+import pytest
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [PROJECT_DIR, os.path.join(PROJECT_DIR, 'scraper')]
+
+# Scrapy's test helpers need the reactor the project runs on
+from scrapy.utils.reactor import install_reactor  # noqa: E402
+
+install_reactor('twisted.internet.asyncioreactor.AsyncioSelectorReactor')
+
+from scrapy import Spider  # noqa: E402
+from scrapy.utils.test import get_crawler  # noqa: E402
+
+
+@pytest.fixture
+def make_crawler():
+    def make(settings=None, spidercls=Spider):
+        crawler = get_crawler(spidercls, settings)
+        crawler.spider = crawler._create_spider('test')
+        return crawler
+    return make
+
+
+def collect(async_iterable):
+    async def run():
+        return [obj async for obj in async_iterable]
+    return asyncio.run(run())
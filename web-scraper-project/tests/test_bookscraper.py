@@ -0,0 +1,75 @@
+import json
+import subprocess
+import sys
+import time
+
+import pytest
+import scrapy.crawler
+from scrapy import Spider
+from scrapy.utils.test import get_crawler
+
+import bookscraper
+from conftest import PROJECT_DIR
+
+# `bookscraper.py --help` over a bare interpreter, in ms: importing Scrapy or
+# pandas alone takes about 500 ms, a lazy CLI well under 50 ms
+STARTUP_BUDGET_MS = 250
+
+
+class FakeProcess:
+    finish_reason = None
+    spider_args = None
+
+    def __init__(self, settings):
+        self.settings = settings
+
+    def create_crawler(self, spider):
+        return get_crawler(Spider)
+
+    def crawl(self, crawler, **kwargs):
+        FakeProcess.spider_args = kwargs
+        crawler.stats.set_value('finish_reason', self.finish_reason)
+
+    def start(self):
+        pass
+
+
+@pytest.mark.parametrize('reason, ok', [
+    ('finished', True), ('precision_reached', True), ('shutdown', False), ('quality_drift', False),
+])
+def test_crawl_result(monkeypatch, reason, ok):
+    monkeypatch.setattr(scrapy.crawler, 'CrawlerProcess', type('P', (FakeProcess,), {'finish_reason': reason}))
+    assert bookscraper.crawl('books', spider_args=['sample=1', 'precision=0.05']) is ok
+    assert FakeProcess.spider_args == {'sample': '1', 'precision': '0.05'}
+
+
+def test_stats(tmp_path, capsys):
+    path = tmp_path / 'books.jl'
+    books = [{'category': 'Poetry', 'price': '£10.00'}, {'category': 'Travel', 'price': '£20.00'}, {'price': None}]
+    path.write_text(''.join(json.dumps(book) + '\n' for book in books), encoding='utf-8')
+    assert bookscraper.main(['stats', str(path)]) == 0
+    out = capsys.readouterr().out
+    assert 'Total Books: 3' in out and 'Unique Categories: 2' in out and 'Average Price: £15.00' in out
+
+
+def test_startup_imports_no_heavy_libraries():
+    code = 'import sys, bookscraper; print(sorted({"scrapy", "pandas", "matplotlib"} & set(sys.modules)))'
+    result = subprocess.run([sys.executable, '-c', code], cwd=PROJECT_DIR, capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == '[]'
+
+
+def fastest_run_ms(args, runs=5):
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(args, cwd=PROJECT_DIR, capture_output=True, check=True)
+        timings.append((time.perf_counter() - start) * 1000)
+    return min(timings)
+
+
+def test_help_starts_within_budget():
+    # Timing counterpart of benchmarks/bench_startup.py, with a generous budget
+    # so that only an eager import of a heavy library fails it
+    bare = fastest_run_ms([sys.executable, '-c', 'pass'])
+    cli = fastest_run_ms([sys.executable, 'bookscraper.py', '--help'])
+    assert cli - bare < STARTUP_BUDGET_MS, f'--help took {cli - bare:.0f} ms over a bare interpreter'
@@ -0,0 +1,81 @@
+import json
+
+import pytest
+from scrapy.http import HtmlResponse
+
+from book_scraper.spiders import catalogue_spider
+from book_scraper.spiders.catalogue_spider import PROJECT_DIR, CatalogueSpider, extract_field, load_sites
+
+SITE = {
+    'name': 'shop',
+    'allowed_domains': ['shop.example'],
+    'start_urls': ['http://shop.example/'],
+    'concurrency': 3,
+    'listing': {'links': 'h3 a::attr(href)', 'next_page': 'li.next a::attr(href)'},
+    'fields': {
+        'title': {'css': 'h1::text'},
+        'rating': {'css': 'p.star-rating::attr(class)', 're': r'star-rating\s+(\w+)'},
+        'tags': {'css': 'li.tag::text', 'join': ', '},
+        'image': {'css': 'img::attr(src)', 'urljoin': True},
+    },
+}
+
+
+@pytest.fixture
+def sites_dir(tmp_path):
+    (tmp_path / 'shop.json').write_text(json.dumps(SITE))
+    other = dict(SITE, name='other', concurrency=2, start_urls=['https://other.example:8443/books/'])
+    del other['allowed_domains']
+    (tmp_path / 'other.json').write_text(json.dumps(other))
+    return tmp_path
+
+
+def test_duplicate_or_incomplete_sites_are_rejected(tmp_path):
+    (tmp_path / 'a.json').write_text(json.dumps(SITE))
+    (tmp_path / 'b.json').write_text(json.dumps(SITE))
+    with pytest.raises(ValueError, match='Duplicate'):
+        load_sites(str(tmp_path))
+    (tmp_path / 'b.json').write_text(json.dumps({'name': 'b'}))
+    with pytest.raises(ValueError, match='missing'):
+        load_sites(str(tmp_path))
+
+
+def test_sites_are_loaded_once_and_get_their_own_slots(make_crawler, sites_dir, monkeypatch):
+    calls = []
+    monkeypatch.setattr(catalogue_spider, 'load_sites', lambda location: calls.append(location) or load_sites(location))
+    crawler = make_crawler({'CATALOGUE_SITES': str(sites_dir), 'CONCURRENT_REQUESTS': 4}, CatalogueSpider)
+
+    assert len(calls) == 1
+    assert sorted(crawler.spider.sites) == ['other', 'shop']
+    assert crawler.spider.allowed_domains == ['other.example', 'shop.example']
+    slots = crawler.settings.getdict('DOWNLOAD_SLOTS')
+    assert slots['shop']['concurrency'] == 3 and slots['other']['concurrency'] == 2
+    assert crawler.settings.getint('CONCURRENT_REQUESTS') == 5
+    assert list(crawler.settings.getdict('FEEDS')) == ['../data/catalogue.jl']
+
+
+def test_listing_and_detail_pages(make_crawler, sites_dir):
+    spider = make_crawler({'CATALOGUE_SITES': str(sites_dir)}, CatalogueSpider).spider
+    start = spider.site_request('http://shop.example/', SITE, spider.parse)
+    listing = HtmlResponse(start.url, request=start, body=b'''
+        <h3><a href="item/1">One</a></h3><li class="next"><a href="page-2">next</a></li>''')
+    detail, next_page = spider.parse(listing)
+    assert (detail.url, detail.priority, detail.meta['download_slot']) == ('http://shop.example/item/1', 1, 'shop')
+    assert next_page.url == 'http://shop.example/page-2' and next_page.priority == 0
+
+    page = HtmlResponse(detail.url, request=detail, body=b'''
+        <h1> One </h1><p class="star-rating Four"></p>
+        <li class="tag">a</li><li class="tag"> </li><li class="tag">b</li><img src="/img/1.jpg">''')
+    [item] = spider.parse_detail(page)
+    assert item['site'] == 'shop'
+    assert (item['title'], item['rating'], item['tags']) == ('One', 'Four', 'a, b')
+    assert item['image'] == 'http://shop.example/img/1.jpg'
+    assert extract_field(page, {'css': 'h2::text'}) is None
+
+
+def test_relative_site_paths_are_found_from_any_directory(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    sites = load_sites('sites')
+    assert 'books_toscrape' in [site['name'] for site in sites]
+    assert load_sites(str(tmp_path / 'missing')) == []
+    assert PROJECT_DIR.endswith('scraper')
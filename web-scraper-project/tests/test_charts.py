@@ -0,0 +1,66 @@
+import os
+
+import pytest
+
+from visualization import charts
+
+BOOKS = [
+    {'price': '£10.00', 'category': 'Poetry'},
+    {'price': '£30.00', 'category': 'Poetry'},
+    {'price': 'n/a', 'category': 'History'},
+    {'price': '£5.00', 'category': None},
+]
+
+
+def render_text(output, text):
+    with open(output, 'w', encoding='utf-8') as f:
+        f.write(text)
+    return output
+
+
+@pytest.fixture
+def charts_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(charts, 'CHARTS_DIR', str(tmp_path))
+    monkeypatch.setattr(charts, 'CACHE_FILE', str(tmp_path / '.chart_cache.json'))
+    return tmp_path
+
+
+def test_summarize_in_one_pass():
+    summary = charts.summarize(BOOKS)
+    assert summary['total'] == 4
+    assert list(summary['prices']) == [10.0, 30.0, 5.0]
+    assert dict(summary['category_counts']) == {'Poetry': 2, 'History': 1}
+    assert list(summary['prices_by_category']['Poetry']) == [10.0, 30.0]
+    assert 'History' not in summary['prices_by_category']
+
+
+def test_only_changed_charts_are_redrawn(charts_dir, capsys):
+    jobs = [(render_text, str(charts_dir / f'{name}.txt'), {'text': name}) for name in ('a', 'b')]
+    charts.render_charts(jobs)  # two stale charts: rendered in a process pool
+    assert (charts_dir / 'b.txt').read_text() == 'b'
+    capsys.readouterr()
+
+    jobs[1] = (render_text, jobs[1][1], {'text': 'changed'})
+    charts.render_charts(jobs)
+    out = capsys.readouterr().out
+    assert f'Unchanged: {jobs[0][1]}' in out and f'Created: {jobs[1][1]}' in out
+    assert (charts_dir / 'b.txt').read_text() == 'changed'
+
+    os.remove(jobs[0][1])
+    charts.render_charts(jobs)
+    assert f'Created: {jobs[0][1]}' in capsys.readouterr().out
+
+
+def test_chart_jobs_render(charts_dir):
+    pytest.importorskip('seaborn')
+    jobs = charts.chart_jobs(charts.summarize(BOOKS))
+    assert [os.path.basename(output) for _, output, _ in jobs] == ['book_analysis.png', 'price_by_category.png']
+    charts.render_charts(jobs[:1])
+    with open(jobs[0][1], 'rb') as f:
+        assert f.read(8) == b'\x89PNG\r\n\x1a\n'
+
+
+def test_category_names_are_escaped_in_the_dashboard():
+    counts = charts.summarize([{'category': 'Sci-Fi & <Fantasy>'}, {'category': 'Poetry'}])['category_counts']
+    assert charts.top_categories_html(counts, top=1) == \
+        '<li><strong>Sci-Fi &amp; &lt;Fantasy&gt;</strong>: 1 books</li>\n'
@@ -0,0 +1,148 @@
+import os
+
+from scrapy import Request
+from scrapy.http import HtmlResponse
+from scrapy.exceptions import IgnoreRequest
+from scrapy.spidermiddlewares.httperror import HttpError
+
+from book_scraper.checkpoint import (
+    CheckpointFailureMiddleware,
+    CheckpointMiddleware,
+    CheckpointStore,
+    iter_checkpoint_items,
+)
+from conftest import collect
+
+
+async def start_requests(*urls):
+    for url in urls:
+        yield Request(url)
+
+
+def response_for(request, status=200):
+    return HtmlResponse(request.url, status=status, body=b'<html></html>', request=request)
+
+
+def open_middleware(make_crawler, path):
+    crawler = make_crawler({'CHECKPOINT_DIR': str(path)})
+    return crawler, CheckpointMiddleware.from_crawler(crawler)
+
+
+def test_store_discards_state_the_manifest_does_not_reference(tmp_path):
+    store = CheckpointStore(str(tmp_path))
+    store.commit([b'{"a": 1}\n'], [b'x' * 20], {})
+    with open(store.done_path, 'ab') as f:
+        f.write(b'y' * 20)
+    orphan = os.path.join(store.segments_dir, 'items-00002.jl')
+    with open(orphan, 'wb') as f:
+        f.write(b'{"a": 2}\n')
+
+    store = CheckpointStore(str(tmp_path))
+    assert store.done == {b'x' * 20}
+    assert not os.path.exists(orphan)
+    assert list(store.iter_items()) == [{'a': 1}]
+
+
+def test_resume_yields_pending_requests_only(make_crawler, tmp_path):
+    crawler, mw = open_middleware(make_crawler, tmp_path)
+    spider = crawler.spider
+    [start] = collect(mw.process_start(start_requests('http://example.com/')))
+
+    output = list(mw.process_spider_output(
+        response_for(start), [Request('http://example.com/next'), {'title': 'A'}], spider,
+    ))
+    assert mw.pending  # the start request is not done until its item is
+    mw.item_scraped(output[1], response_for(start), spider)
+    mw.spider_closed(spider, 'shutdown')
+
+    crawler, mw = open_middleware(make_crawler, tmp_path)
+    resumed = collect(mw.process_start(start_requests('http://example.com/')))
+    assert [r.url for r in resumed] == ['http://example.com/next']
+    assert list(iter_checkpoint_items(str(tmp_path))) == [{'title': 'A'}]
+
+
+def test_final_failures_leave_pending(make_crawler, tmp_path):
+    crawler, mw = open_middleware(make_crawler, tmp_path)
+    spider = crawler.spider
+    http_error, offsite = collect(mw.process_start(start_requests(
+        'http://example.com/404', 'http://other.com/',
+    )))
+
+    mw.process_spider_exception(
+        response_for(http_error, 404), HttpError(response_for(http_error, 404)), spider,
+    )
+    failure_mw = CheckpointFailureMiddleware.from_crawler(crawler)
+    assert failure_mw.process_exception(offsite, IgnoreRequest(), spider) is None
+
+    assert mw.pending == {}
+    assert crawler.stats.get_value('checkpoint/failed_requests') == 2
+
+
+def test_transient_failures_stay_pending_and_block_completion(make_crawler, tmp_path):
+    crawler, mw = open_middleware(make_crawler, tmp_path)
+    spider = crawler.spider
+    [start] = collect(mw.process_start(start_requests('http://example.com/')))
+    timeout, unavailable = list(mw.process_spider_output(
+        response_for(start), [Request('http://example.com/a'), Request('http://example.com/b')], spider,
+    ))
+    mw.spider_closed(spider, 'shutdown')
+
+    # Resumed while the server is down: both requests fail
+    crawler, mw = open_middleware(make_crawler, tmp_path)
+    spider = crawler.spider
+    timeout, unavailable = collect(mw.process_start(start_requests('http://example.com/')))
+    CheckpointFailureMiddleware.from_crawler(crawler).process_exception(timeout, TimeoutError(), spider)
+    mw.process_spider_exception(
+        response_for(unavailable, 503), HttpError(response_for(unavailable, 503)), spider,
+    )
+    mw.spider_closed(spider, 'finished')
+    assert crawler.stats.get_value('checkpoint/kept_pending') == 2
+    assert not CheckpointStore(str(tmp_path)).completed
+
+    # The next run fetches them again
+    crawler, mw = open_middleware(make_crawler, tmp_path)
+    resumed = collect(mw.process_start(start_requests('http://example.com/')))
+    assert sorted(r.url for r in resumed) == ['http://example.com/a', 'http://example.com/b']
+
+
+def test_completing_with_nothing_done_can_be_reopened(make_crawler, tmp_path):
+    crawler, mw = open_middleware(make_crawler, tmp_path)
+    mw.spider_closed(crawler.spider, 'finished')
+    assert CheckpointStore(str(tmp_path)).completed
+
+
+def test_dropped_duplicate_and_redirect(make_crawler, tmp_path):
+    crawler, mw = open_middleware(make_crawler, tmp_path)
+    spider = crawler.spider
+    [start] = collect(mw.process_start(start_requests('http://example.com/')))
+    first, duplicate = list(mw.process_spider_output(
+        response_for(start), [Request('http://example.com/a'), Request('http://example.com/a')], spider,
+    ))
+    # The scheduler keeps the first one, so dropping the duplicate changes nothing
+    mw.request_dropped(duplicate, spider)
+    assert list(mw.pending) == [mw.fingerprint(first)]
+
+    # A redirect of `first` to an already seen page ends `first`
+    redirect = first.replace(url='http://example.com/')
+    mw.request_dropped(redirect, spider)
+    assert mw.pending == {}
+
+
+def test_items_without_a_response_are_kept(make_crawler, tmp_path):
+    crawler, mw = open_middleware(make_crawler, tmp_path)
+    mw.item_scraped({'title': 'From start'}, None, crawler.spider)
+    mw.spider_closed(crawler.spider, 'shutdown')
+    assert list(iter_checkpoint_items(str(tmp_path))) == [{'title': 'From start'}]
+
+
+def test_rerunning_a_completed_crawl_reports_it(make_crawler, tmp_path):
+    crawler, mw = open_middleware(make_crawler, tmp_path)
+    spider = crawler.spider
+    [start] = collect(mw.process_start(start_requests('http://example.com/')))
+    list(mw.process_spider_output(response_for(start), [], spider))
+    mw.spider_closed(spider, 'finished')
+    assert CheckpointStore(str(tmp_path)).completed
+
+    crawler, mw = open_middleware(make_crawler, tmp_path)
+    assert collect(mw.process_start(start_requests('http://example.com/'))) == []
+    assert crawler.stats.get_value('checkpoint/already_completed')
@@ -0,0 +1,60 @@
+import json
+import math
+
+import pandas as pd
+import pytest
+
+from chunked_analysis import BookAggregate, aggregate_file, aggregate_files
+
+BOOKS = [
+    {'title': f'Book {i}', 'price': f'£{10 + (i * 7) % 45}.{i % 100:02d}',
+     'rating': ['One', 'Two', 'Three', 'Four', 'Five'][i % 5], 'category': f'Cat {i % 4}',
+     'image_url': 'x' if i % 3 else None, 'description': None if i % 10 == 0 else 'd'}
+    for i in range(250)
+] + [{'title': 'No price', 'price': None, 'category': 'Cat 0'}]
+
+
+def write_feed(path, books):
+    path.write_text(json.dumps(books, indent=4), encoding='utf-8')
+    return str(path)
+
+
+def test_chunks_match_one_dataframe(tmp_path):
+    aggregate = aggregate_file(write_feed(tmp_path / 'books.json', BOOKS), chunk_size=37)
+    prices = pd.Series([float(book['price'][1:]) for book in BOOKS if book['price']])
+
+    assert aggregate.total == len(BOOKS)
+    assert aggregate.priced == len(prices)
+    assert aggregate.price_mean == pytest.approx(prices.mean())
+    assert aggregate.price_std == pytest.approx(prices.std())
+    assert aggregate.price_mode() == prices.mode()[0]
+    for q in (0.25, 0.5, 0.75):
+        assert aggregate.price_quantile(q) == prices.quantile(q, interpolation='lower')
+    assert aggregate.with_descriptions == sum(1 for book in BOOKS if book.get('description'))
+    assert aggregate.categories['Cat 0'] == 64
+    assert sum(aggregate.ratings.values()) == 250
+
+
+def test_files_merge_like_one_file(tmp_path):
+    first = write_feed(tmp_path / 'a.json', BOOKS[:100])
+    second = write_feed(tmp_path / 'b.json', BOOKS[100:])
+    merged = aggregate_files([first, second], chunk_size=50)
+    whole = aggregate_file(write_feed(tmp_path / 'all.json', BOOKS))
+    assert merged.total == whole.total
+    assert merged.price_mean == pytest.approx(whole.price_mean)
+    assert merged.price_m2 == pytest.approx(whole.price_m2)
+    assert merged.price_histogram == whole.price_histogram
+    assert merged.categories == whole.categories
+
+
+def test_csv_export(tmp_path):
+    csv_path = tmp_path / 'books.csv'
+    aggregate_file(write_feed(tmp_path / 'books.json', BOOKS), chunk_size=100, csv_path=str(csv_path))
+    frame = pd.read_csv(csv_path)
+    assert len(frame) == len(BOOKS)
+    assert frame['price_clean'].iloc[0] == 10.0 and frame['rating_numeric'].iloc[0] == 1
+
+
+def test_empty_aggregate():
+    aggregate = BookAggregate()
+    assert math.isnan(aggregate.price_mode()) and math.isnan(aggregate.price_quantile(0.5))
@@ -0,0 +1,55 @@
+from twisted.internet.defer import Deferred
+
+from book_scraper.connpool import ConnectionStats, PooledDownloadHandler
+
+
+class FakeH2Handler:
+    def __init__(self):
+        self.closing = Deferred()
+
+    def close(self):
+        return self.closing
+
+
+def test_summary_reports_reuse_ratio_and_average_times(make_crawler):
+    crawler = make_crawler()
+    stats = ConnectionStats(crawler.stats)
+    stats.opened(0.002)
+    stats.opened(0.004)
+    for _ in range(7):
+        stats.reused()
+    stats.stale()
+    stats.tls_handshake(0.010)
+    stats.summarize()
+
+    values = crawler.stats.get_stats()
+    assert values['downloader/pool/connections_reused'] == 6
+    assert values['downloader/pool/connections_stale'] == 1
+    assert values['downloader/pool/reuse_ratio'] == 0.75
+    assert values['downloader/pool/tcp_connect_ms_avg'] == 3.0
+    assert values['downloader/pool/tls_handshake_ms_avg'] == 10.0
+
+
+def test_pool_size_defaults_to_per_domain_concurrency(make_crawler):
+    crawler = make_crawler({'CONCURRENT_REQUESTS_PER_DOMAIN': 6})
+    handler = PooledDownloadHandler(crawler.settings, crawler)
+    assert handler._pool.maxPersistentPerHost == 6
+
+    crawler = make_crawler({'CONCURRENT_REQUESTS_PER_DOMAIN': 6, 'DOWNLOAD_POOL_SIZE': 2,
+                            'DOWNLOAD_POOL_PERSISTENT': False})
+    handler = PooledDownloadHandler(crawler.settings, crawler)
+    assert handler._pool.maxPersistentPerHost == 2
+    assert not handler._pool.persistent
+
+
+def test_close_waits_for_the_http2_connections(make_crawler):
+    crawler = make_crawler({'DOWNLOAD_HTTP2': True})
+    handler = PooledDownloadHandler(crawler.settings, crawler)
+    handler.h2 = FakeH2Handler()
+    closed = []
+    handler.close().addCallback(closed.append)
+    assert not closed
+
+    handler.h2.closing.callback(None)
+    assert len(closed) == 1
+    assert all(success for success, _ in closed[0])
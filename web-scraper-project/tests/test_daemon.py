@@ -0,0 +1,81 @@
+import io
+import json
+
+import pytest
+from scrapy import Spider
+from scrapy.settings import Settings
+from twisted.internet import defer
+from twisted.web.test.requesthelper import DummyRequest
+
+from book_scraper.daemon import CrawlDaemon, JobError, JobsResource
+
+
+class BooksSpider(Spider):
+    name = 'books'
+
+
+class FakeRunner:
+    def __init__(self):
+        self.settings = Settings({'DAEMON_FEED_URI': 'jobs/%(spider)s-%(job)s.jl'})
+        self.spider_loader = self
+        self.crawls = {}
+
+    def list(self):
+        return ['books']
+
+    def load(self, name):
+        return BooksSpider
+
+    def crawl(self, crawler, **kwargs):
+        crawler._apply_settings()
+        self.crawls[crawler] = d = defer.Deferred()
+        return d
+
+
+@pytest.fixture
+def daemon():
+    daemon = CrawlDaemon(FakeRunner(), max_jobs=2)
+    yield daemon
+    daemon.close()
+
+
+def post(daemon, body):
+    request = DummyRequest([b''])
+    request.method = b'POST'
+    request.content = io.BytesIO(body)
+    data = JobsResource(daemon).render_POST(request)
+    return request.responseCode, json.loads(data)
+
+
+@pytest.mark.parametrize('body', [
+    b'[]', b'"books"', b'{"spider": ["books"]}', b'{"spider": "nope"}', b'{"spider": "books", "every": "3600"}',
+    b'{"spider": "books", "every": true}', b'{"spider": "books", "every": -1}', b'{"spider": "books", "args": [1]}',
+    b'{"spider": "books", "settings": "x"}', b'{}', b'not json',
+])
+def test_invalid_submissions_are_rejected(daemon, body):
+    status, data = post(daemon, body)
+    assert status == 400 and 'error' in data
+    assert not daemon.jobs and not daemon.schedules
+
+
+def test_jobs_get_their_own_feed(daemon):
+    first = daemon.submit('books')
+    second = daemon.submit('books', settings={'CLOSESPIDER_ITEMCOUNT': 5})
+    custom = daemon.submit('books', settings={'FEEDS': {'mine.json': {'format': 'json'}}})
+
+    assert first.feed == 'jobs/books-j1.jl' and second.feed == 'jobs/books-j2.jl'
+    assert list(first.crawler.settings.getdict('FEEDS')) == [first.feed]
+    assert second.crawler.settings.getint('CLOSESPIDER_ITEMCOUNT') == 5
+    # Only two jobs run at once; the third starts when one finishes
+    assert custom.status == 'pending'
+    daemon.runner.crawls[first.crawler].callback(None)
+    assert custom.status == 'running' and custom.feed is None
+    assert list(custom.crawler.settings.getdict('FEEDS')) == ['mine.json']
+
+
+def test_schedule_skips_a_run_while_the_last_job_is_running(daemon):
+    schedule = daemon.submit('books', every=3600)
+    assert schedule.runs == 1
+    daemon._run_schedule(schedule)
+    assert (schedule.runs, schedule.skipped) == (1, 1)
+    assert post(daemon, b'{"spider": "books", "every": 60.5}')[0] == 201
@@ -0,0 +1,115 @@
+import http.client
+import json
+import os
+import threading
+import urllib.error
+import urllib.request
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+from visualization import dashboard_server
+from visualization.dashboard_server import Aggregates, DashboardHandler, tail_json_lines
+
+
+@pytest.fixture
+def server():
+    aggregates = Aggregates()
+    handler = type('Handler', (DashboardHandler,), {'aggregates': aggregates})
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield f'http://127.0.0.1:{httpd.server_port}', aggregates
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def post(url, body):
+    request = urllib.request.Request(url + '/api/items', data=body, method='POST')
+    try:
+        with urllib.request.urlopen(request, timeout=5) as response:
+            return response.status
+    except urllib.error.HTTPError as e:
+        return e.code
+
+
+def test_snapshot():
+    aggregates = Aggregates()
+    aggregates.add([
+        {'category': 'Poetry', 'rating': 'Five', 'price': '£12.00'},
+        {'category': 'Poetry', 'rating': 'One', 'price': '£51.00'},
+        {'category': 'Travel', 'price': None},
+    ])
+    snapshot = aggregates.snapshot()
+    assert snapshot['version'] == 1 and snapshot['total_books'] == 3
+    assert snapshot['avg_price'] == 31.5
+    assert snapshot['top_categories'] == [('Poetry', 2), ('Travel', 1)]
+    assert snapshot['ratings'] == {1: 1, 2: 0, 3: 0, 4: 0, 5: 1}
+    assert snapshot['price_histogram'] == [(10, 1), (50, 1)]
+    assert snapshot['price_bands'] == {'cheap': 1, 'medium': 0, 'expensive': 1}
+
+
+def test_post_items(server):
+    url, aggregates = server
+    assert post(url, json.dumps({'title': 'A', 'price': '£3'}).encode()) == 200
+    assert post(url, json.dumps([{'title': 'B'}, {'title': 'C'}]).encode()) == 200
+    for body in (b'not json', b'"a string"', b'42', b'[1, 2]', b'null'):
+        assert post(url, body) == 400, body
+    assert aggregates.total == 3
+
+
+def test_malformed_requests_get_a_400(server):
+    url, _ = server
+    with pytest.raises(urllib.error.HTTPError) as error:
+        urllib.request.urlopen(url + '/api/stats?since=abc', timeout=5)
+    assert error.value.code == 400
+
+    for length in ('abc', '-5'):
+        connection = http.client.HTTPConnection(url.split('//')[1], timeout=5)
+        connection.putrequest('POST', '/api/items')
+        connection.putheader('Content-Length', length)
+        connection.endheaders()
+        assert connection.getresponse().status == 400, length
+        connection.close()
+
+
+def test_page_does_not_render_labels_as_html(server):
+    url, _ = server
+    with urllib.request.urlopen(url + '/', timeout=5) as response:
+        page = response.read().decode('utf-8')
+    assert 'innerHTML' not in page and 'textContent = r[0]' in page
+
+
+def test_replaced_feed_resets_the_aggregates(tmp_path, monkeypatch):
+    path = tmp_path / 'books.jl'
+    path.write_text('{"title": "A"}\n{"title": "B"}\n{"title": "C"}\n')
+    aggregates = Aggregates()
+
+    # The tail loop sleeps between polls: replace the file after the first
+    # poll and stop after the second
+    polls = iter([lambda: path.write_text('{"title": "D"}\n')])
+
+    def sleep(interval):
+        next(polls)()
+
+    monkeypatch.setattr(dashboard_server.time, 'sleep', sleep)
+    with pytest.raises(StopIteration):
+        tail_json_lines(str(path), aggregates)
+    assert aggregates.total == 1
+    assert aggregates.version == 3  # first batch, reset, new batch
+
+
+def test_feed_replaced_by_a_larger_file_resets_the_aggregates(tmp_path, monkeypatch):
+    path = tmp_path / 'books.jl'
+    path.write_text('{"title": "A"}\n')
+    aggregates = Aggregates()
+
+    def replace():
+        new = tmp_path / 'new.jl'
+        new.write_text('{"title": "B"}\n{"title": "C"}\n')
+        os.replace(new, path)
+
+    polls = iter([replace])
+    monkeypatch.setattr(dashboard_server.time, 'sleep', lambda interval: next(polls)())
+    with pytest.raises(StopIteration):
+        tail_json_lines(str(path), aggregates)
+    assert aggregates.total == 2
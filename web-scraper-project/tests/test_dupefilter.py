@@ -0,0 +1,71 @@
+import hashlib
+
+import pytest
+from scrapy import Request
+
+from book_scraper.dupefilter import CompactDupeFilter, FingerprintTable, ScalableBloomFilter
+
+
+def fingerprint(i):
+    return hashlib.sha1(str(i).encode()).digest()
+
+
+@pytest.mark.parametrize('bits', [64, 128])
+def test_table_grows_and_persists(tmp_path, bits):
+    path = str(tmp_path / 'seen.bin')
+    table = FingerprintTable(path, bits, capacity=16)
+    assert all(table.add(fingerprint(i)) for i in range(1000))
+    assert not table.add(fingerprint(5))
+    assert table.capacity >= 1000 / table.MAX_LOAD
+    table.close()
+
+    table = FingerprintTable(path, 64)  # an existing file keeps its width
+    assert table.width == bits // 64
+    assert len(table) == 1000
+    assert fingerprint(999) in table
+    assert fingerprint(1000) not in table
+    table.close()
+
+
+def test_table_rejects_another_file(tmp_path):
+    path = tmp_path / 'other.bin'
+    path.write_bytes(b'not a table' * 10)
+    with pytest.raises(ValueError):
+        FingerprintTable(str(path))
+
+
+def test_bloom_filter_scales_and_persists(tmp_path):
+    path = str(tmp_path / 'seen.bloom')
+    bloom = ScalableBloomFilter(path, error_rate=1e-4, capacity=100)
+    added = sum(bloom.add(fingerprint(i)) for i in range(1000))
+    assert added >= 999
+    assert len(bloom.slices) > 1
+    bloom.close()
+
+    bloom = ScalableBloomFilter(path)
+    assert bloom.error_rate == 1e-4
+    assert all(fingerprint(i) in bloom for i in range(1000))
+    assert sum(fingerprint(i) in bloom for i in range(1000, 11000)) < 10
+    bloom.close()
+
+
+def test_filter_skips_urls_seen_by_an_earlier_run(make_crawler, tmp_path):
+    settings = {'DUPEFILTER_PATH': str(tmp_path / 'seen.bin')}
+    crawler = make_crawler(settings)
+    dupefilter = CompactDupeFilter.from_crawler(crawler)
+    assert not dupefilter.request_seen(Request('http://example.com/a'))
+    assert dupefilter.request_seen(Request('http://example.com/a'))
+    dupefilter.close('finished')
+    assert crawler.stats.get_value('dupefilter/fingerprints') == 1
+
+    dupefilter = CompactDupeFilter.from_crawler(make_crawler(settings))
+    assert dupefilter.request_seen(Request('http://example.com/a'))
+    assert not dupefilter.request_seen(Request('http://example.com/b'))
+    dupefilter.close('finished')
+
+
+def test_persistent_filter_refuses_a_checkpoint(make_crawler, tmp_path):
+    crawler = make_crawler({'DUPEFILTER_PATH': str(tmp_path / 'seen.bin'),
+                            'CHECKPOINT_DIR': str(tmp_path / 'state')})
+    with pytest.raises(ValueError, match='CHECKPOINT_DIR'):
+        CompactDupeFilter.from_crawler(crawler)
@@ -0,0 +1,110 @@
+import csv
+import gzip
+import json
+
+import pytest
+from scrapy.exceptions import NotConfigured
+from twisted.internet.defer import Deferred
+
+from book_scraper import export, pipelines
+from book_scraper.export import FanOutExportPipeline, Record, encode_json_line
+from book_scraper.items import BookItem
+
+ITEMS = [
+    BookItem(title='Café – « 1 »', price='£10.00', rating='Three', category='Poetry'),
+    BookItem(title='B', price='£20.00', description='a, "quoted"\nline'),
+]
+
+
+def test_orjson_and_json_lines_decode_the_same(monkeypatch):
+    data = dict(ITEMS[0])
+    line = encode_json_line(data)
+    monkeypatch.setattr(export, 'orjson', None)
+    fallback = encode_json_line(data)
+    assert line.endswith(b'\n') and fallback.endswith(b'\n')
+    assert json.loads(line) == json.loads(fallback) == data
+
+
+def test_not_configured_without_sinks(make_crawler):
+    with pytest.raises(NotConfigured):
+        FanOutExportPipeline.from_crawler(make_crawler())
+
+
+def test_every_sink_gets_every_item(make_crawler, tmp_path):
+    crawler = make_crawler({
+        'EXPORT_SINKS': [f'jsonl:{tmp_path}/books.jl', f'csv:{tmp_path}/books.csv', f'gzip:{tmp_path}/books.jl.gz'],
+        'EXPORT_BUFFER_SIZE': 64,
+    })
+    for _ in range(2):  # a second run appends, without a second CSV header
+        pipeline = FanOutExportPipeline.from_crawler(crawler)
+        pipeline.open_spider(crawler.spider)
+        for item in ITEMS:
+            assert pipeline.process_item(item, crawler.spider) is item
+        pipeline.close_spider(crawler.spider)
+
+    expected = [dict(item) for item in ITEMS] * 2
+    with open(tmp_path / 'books.jl', encoding='utf-8') as f:
+        assert [json.loads(line) for line in f] == expected
+    with gzip.open(tmp_path / 'books.jl.gz', 'rt', encoding='utf-8') as f:
+        assert [json.loads(line) for line in f] == expected
+    with open(tmp_path / 'books.csv', encoding='utf-8', newline='') as f:
+        rows = list(csv.DictReader(f))
+    assert [row['title'] for row in rows] == ['Café – « 1 »', 'B'] * 2
+    assert rows[1]['description'] == 'a, "quoted"\nline'
+
+
+def test_record_is_encoded_once():
+    record = Record(ITEMS[0])
+    assert record.data == dict(ITEMS[0])
+    assert json.loads(record.json_line) == record.data
+
+
+def test_unknown_sink(make_crawler):
+    with pytest.raises(ValueError, match='Unknown export sink'):
+        FanOutExportPipeline.from_crawler(make_crawler({'EXPORT_SINKS': ['parquet:x']}))
+
+
+class FakeCollection:
+    def __init__(self):
+        self.batches = []
+
+    def insert_many(self, documents, ordered=True):
+        self.batches.append(documents)
+
+
+def test_mongo_inserts_run_off_the_reactor_thread(make_crawler, monkeypatch):
+    collection = FakeCollection()
+    released = []
+    monkeypatch.setattr(pipelines, 'acquire_mongo_client', lambda uri: {'books_db': {'books': collection}})
+    monkeypatch.setattr(pipelines, 'release_mongo_client', released.append)
+    # Thread calls are held until the test fires them
+    threaded, results = [], []
+
+    def defer_to_thread(f, *args, **kwargs):
+        threaded.append(f)
+        results.append(Deferred())
+        return results[-1].addCallback(lambda _: f(*args, **kwargs))
+
+    monkeypatch.setattr(export, 'deferToThread', defer_to_thread)
+    crawler = make_crawler({'EXPORT_SINKS': ['mongo'], 'MONGO_URI': 'mongodb://db/', 'EXPORT_MONGO_BATCH_SIZE': 2})
+    pipeline = FanOutExportPipeline.from_crawler(crawler)
+    pipeline.open_spider(crawler.spider)
+    for item in ITEMS * 2:
+        pipeline.process_item(item, crawler.spider)
+    assert threaded == [collection.insert_many] * 2 and collection.batches == []
+
+    closed = []
+    pipeline.close_spider(crawler.spider).addCallback(closed.append)
+    assert not closed and not released
+    for d in results:
+        d.callback(None)
+    assert [len(batch) for batch in collection.batches] == [2, 2]
+    assert closed and released == ['mongodb://db/']
+
+
+def test_sinks_opened_before_a_failure_are_closed(make_crawler, tmp_path):
+    crawler = make_crawler({'EXPORT_SINKS': [f'jsonl:{tmp_path}/books.jl', f'csv:{tmp_path}/missing/books.csv']})
+    pipeline = FanOutExportPipeline.from_crawler(crawler)
+    with pytest.raises(FileNotFoundError):
+        pipeline.open_spider(crawler.spider)
+    assert pipeline.sinks[0].file.closed
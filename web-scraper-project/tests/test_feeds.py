@@ -0,0 +1,46 @@
+import json
+
+import pytest
+
+from feeds import iter_books
+
+BOOKS = [{'title': f'Book {i}', 'description': 'x' * (i * 7)} for i in range(20)]
+
+
+def test_json_lines(tmp_path):
+    path = tmp_path / 'books.jl'
+    path.write_text('\n'.join(json.dumps(book) for book in BOOKS) + '\n\n', encoding='utf-8')
+    assert list(iter_books(str(path))) == BOOKS
+
+
+@pytest.mark.parametrize('block_size', [16, 1 << 20])
+def test_appended_json_arrays(tmp_path, block_size):
+    # A re-run crawl appends a second array; small blocks split records
+    path = tmp_path / 'books.json'
+    path.write_text('﻿' + json.dumps(BOOKS[:12], indent=4) + '\n' + json.dumps(BOOKS[12:]), encoding='utf-8')
+    assert list(iter_books(str(path), block_size=block_size)) == BOOKS
+
+
+@pytest.mark.parametrize('block_size', [16, 1 << 20])
+def test_malformed_records_are_skipped(tmp_path, caplog, block_size):
+    # A broken record in the middle, and a last one cut off mid-write
+    records = [json.dumps(book, indent=4) for book in BOOKS[:3]]
+    records[1] = records[1].replace('",', '"', 1)
+    path = tmp_path / 'books.json'
+    path.write_text('[\n' + ',\n'.join(records) + '\n]\n[\n' + json.dumps(BOOKS[3])[:-5], encoding='utf-8')
+    assert list(iter_books(str(path), block_size=block_size)) == [BOOKS[0], BOOKS[2]]
+    assert caplog.text.count('Skipping malformed record') == 2
+
+    path = tmp_path / 'books.jl'
+    path.write_text(json.dumps(BOOKS[0]) + '\n{"title": \n' + json.dumps(BOOKS[1]) + '\n', encoding='utf-8')
+    assert list(iter_books(str(path))) == BOOKS[:2]
+
+
+def test_long_records_are_decoded_a_few_times(tmp_path, monkeypatch):
+    path = tmp_path / 'books.json'
+    path.write_text(json.dumps([{'description': 'x' * 100_000}]), encoding='utf-8')
+    calls = []
+    decode = json.JSONDecoder.raw_decode
+    monkeypatch.setattr(json.JSONDecoder, 'raw_decode', lambda self, s, idx=0: calls.append(idx) or decode(self, s, idx))
+    assert len(list(iter_books(str(path), block_size=100))) == 1
+    assert len(calls) < 20
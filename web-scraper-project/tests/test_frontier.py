@@ -0,0 +1,52 @@
+from scrapy import Request
+
+from book_scraper.frontier import BoundedFrontierScheduler, deserialize_request, serialize_request
+
+
+def test_serialize_drops_default_fields(make_crawler):
+    spider = make_crawler().spider
+    request = Request('http://example.com/', priority=5, meta={'page': 2})
+    data = serialize_request(request, spider)
+    assert b'dont_filter' not in data
+    copy = deserialize_request(data, spider)
+    assert (copy.url, copy.priority, copy.meta) == (request.url, 5, {'page': 2})
+
+
+def test_overflow_spills_to_disk_without_changing_order(make_crawler, tmp_path):
+    crawler = make_crawler({'FRONTIER_MEMORY_LIMIT': 2, 'FRONTIER_DIR': str(tmp_path)})
+    scheduler = BoundedFrontierScheduler.from_crawler(crawler)
+    scheduler.open(crawler.spider)
+
+    priorities = [0, 10, 0, 10, 5, 0]
+    for i, priority in enumerate(priorities):
+        assert scheduler.enqueue_request(Request(f'http://example.com/{i}', priority=priority))
+    assert not scheduler.enqueue_request(Request('http://example.com/0'))
+    assert len(scheduler) == len(priorities)
+    assert crawler.stats.get_value('frontier/spilled') == len(priorities) - 2
+
+    popped = []
+    while (request := scheduler.next_request()) is not None:
+        popped.append(request.priority)
+    assert popped == sorted(priorities, reverse=True)
+    assert crawler.stats.get_value('frontier/memory_queue_max') == 2
+    scheduler.close('finished')
+
+
+def test_requests_left_by_an_earlier_run_are_not_replayed(make_crawler, tmp_path):
+    settings = {'FRONTIER_MEMORY_LIMIT': 0, 'FRONTIER_DIR': str(tmp_path)}
+    crawler = make_crawler(settings)
+    scheduler = BoundedFrontierScheduler.from_crawler(crawler)
+    scheduler.open(crawler.spider)
+    scheduler.enqueue_request(Request('http://example.com/stale'))
+    # Interrupted: the spill queue is closed but its directory stays
+    scheduler.spill.close()
+
+    crawler = make_crawler(settings)
+    scheduler = BoundedFrontierScheduler.from_crawler(crawler)
+    scheduler.open(crawler.spider)
+    scheduler.enqueue_request(Request('http://example.com/fresh'))
+    assert len(scheduler) == 1
+    assert scheduler.next_request().url == 'http://example.com/fresh'
+    assert scheduler.next_request() is None
+    scheduler.close('finished')
+    assert len(list(tmp_path.iterdir())) == 1
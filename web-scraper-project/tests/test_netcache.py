@@ -0,0 +1,102 @@
+import pytest
+from scrapy import Request
+from scrapy.exceptions import NotConfigured
+from scrapy.http import TextResponse
+from scrapy.resolver import dnscache
+from twisted.internet import defer, reactor
+
+from book_scraper import netcache
+from book_scraper.netcache import (
+    NetCacheDnsExtension,
+    NetCacheStore,
+    PersistentCachingResolver,
+    PersistentRobotsTxtMiddleware,
+)
+
+ROBOTS = b'User-agent: *\nDisallow: /private/\n'
+
+
+@pytest.fixture
+def store_path(tmp_path):
+    return str(tmp_path / 'netcache.sqlite')
+
+
+def test_store_ttl(store_path):
+    store = NetCacheStore(store_path)
+    store.save_robots('example.com', ROBOTS)
+    store.save_dns('example.com', '10.0.0.1')
+    store.save_dns('example.com', '10.0.0.2')
+    assert store.fresh_robots(60) == [('example.com', ROBOTS)]
+    assert store.fresh_dns(60) == [('example.com', '10.0.0.2')]
+    assert store.fresh_robots(-1) == [] and store.fresh_dns(-1) == []
+    store.close()
+
+
+def test_robots_rules_are_reused_across_runs(make_crawler, store_path):
+    # First run: robots.txt is downloaded (simulated) and saved; 5xx is not
+    crawler = make_crawler({'NETCACHE_PATH': store_path, 'ROBOTSTXT_OBEY': True})
+    mw = PersistentRobotsTxtMiddleware.from_crawler(crawler)
+    for netloc, status in (('example.com', 200), ('down.example', 503)):
+        mw._parsers[netloc] = defer.Deferred()
+        mw._parse_robots(TextResponse(f'http://{netloc}/robots.txt', status=status, body=ROBOTS), netloc, crawler.spider)
+    mw.spider_closed(crawler.spider)
+
+    # Second run: the rules are there before any request
+    crawler = make_crawler({'NETCACHE_PATH': store_path, 'ROBOTSTXT_OBEY': True})
+    mw = PersistentRobotsTxtMiddleware.from_crawler(crawler)
+    mw.spider_opened(crawler.spider)
+    parser = mw.robot_parser(Request('http://example.com/private/1'), crawler.spider)
+    assert not parser.allowed('http://example.com/private/1', '*')
+    assert parser.allowed('http://example.com/public', '*')
+    assert crawler.stats.get_value('netcache/robots/loaded') == 1
+    assert crawler.stats.get_value('netcache/robots/hit') == 1
+    mw.spider_closed(crawler.spider)
+
+
+def test_resolver_is_seeded_from_earlier_runs(make_crawler, store_path, monkeypatch):
+    monkeypatch.setattr(netcache, 'dns_counts', netcache.Counter())
+    store = NetCacheStore(store_path)
+    store.save_dns('books.example', '10.1.2.3')
+    store.close()
+
+    crawler = make_crawler({'NETCACHE_PATH': store_path})
+    resolver = PersistentCachingResolver.from_crawler(crawler, reactor)
+    try:
+        result = resolver.getHostByName('books.example')
+        assert result.called and result.result == '10.1.2.3'
+        assert netcache.dns_counts == {'hit': 1}
+
+        resolver._cache_result('10.9.9.9', 'new.example')
+        assert dict(resolver.store.fresh_dns(60))['new.example'] == '10.9.9.9'
+    finally:
+        resolver.store.close()
+        dnscache.pop('books.example', None)
+        dnscache.pop('new.example', None)
+
+
+def test_dns_stats_and_store_shutdown_without_robots_txt(make_crawler, store_path, monkeypatch):
+    monkeypatch.setattr(netcache, 'dns_counts', netcache.Counter())
+    settings = {'NETCACHE_PATH': store_path, 'ROBOTSTXT_OBEY': False}
+    crawler = make_crawler(settings)
+    resolver = PersistentCachingResolver.from_crawler(crawler, reactor)
+    monkeypatch.setattr(reactor, 'resolver', resolver)
+    try:
+        ext = NetCacheDnsExtension.from_crawler(crawler)
+        ext.spider_opened(crawler.spider)
+        resolver.getHostByName('miss.example')
+        ext.spider_closed(crawler.spider)
+        assert crawler.stats.get_value('netcache/dns/miss') == 1
+        assert resolver.store is None
+
+        # A later crawl in the same process reopens the store
+        resolver._cache_result('10.0.0.7', 'later.example')
+        assert dict(resolver.store.fresh_dns(60))['later.example'] == '10.0.0.7'
+    finally:
+        resolver.close_store()
+        for host in ('miss.example', 'later.example'):
+            dnscache.pop(host, None)
+
+
+def test_dns_extension_needs_a_netcache_path(make_crawler):
+    with pytest.raises(NotConfigured):
+        NetCacheDnsExtension.from_crawler(make_crawler())
@@ -0,0 +1,74 @@
+import asyncio
+import inspect
+
+import pytest
+from scrapy.http import HtmlResponse
+from twisted.internet import reactor
+
+from book_scraper import pipelines
+from book_scraper.pipelines import AsyncMongoDBPipeline, acquire_mongo_client, release_mongo_client
+from book_scraper.spiders.books_spider import BooksSpider
+
+MONGO_URI = 'mongodb://localhost:27017/'
+BOOK_PAGE = b'<h1>A Light in the Attic</h1><p class="price_color">\xc2\xa351.77</p>'
+enricher_loops = []
+
+
+class FakeCollection:
+    def __init__(self):
+        self.documents = []
+
+    async def insert_one(self, document):
+        await asyncio.sleep(0)
+        self.documents.append(document)
+
+
+def test_asyncio_and_blocking_clients_are_shared_separately(monkeypatch):
+    monkeypatch.setattr(pipelines, '_mongo_clients', {})
+    blocking = acquire_mongo_client(MONGO_URI)
+    asynchronous = acquire_mongo_client(MONGO_URI, asynchronous=True)
+    assert asynchronous is not blocking
+    assert acquire_mongo_client(MONGO_URI, asynchronous=True) is asynchronous
+
+    assert release_mongo_client(MONGO_URI, asynchronous=True) is None
+    closing = release_mongo_client(MONGO_URI, asynchronous=True)
+    assert inspect.iscoroutine(closing)
+    asyncio.run(closing)
+    assert list(pipelines._mongo_clients) == [(MONGO_URI, False)]
+    release_mongo_client(MONGO_URI)
+    assert not pipelines._mongo_clients
+
+
+def test_async_pipeline_awaits_the_insert():
+    pipeline = AsyncMongoDBPipeline(MONGO_URI, 'books_db')
+    collection = FakeCollection()
+    pipeline.db = {'books': collection}
+    item = {'title': 'A Light in the Attic'}
+    assert asyncio.run(pipeline.process_item(item, None)) is item
+    assert collection.documents == [item]
+
+
+async def look_up(item, spider):
+    await asyncio.sleep(0)
+    enricher_loops.append(asyncio.get_running_loop())
+    item['description'] = 'Looked up'
+    return item
+
+
+def test_books_spider_awaits_the_enricher_on_the_reactor_loop(make_crawler):
+    crawler = make_crawler({'BOOK_ENRICHER': 'test_pipelines.look_up'}, BooksSpider)
+    response = HtmlResponse('http://books.toscrape.com/catalogue/book_1/index.html', body=BOOK_PAGE)
+
+    async def parse_book():
+        return [item async for item in crawler.spider.parse_book(response)]
+
+    assert inspect.isasyncgenfunction(BooksSpider.parse_book)
+    loop = reactor._asyncioEventloop
+    [item] = loop.run_until_complete(parse_book())
+    assert item['title'] == 'A Light in the Attic' and item['description'] == 'Looked up'
+    assert enricher_loops == [loop]
+
+
+def test_books_spider_rejects_a_blocking_enricher(make_crawler):
+    with pytest.raises(ValueError, match='BOOK_ENRICHER'):
+        make_crawler({'BOOK_ENRICHER': 'json.dumps'}, BooksSpider)
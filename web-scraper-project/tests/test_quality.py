@@ -0,0 +1,108 @@
+import random
+from collections import Counter
+
+import pytest
+
+from book_scraper.quality import HyperLogLog, ItemProfile, QualityMonitorPipeline, population_stability
+
+RATINGS = ['One', 'Two', 'Three', 'Four', 'Five']
+WORDS = ['light', 'attic', 'velvet', 'soumission', 'sharp', 'objects', 'sapiens', 'history', 'requiem', 'red']
+
+
+def books(count, seed=0, **overrides):
+    rng = random.Random(seed)
+    for i in range(count):
+        book = {
+            'title': f'{rng.choice(WORDS).title()} {rng.choice(WORDS)} {seed}-{i}',
+            'price': f'£{rng.uniform(10, 60):.2f}',
+            'rating': rng.choice(RATINGS),
+            'availability': f'In stock ({rng.randint(1, 22)} available)',
+            'description': ' '.join(rng.choice(WORDS) for _ in range(rng.randint(40, 80))),
+            'product_url': f'http://books.toscrape.com/catalogue/book_{seed}_{i}/index.html',
+        }
+        book.update(overrides)
+        yield book
+
+
+def profile_of(items):
+    profile = ItemProfile()
+    for item in items:
+        profile.add(item)
+    return profile
+
+
+class FakeEngine:
+    def __init__(self):
+        self.closed = []
+
+    def close_spider(self, spider, reason):
+        self.closed.append(reason)
+
+
+def test_hyperloglog_estimates_distinct_values():
+    hll = HyperLogLog()
+    for i in range(20000):
+        hll.add(str(i % 5000))
+    assert abs(hll.estimate() - 5000) / 5000 < 0.1
+    assert round(HyperLogLog(registers=hll.registers).estimate()) == round(hll.estimate())
+
+
+def test_population_stability():
+    histogram = Counter({1: 50, 2: 30, 3: 20})
+    assert population_stability(histogram, histogram) == 0.0
+    assert population_stability(Counter({1: 5, 2: 5, 3: 90}), histogram) > 0.25
+    assert population_stability(Counter(), histogram) == 0.0
+
+
+def test_same_site_raises_no_alerts():
+    baseline = profile_of(books(500, seed=1))
+    assert profile_of(books(300, seed=2)).compare(baseline) == []
+
+
+@pytest.mark.parametrize('overrides, field, check', [
+    ({'availability': 'Available now'}, 'availability', 'conformance'),
+    ({'rating': None}, 'rating', 'null_rate'),
+    ({'product_url': 'http://books.toscrape.com/'}, 'product_url', 'distinct'),
+])
+def test_broken_field_raises_an_alert(overrides, field, check):
+    baseline = profile_of(books(500, seed=1))
+    alerts = profile_of(books(300, seed=2, **overrides)).compare(baseline)
+    assert (field, check) in {(alert.field, alert.check) for alert in alerts}
+
+
+def test_doubled_description_shifts_the_length_histogram():
+    baseline = profile_of(books(500, seed=1))
+    doubled = [dict(book, description=book['description'] * 2) for book in books(300, seed=2)]
+    assert [(alert.field, alert.check) for alert in profile_of(doubled).compare(baseline)] == \
+        [('description', 'length')]
+
+
+def test_profile_round_trips_through_a_file(tmp_path):
+    path = str(tmp_path / 'quality' / 'books.json')
+    profile = profile_of(books(200))
+    profile.save(path)
+    loaded = ItemProfile.load(path)
+    assert loaded.items == 200
+    assert loaded.to_dict() == profile.to_dict()
+    assert loaded.compare(profile) == []
+
+
+def test_pipeline_records_a_baseline_then_closes_on_drift(make_crawler, tmp_path):
+    settings = {'QUALITY_BASELINE': str(tmp_path / '%(name)s.json'), 'QUALITY_MIN_ITEMS': 100,
+                'QUALITY_CHECK_INTERVAL': 50, 'QUALITY_ACTION': 'close'}
+    crawler = make_crawler(settings)
+    pipeline = QualityMonitorPipeline.from_crawler(crawler)
+    pipeline.open_spider(crawler.spider)
+    for book in books(200, seed=1):
+        pipeline.process_item(book, crawler.spider)
+    pipeline.close_spider(crawler.spider)
+    assert (tmp_path / 'test.json').exists()
+
+    crawler = make_crawler(settings)
+    crawler.engine = FakeEngine()
+    pipeline = QualityMonitorPipeline.from_crawler(crawler)
+    pipeline.open_spider(crawler.spider)
+    for book in books(150, seed=2, availability='Available now'):
+        pipeline.process_item(book, crawler.spider)
+    assert crawler.engine.closed == ['quality_drift']
+    assert crawler.stats.get_value('quality/alerts/availability/conformance') == 1
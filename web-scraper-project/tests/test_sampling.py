@@ -0,0 +1,71 @@
+import random
+import statistics
+
+import pytest
+from scrapy.crawler import Crawler
+from scrapy.settings import Settings
+
+from book_scraper.sampling import MIN_PER_STRATUM, StratifiedEstimator
+from book_scraper.spiders.books_spider import BooksSpider
+
+
+def sample(estimator, populations, per_stratum):
+    rng = random.Random(1)
+    for name, prices in populations.items():
+        for price in rng.sample(prices, per_stratum):
+            estimator.add(name, price, 3)
+
+
+def test_estimate_covers_the_population_mean():
+    rng = random.Random(0)
+    populations = {
+        'cheap': [rng.uniform(10, 20) for _ in range(400)],
+        'dear': [rng.uniform(40, 60) for _ in range(100)],
+    }
+    estimator = StratifiedEstimator(seed=0)
+    for name, prices in populations.items():
+        estimator.add_stratum(name, len(prices))
+    sample(estimator, populations, 40)
+
+    mean, half_width = estimator.mean_price()
+    true_mean = statistics.fmean(populations['cheap'] + populations['dear'])
+    assert mean - half_width <= true_mean <= mean + half_width
+    assert half_width < 1.5
+    assert estimator.precision_reached(0.2)
+
+
+def test_strata_without_samples_are_left_out():
+    estimator = StratifiedEstimator(seed=0)
+    estimator.add_stratum('sampled', 100)
+    estimator.add_stratum('failed', 300)
+    estimator.add('sampled', 10.0, 1)
+    estimator.add('sampled', 20.0, 5)
+
+    mean, half_width = estimator.mean_price()
+    assert mean == 15.0 and half_width < float('inf')
+    assert estimator.overall_proportions()[1][0] == 0.5
+    report = estimator.report()
+    assert report['coverage'] == 0.25
+    assert report['uncovered_categories'] == ['failed']
+    assert report['categories']['failed']['avg_price'] is None
+
+
+def test_new_strata_are_drawn_first():
+    estimator = StratifiedEstimator(seed=0)
+    estimator.add_stratum('a', 50)
+    estimator.add_stratum('b', 3)
+    picks = [stratum.name for stratum in estimator.next_strata(20)]
+    assert picks.count('b') == 3  # the whole (small) category
+    assert picks.count('a') == MIN_PER_STRATUM  # then wait for a variance estimate
+
+
+@pytest.mark.parametrize('cmdline_feeds, expected', [
+    (None, []),
+    ({'sample.jl': {'format': 'jsonlines'}}, ['sample.jl']),
+])
+def test_sampling_replaces_only_the_project_feeds(cmdline_feeds, expected):
+    crawler = Crawler(BooksSpider, Settings({'FEEDS': {'../data/books.json': {'format': 'json'}}}, priority='project'))
+    if cmdline_feeds:
+        crawler.settings.set('FEEDS', cmdline_feeds, priority='cmdline')  # what -o / -O do
+    crawler.spider = crawler._create_spider(sample='1')
+    assert list(crawler.settings.getdict('FEEDS')) == expected
@@ -0,0 +1,59 @@
+import gzip
+import json
+
+from scrapy.http import HtmlResponse
+
+from book_scraper.commands.reextract import extract_batch, iter_book_records
+from book_scraper.warc import WarcWriter, build_response_record, iter_warc_files, parse_http_block
+
+BOOK_PAGE = '''<html><body>
+<ul class="breadcrumb"><li><a href="/">Home</a></li><li><a href="/c">Poetry</a></li><li>A Light</li></ul>
+<div class="item active"><img src="../cover.jpg"></div>
+<h1>A Light in the Attic</h1>
+<p class="price_color">£51.77</p>
+<p class="instock availability"> In stock (22 available) </p>
+<p class="star-rating Three"></p>
+<div id="product_description"></div><p>It's hard to imagine a world without it.</p>
+</body></html>'''.encode('utf-8')
+
+
+def book_response(url='http://example.com/a-light/index.html', status=200):
+    return HtmlResponse(url, status=status, body=BOOK_PAGE,
+                        headers={'Content-Type': 'text/html; charset=utf-8', 'Content-Encoding': 'gzip'})
+
+
+def test_records_round_trip_through_rotated_files(tmp_path):
+    writer = WarcWriter(str(tmp_path), 'books', max_size=1)
+    writer.write(build_response_record(book_response(), 'parse_book'))
+    writer.write(build_response_record(book_response(status=404), 'parse_book'))
+    writer.write(build_response_record(book_response('http://example.com/'), 'parse'))
+    writer.close()
+
+    paths = list(iter_warc_files(str(tmp_path)))
+    assert len(paths) == 3  # rotated after every record
+    with gzip.open(paths[0], 'rb') as f:
+        assert f.read().startswith(b'WARC/1.0\r\n')
+
+    records = list(iter_book_records(paths, 'parse_book'))
+    assert len(records) == 2
+    status, headers, body = parse_http_block(records[0][2])
+    assert status == 200 and body == BOOK_PAGE
+    # The archived body is decoded, so the encoding header must not survive
+    assert b'Content-Encoding' not in headers
+
+
+def test_reextract_uses_the_spider_extraction(tmp_path):
+    writer = WarcWriter(str(tmp_path), 'books', max_size=1 << 20)
+    writer.write(build_response_record(book_response(), 'parse_book'))
+    writer.write(build_response_record(book_response(status=404), 'parse_book'))
+    writer.close()
+
+    records = list(iter_book_records(iter_warc_files(str(tmp_path)), 'parse_book'))
+    [line] = extract_batch(records)
+    book = json.loads(line)
+    assert book['title'] == 'A Light in the Attic'
+    assert book['price'] == '£51.77'
+    assert book['rating'] == 'Three'
+    assert book['category'] == 'Poetry'
+    assert book['image_url'] == 'http://example.com/cover.jpg'
+    assert book['scraped_date'] == records[0][1]
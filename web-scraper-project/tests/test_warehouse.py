@@ -0,0 +1,109 @@
+import json
+import sqlite3
+import statistics
+
+import pytest
+
+import warehouse
+
+BOOKS = [
+    {'title': 'A', 'price': '£10.00', 'rating': 'Five', 'category': 'Poetry'},
+    {'title': 'B', 'price': '£20.50', 'rating': 'One', 'category': 'Poetry'},
+    {'title': 'C', 'price': '£55.25', 'rating': 'Three', 'category': 'History'},
+    {'title': 'D', 'price': None, 'rating': None, 'category': None},
+]
+
+
+@pytest.fixture(params=['sqlite', 'duckdb'])
+def engine(request):
+    if request.param == 'duckdb':
+        pytest.importorskip('duckdb')
+    return request.param
+
+
+def write_feed(tmp_path, books):
+    path = tmp_path / 'books.jl'
+    path.write_text(''.join(json.dumps(book) + '\n' for book in books), encoding='utf-8')
+    return str(path)
+
+
+def test_concatenated_json_feeds_are_read(tmp_path):
+    path = tmp_path / 'books.json'
+    path.write_text(json.dumps(BOOKS[:2], indent=4) + '\n' + json.dumps(BOOKS[2:]), encoding='utf-8')
+    assert [book['title'] for book in warehouse.iter_books(str(path))] == ['A', 'B', 'C', 'D']
+
+
+def test_report_statistics(tmp_path, engine, capsys):
+    db = str(tmp_path / f'books.{engine}')
+    assert warehouse.load(write_feed(tmp_path, BOOKS), db, engine) == 4
+    warehouse.report(db, engine, top=1)
+
+    out = capsys.readouterr().out
+    stdev = statistics.stdev([10.0, 20.5, 55.25])
+    assert f'Standard Deviation: £{stdev:.2f}' in out
+    assert 'Average Price: £28.58' in out
+    assert '1. Poetry: 2 books (50.0%)' in out
+    assert 'Expensive (≥£50): 1 books' in out
+
+
+def test_sqlite_stddev_is_stable_for_large_values():
+    con = warehouse.connect(':memory:')
+    con.execute('CREATE TABLE t (x DOUBLE)')
+    values = [1e9 + 0.1, 1e9 + 0.2, 1e9 + 0.3, None]
+    con.executemany('INSERT INTO t VALUES (?)', [(v,) for v in values])
+    [(std,)] = con.execute('SELECT STDDEV_SAMP(x) FROM t').fetchall()
+    assert std == pytest.approx(0.1, rel=1e-6)
+
+
+def test_report_without_prices(tmp_path, engine, capsys):
+    db = str(tmp_path / f'books.{engine}')
+    warehouse.load(write_feed(tmp_path, BOOKS[3:]), db, engine)
+    warehouse.report(db, engine)
+    assert 'No books with a price' in capsys.readouterr().out
+
+
+def test_report_closes_an_empty_warehouse(tmp_path, monkeypatch, capsys):
+    db = str(tmp_path / 'books.db')
+    con = warehouse.connect(db)
+    warehouse.create_schema(con)
+    con.close()
+
+    connections = []
+    connect = warehouse.connect
+    monkeypatch.setattr(warehouse, 'connect', lambda *args: connections.append(connect(*args)) or connections[-1])
+    warehouse.report(db)
+    assert 'Warehouse is empty' in capsys.readouterr().out
+    with pytest.raises(sqlite3.ProgrammingError):
+        connections[0].execute('SELECT 1')
+
+
+def test_failed_load_is_rolled_back(tmp_path, engine, monkeypatch):
+    db = str(tmp_path / f'books.{engine}')
+    warehouse.load(write_feed(tmp_path, BOOKS[:1]), db, engine)
+
+    def broken_books(path):
+        yield from BOOKS
+        raise ValueError('truncated feed')
+
+    monkeypatch.setattr(warehouse, 'BATCH_SIZE', 2)
+    monkeypatch.setattr(warehouse, 'iter_books', broken_books)
+    with pytest.raises(ValueError, match='truncated'):
+        warehouse.load('books.jl', db, engine)
+
+    con = warehouse.connect(db, engine)
+    assert con.execute('SELECT COUNT(*) FROM books').fetchone()[0] == 1
+    con.close()
+
+
+def test_each_engine_has_its_own_default_file(tmp_path, monkeypatch, capsys):
+    pytest.importorskip('duckdb')
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / 'data').mkdir()
+    feed = write_feed(tmp_path, BOOKS)
+    warehouse.load(feed)
+    warehouse.load(feed, engine='duckdb')
+    assert sorted(path.name for path in (tmp_path / 'data').iterdir()) == ['books.db', 'books.duckdb']
+
+    monkeypatch.setattr('sys.argv', ['warehouse.py', '--db', 'data/books.db', '--engine', 'duckdb', 'report'])
+    assert warehouse.main() == 1
+    assert 'data/books.db is a sqlite warehouse; use --engine sqlite' in capsys.readouterr().out
@@ -1,161 +1,275 @@
-﻿import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
+﻿import hashlib
+import html
 import json
 import os
+import pickle
+import re
+from array import array
+from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
-def create_charts():
-    print("📊 CREATING DATA VISUALIZATIONS...")
-    
-    # Load data - FIXED PATH
-    data_path = Path("data/books.json")
-    
-    if not data_path.exists():
-        # Try alternative path
-        data_path = Path("../data/books.json")
-    
-    if not data_path.exists():
-        print("❌ Could not find books.json. Please check the path.")
-        return
-    
+CHARTS_DIR = 'visualization/charts'
+CACHE_FILE = os.path.join(CHARTS_DIR, '.chart_cache.json')
+PRICE_PATTERN = re.compile(r'([\d\.]+)')
+
+# Bump when a renderer changes so cached PNGs are redrawn
+RENDER_VERSION = 1
+
+
+def load_books(data_path):
     try:
-        # Load the data
         with open(data_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        
-        df = pd.DataFrame(data)
-        print(f"✅ Loaded {len(df)} books from {data_path}")
-        
+            books = json.load(f)
+        print(f"✅ Loaded {len(books)} books from {data_path}")
+        return books
     except json.JSONDecodeError:
         print("⚠️  JSON parsing error, trying manual extraction...")
-        # Try the regex approach from earlier
-        with open(data_path, 'r', encoding='utf-8', errors='ignore') as f:
-            content = f.read()
-        
-        import re
-        pattern = r'\{\s*"title":.*?\}\s*(?=,\s*\{|$)'
-        matches = re.findall(pattern, content, re.DOTALL)
-        
-        books = []
-        for match in matches:
-            try:
-                clean_match = match.replace('\\n', ' ').replace('\\r', ' ')
-                clean_match = re.sub(r',\s*\}$', '}', clean_match)
-                book = json.loads(clean_match)
-                books.append(book)
-            except:
-                continue
-        
-        df = pd.DataFrame(books)
-        print(f"✅ Loaded {len(df)} books using manual extraction")
-    
-    # Clean price data
-    if 'price' in df.columns:
-        df['price_numeric'] = df['price'].astype(str).str.extract(r'([\d\.]+)')[0]
-        df['price_numeric'] = pd.to_numeric(df['price_numeric'], errors='coerce')
-    
-    # Create visualizations directory
-    os.makedirs('visualization/charts', exist_ok=True)
-    
+
+    # Try the regex approach from earlier
+    with open(data_path, 'r', encoding='utf-8', errors='ignore') as f:
+        content = f.read()
+
+    pattern = r'\{\s*"title":.*?\}\s*(?=,\s*\{|$)'
+    matches = re.findall(pattern, content, re.DOTALL)
+
+    books = []
+    for match in matches:
+        try:
+            clean_match = match.replace('\\n', ' ').replace('\\r', ' ')
+            clean_match = re.sub(r',\s*\}$', '}', clean_match)
+            book = json.loads(clean_match)
+            books.append(book)
+        except:
+            continue
+
+    print(f"✅ Loaded {len(books)} books using manual extraction")
+    return books
+
+
+def summarize(books):
+    # One pass over the data: prices grouped by category, plus category counts
+    prices = array('d')
+    prices_by_category = defaultdict(lambda: array('d'))
+    category_counts = Counter()
+    for book in books:
+        category = book.get('category')
+        if category is not None:
+            category_counts[category] += 1
+        match = PRICE_PATTERN.search(str(book.get('price')))
+        if not match:
+            continue
+        try:
+            price = float(match.group(1))
+        except ValueError:
+            continue
+        prices.append(price)
+        if category is not None:
+            prices_by_category[category].append(price)
+    return {
+        'total': len(books),
+        'prices': prices,
+        'prices_by_category': prices_by_category,
+        'category_counts': category_counts,
+    }
+
+
+# ========== CHART RENDERERS (run in worker processes) ==========
+def _pyplot():
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
     # Set style for better looking charts
     plt.style.use('seaborn-v0_8-darkgrid')
-    
+    return plt
+
+
+def render_book_analysis(output, prices, top_cats):
+    plt = _pyplot()
+
     # 1. Price Distribution Histogram
     plt.figure(figsize=(12, 6))
     plt.subplot(1, 2, 1)
-    if 'price_numeric' in df.columns:
-        df['price_numeric'].hist(bins=30, edgecolor='black', color='skyblue', alpha=0.7)
+    if prices:
+        plt.hist(prices, bins=30, edgecolor='black', color='skyblue', alpha=0.7)
         plt.title('Book Price Distribution', fontsize=14, fontweight='bold')
         plt.xlabel('Price (£)', fontsize=12)
         plt.ylabel('Number of Books', fontsize=12)
         plt.grid(axis='y', alpha=0.3)
         # Add mean line
-        mean_price = df['price_numeric'].mean()
-        plt.axvline(mean_price, color='red', linestyle='--', linewidth=2, 
-                   label=f'Mean: £{mean_price:.2f}')
+        mean_price = sum(prices) / len(prices)
+        plt.axvline(mean_price, color='red', linestyle='--', linewidth=2,
+                    label=f'Mean: £{mean_price:.2f}')
         plt.legend()
-    
+
     # 2. Top Categories Bar Chart
     plt.subplot(1, 2, 2)
-    if 'category' in df.columns:
-        top_cats = df['category'].value_counts().head(10)
+    if top_cats:
+        names = [name for name, _ in top_cats]
+        counts = [count for _, count in top_cats]
         colors = plt.cm.Set3(range(len(top_cats)))
-        bars = plt.barh(range(len(top_cats)), top_cats.values, color=colors, edgecolor='black')
-        plt.yticks(range(len(top_cats)), top_cats.index)
+        bars = plt.barh(range(len(top_cats)), counts, color=colors, edgecolor='black')
+        plt.yticks(range(len(top_cats)), names)
         plt.title('Top 10 Book Categories', fontsize=14, fontweight='bold')
         plt.xlabel('Number of Books', fontsize=12)
-        
+
         # Add value labels on bars
         for bar in bars:
             width = bar.get_width()
-            plt.text(width + 0.5, bar.get_y() + bar.get_height()/2, 
-                    f'{int(width)}', ha='left', va='center', fontweight='bold')
-    
+            plt.text(width + 0.5, bar.get_y() + bar.get_height()/2,
+                     f'{int(width)}', ha='left', va='center', fontweight='bold')
+
     plt.tight_layout()
-    plt.savefig('visualization/charts/book_analysis.png', dpi=150, bbox_inches='tight')
+    plt.savefig(output, dpi=150, bbox_inches='tight')
     plt.close()
-    print("✅ Created: visualization/charts/book_analysis.png")
-    
+    return output
+
+
+def render_price_by_category(output, box_data):
+    plt = _pyplot()
+
     # 3. Price by Category (Box Plot)
-    if 'category' in df.columns and 'price_numeric' in df.columns:
-        plt.figure(figsize=(14, 8))
-        # Get top 8 categories for readability
-        top_categories = df['category'].value_counts().head(8).index
-        df_top = df[df['category'].isin(top_categories)]
-        
-        # Create box plot with better styling
-        boxprops = dict(linestyle='-', linewidth=2, color='darkblue')
-        whiskerprops = dict(linestyle='-', linewidth=1.5, color='black')
-        capprops = dict(linestyle='-', linewidth=1.5, color='black')
-        medianprops = dict(linestyle='-', linewidth=2.5, color='red')
-        
-        box_data = []
-        categories = []
-        for category in top_categories:
-            cat_prices = df_top[df_top['category'] == category]['price_numeric'].dropna()
-            if len(cat_prices) > 0:
-                box_data.append(cat_prices)
-                categories.append(category)
-        
-        bp = plt.boxplot(box_data, patch_artist=True, labels=categories,
-                        boxprops=boxprops, whiskerprops=whiskerprops,
-                        capprops=capprops, medianprops=medianprops)
-        
-        # Color the boxes
-        colors = plt.cm.Pastel1(range(len(box_data)))
-        for patch, color in zip(bp['boxes'], colors):
-            patch.set_facecolor(color)
-            patch.set_alpha(0.7)
-        
-        plt.title('Price Distribution by Category', fontsize=16, fontweight='bold')
-        plt.xlabel('Category', fontsize=14)
-        plt.ylabel('Price (£)', fontsize=14)
-        plt.xticks(rotation=45, ha='right')
-        plt.grid(True, alpha=0.3)
-        plt.tight_layout()
-        plt.savefig('visualization/charts/price_by_category.png', dpi=150, bbox_inches='tight')
-        plt.close()
-        print("✅ Created: visualization/charts/price_by_category.png")
+    plt.figure(figsize=(14, 8))
+
+    # Create box plot with better styling
+    boxprops = dict(linestyle='-', linewidth=2, color='darkblue')
+    whiskerprops = dict(linestyle='-', linewidth=1.5, color='black')
+    capprops = dict(linestyle='-', linewidth=1.5, color='black')
+    medianprops = dict(linestyle='-', linewidth=2.5, color='red')
+
+    categories = [name for name, _ in box_data]
+    bp = plt.boxplot([prices for _, prices in box_data], patch_artist=True, labels=categories,
+                     boxprops=boxprops, whiskerprops=whiskerprops,
+                     capprops=capprops, medianprops=medianprops)
+
+    # Color the boxes
+    colors = plt.cm.Pastel1(range(len(box_data)))
+    for patch, color in zip(bp['boxes'], colors):
+        patch.set_facecolor(color)
+        patch.set_alpha(0.7)
+
+    plt.title('Price Distribution by Category', fontsize=16, fontweight='bold')
+    plt.xlabel('Category', fontsize=14)
+    plt.ylabel('Price (£)', fontsize=14)
+    plt.xticks(rotation=45, ha='right')
+    plt.grid(True, alpha=0.3)
+    plt.tight_layout()
+    plt.savefig(output, dpi=150, bbox_inches='tight')
+    plt.close()
+    return output
+
+
+def _render(job):
+    render, output, kwargs = job
+    return render(output, **kwargs)
+
+
+# ========== CHART JOBS ==========
+def chart_jobs(summary):
+    """Return (renderer, output path, inputs) for every chart to draw."""
+    jobs = []
+    counts = summary['category_counts']
+
+    top_cats = counts.most_common(10)
+    jobs.append((render_book_analysis, f'{CHARTS_DIR}/book_analysis.png',
+                 {'prices': summary['prices'], 'top_cats': top_cats}))
+
+    # Get top 8 categories for readability
+    box_data = [
+        (category, summary['prices_by_category'][category])
+        for category, _ in counts.most_common(8)
+        if summary['prices_by_category'].get(category)
+    ]
+    if box_data:
+        jobs.append((render_price_by_category, f'{CHARTS_DIR}/price_by_category.png',
+                     {'box_data': box_data}))
+    return jobs
+
+
+def job_key(job):
+    render, _, kwargs = job
+    data = pickle.dumps((RENDER_VERSION, render.__name__, kwargs), protocol=4)
+    return hashlib.sha256(data).hexdigest()
+
+
+def load_cache():
+    try:
+        with open(CACHE_FILE, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def render_charts(jobs, workers=None):
+    """Render the jobs whose inputs changed since the last run, in parallel."""
+    cache = load_cache()
+    stale = []
+    for job in jobs:
+        output = job[1]
+        key = job_key(job)
+        if cache.get(output) == key and os.path.exists(output):
+            print(f"⏩ Unchanged: {output}")
+            continue
+        stale.append((job, key))
+
+    if len(stale) == 1:
+        outputs = [_render(stale[0][0])]
+    elif stale:
+        with ProcessPoolExecutor(max_workers=workers or len(stale)) as pool:
+            outputs = list(pool.map(_render, [job for job, _ in stale]))
+    else:
+        outputs = []
+
+    for (job, key), output in zip(stale, outputs):
+        cache[output] = key
+        print(f"✅ Created: {output}")
+
+    with open(CACHE_FILE, 'w', encoding='utf-8') as f:
+        json.dump(cache, f, indent=2)
+
+
+def top_categories_html(category_counts, top=5):
+    # Category names come from the scraped pages: escape them
+    return ''.join(f'<li><strong>{html.escape(str(cat))}</strong>: {count} books</li>\n'
+                   for cat, count in category_counts.most_common(top))
+
+
+def create_charts():
+    print("📊 CREATING DATA VISUALIZATIONS...")
+    
+    # Load data - FIXED PATH
+    data_path = Path("data/books.json")
+    
+    if not data_path.exists():
+        # Try alternative path
+        data_path = Path("../data/books.json")
+    
+    if not data_path.exists():
+        print("❌ Could not find books.json. Please check the path.")
+        return
+    
+    summary = summarize(load_books(data_path))
+    
+    # Create visualizations directory
+    os.makedirs(CHARTS_DIR, exist_ok=True)
+    
+    render_charts(chart_jobs(summary))
     
     # 4. Create a simple HTML dashboard with proper escaping
     # Calculate statistics first
-    total_books = len(df)
-    unique_cats = df["category"].nunique() if "category" in df.columns else 0
-    avg_price = df["price_numeric"].mean() if "price_numeric" in df.columns else 0
-    min_price = df["price_numeric"].min() if "price_numeric" in df.columns else 0
-    max_price = df["price_numeric"].max() if "price_numeric" in df.columns else 0
+    prices = summary['prices']
+    total_books = summary['total']
+    unique_cats = len(summary['category_counts'])
+    avg_price = sum(prices) / len(prices) if prices else 0
+    min_price = min(prices) if prices else 0
+    max_price = max(prices) if prices else 0
     
     # Get current date
     from datetime import datetime
-    current_date = datetime.now().strftime("%Y-%m-%d %H:%M")
+    current_date = html.escape(datetime.now().strftime("%Y-%m-%d %H:%M"))
     
     # Get top categories for HTML list
-    top_cats_html = ""
-    if 'category' in df.columns:
-        top_cats = df['category'].value_counts().head(5)
-        for cat, count in top_cats.items():
-            top_cats_html += f'<li><strong>{cat}</strong>: {count} books</li>\n'
+    top_cats_html = top_categories_html(summary['category_counts'])
     
     html_content = f'''<!DOCTYPE html>
 <html>
@@ -0,0 +1,332 @@
+import argparse
+import json
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from itertools import islice
+from urllib.parse import parse_qs, urlparse
+
+# feeds.py lives in the project root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from feeds import iter_books  # noqa: E402
+
+PRICE_PATTERN = re.compile(r'([\d\.]+)')
+RATING_MAP = {'One': 1, 'Two': 2, 'Three': 3, 'Four': 4, 'Five': 5}
+
+# Price histogram bucket width in £
+BUCKET_WIDTH = 5
+
+
+class Aggregates:
+    """Running dashboard statistics, updated one item at a time."""
+
+    def __init__(self):
+        self.lock = threading.Condition()
+        self.version = 0
+        self._clear()
+
+    def _clear(self):
+        self.total = 0
+        self.categories = Counter()
+        self.ratings = Counter()
+        self.price_buckets = Counter()
+        self.price_bands = Counter()
+        self.priced = 0
+        self.price_sum = 0.0
+        self.price_min = None
+        self.price_max = None
+        self.last_update = None
+
+    def add(self, books):
+        with self.lock:
+            for book in books:
+                self._add_one(book)
+            self.version += 1
+            self.last_update = time.strftime('%Y-%m-%d %H:%M:%S')
+            self.lock.notify_all()
+
+    def reset(self):
+        # Start over (the followed feed was replaced); clients get the new
+        # version like any other change
+        with self.lock:
+            self._clear()
+            self.version += 1
+            self.last_update = time.strftime('%Y-%m-%d %H:%M:%S')
+            self.lock.notify_all()
+
+    def _add_one(self, book):
+        self.total += 1
+        if book.get('category'):
+            self.categories[book['category']] += 1
+        if book.get('rating') in RATING_MAP:
+            self.ratings[RATING_MAP[book['rating']]] += 1
+
+        match = PRICE_PATTERN.search(str(book.get('price')))
+        if not match:
+            return
+        try:
+            price = float(match.group(1))
+        except ValueError:
+            return
+        self.priced += 1
+        self.price_sum += price
+        self.price_min = price if self.price_min is None else min(self.price_min, price)
+        self.price_max = price if self.price_max is None else max(self.price_max, price)
+        self.price_buckets[int(price // BUCKET_WIDTH) * BUCKET_WIDTH] += 1
+        if price < 20:
+            self.price_bands['cheap'] += 1
+        elif price < 50:
+            self.price_bands['medium'] += 1
+        else:
+            self.price_bands['expensive'] += 1
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                'version': self.version,
+                'last_update': self.last_update,
+                'total_books': self.total,
+                'unique_categories': len(self.categories),
+                'avg_price': self.price_sum / self.priced if self.priced else 0,
+                'min_price': self.price_min or 0,
+                'max_price': self.price_max or 0,
+                'top_categories': self.categories.most_common(10),
+                'ratings': {rating: self.ratings.get(rating, 0) for rating in range(1, 6)},
+                'price_bands': {band: self.price_bands.get(band, 0)
+                                for band in ('cheap', 'medium', 'expensive')},
+                'price_histogram': sorted(self.price_buckets.items()),
+            }
+
+    def wait_for_change(self, version, timeout):
+        with self.lock:
+            self.lock.wait_for(lambda: self.version != version, timeout=timeout)
+            return self.version
+
+
+def load_json_feed(path, aggregates, batch_size=1000):
+    # Seed from an existing (possibly appended-to) JSON or JSON Lines feed
+    books = iter_books(path)
+    while batch := list(islice(books, batch_size)):
+        aggregates.add(batch)
+
+
+def tail_json_lines(path, aggregates, interval=1.0):
+    """Follow a JSON Lines feed, feeding only the newly written lines.
+
+    When the file shrinks or is replaced by another file (a new crawl wrote
+    it) the aggregates are reset and rebuilt from the new file.
+    """
+    position = 0
+    partial = b''
+    identity = None
+    while True:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            time.sleep(interval)
+            continue
+        size = stat.st_size
+        if size < position or (identity is not None and identity != (stat.st_dev, stat.st_ino)):
+            # File was truncated / replaced by a new crawl
+            position, partial = 0, b''
+            aggregates.reset()
+        identity = stat.st_dev, stat.st_ino
+        if size > position:
+            with open(path, 'rb') as f:
+                f.seek(position)
+                data = partial + f.read(size - position)
+            position = size
+            lines = data.split(b'\n')
+            partial = lines.pop()
+            books = []
+            for line in lines:
+                try:
+                    books.append(json.loads(line))
+                except ValueError:
+                    continue
+            if books:
+                aggregates.add(books)
+        time.sleep(interval)
+
+
+DASHBOARD_HTML = '''<!DOCTYPE html>
+<html>
+<head>
+    <title>Book Scraper Live Dashboard</title>
+    <style>
+        body { font-family: Arial, sans-serif; margin: 40px; background-color: #f5f5f5; }
+        .container { max-width: 1200px; margin: 0 auto; background: white; padding: 30px; border-radius: 10px; box-shadow: 0 2px 10px rgba(0,0,0,0.1); }
+        h1 { color: #2c3e50; border-bottom: 3px solid #3498db; padding-bottom: 10px; }
+        .stats { display: flex; justify-content: space-between; margin: 30px 0; flex-wrap: wrap; }
+        .stat-box { color: white; padding: 20px; border-radius: 5px; text-align: center; flex: 1; margin: 10px; min-width: 200px; }
+        .stat-box h2 { margin: 0; font-size: 28px; }
+        .stat-box p { margin: 5px 0; font-size: 14px; }
+        .data-summary { background: #f8f9fa; padding: 20px; border-radius: 5px; margin: 20px 0; }
+        .data-summary h3 { margin-top: 0; }
+        .bar { display: flex; align-items: center; margin: 4px 0; font-size: 13px; }
+        .bar span { width: 120px; }
+        .bar div { background: #3498db; height: 16px; margin-right: 8px; }
+        footer { margin-top: 40px; text-align: center; color: #7f8c8d; padding-top: 20px; border-top: 1px solid #eee; }
+    </style>
+</head>
+<body>
+    <div class="container">
+        <h1>📚 Book Scraper Live Dashboard</h1>
+        <div class="stats">
+            <div class="stat-box" style="background: #3498db;"><h2 id="total">0</h2><p>Total Books Scraped</p></div>
+            <div class="stat-box" style="background: #2ecc71;"><h2 id="categories">0</h2><p>Unique Categories</p></div>
+            <div class="stat-box" style="background: #e74c3c;"><h2 id="avg">£0.00</h2><p>Average Price</p></div>
+            <div class="stat-box" style="background: #f39c12;"><h2 id="range">£0.00 - £0.00</h2><p>Price Range</p></div>
+        </div>
+        <div class="data-summary"><h3>🏆 Top Categories</h3><div id="top"></div></div>
+        <div class="data-summary"><h3>💰 Price Distribution</h3><div id="prices"></div><p id="bands"></p></div>
+        <div class="data-summary"><h3>⭐ Ratings</h3><div id="ratings"></div></div>
+        <footer><p>🔄 Last update: <span id="updated">waiting for data...</span></p></footer>
+    </div>
+    <script>
+        function bars(el, rows) {
+            // Labels are scraped text: build the nodes, never parse them as HTML
+            const max = Math.max(1, ...rows.map(r => r[1]));
+            el.replaceChildren(...rows.map(r => {
+                const row = document.createElement('div');
+                row.className = 'bar';
+                const label = document.createElement('span');
+                label.textContent = r[0];
+                const fill = document.createElement('div');
+                fill.style.width = `${400 * r[1] / max}px`;
+                row.append(label, fill, String(r[1]));
+                return row;
+            }));
+        }
+        function render(s) {
+            document.getElementById('total').textContent = s.total_books;
+            document.getElementById('categories').textContent = s.unique_categories;
+            document.getElementById('avg').textContent = `£${s.avg_price.toFixed(2)}`;
+            document.getElementById('range').textContent = `£${s.min_price.toFixed(2)} - £${s.max_price.toFixed(2)}`;
+            bars(document.getElementById('top'), s.top_categories);
+            bars(document.getElementById('prices'), s.price_histogram.map(b => [`£${b[0]}-£${b[0] + BUCKET}`, b[1]]));
+            bars(document.getElementById('ratings'), Object.entries(s.ratings).map(r => ['★'.repeat(r[0]), r[1]]));
+            const b = s.price_bands;
+            document.getElementById('bands').textContent =
+                `Cheap (<£20): ${b.cheap} | Medium (£20-£50): ${b.medium} | Expensive (≥£50): ${b.expensive}`;
+            document.getElementById('updated').textContent = s.last_update || 'waiting for data...';
+        }
+        const BUCKET = %(bucket)d;
+        const stream = new EventSource('/api/stream');
+        stream.onmessage = e => render(JSON.parse(e.data));
+    </script>
+</body>
+</html>'''
+
+
+class DashboardHandler(BaseHTTPRequestHandler):
+    aggregates = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, body, content_type, status=200):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path == '/':
+            html = DASHBOARD_HTML % {'bucket': BUCKET_WIDTH}
+            self._send(html.encode('utf-8'), 'text/html; charset=utf-8')
+        elif url.path == '/api/stats':
+            # Long poll: ?since=<version> waits up to 30s for newer numbers
+            since = parse_qs(url.query).get('since')
+            if since:
+                try:
+                    version = int(since[0])
+                except ValueError:
+                    self._send(b'Invalid since', 'text/plain', status=400)
+                    return
+                self.aggregates.wait_for_change(version, timeout=30)
+            body = json.dumps(self.aggregates.snapshot()).encode('utf-8')
+            self._send(body, 'application/json')
+        elif url.path == '/api/stream':
+            self._stream()
+        else:
+            self._send(b'Not found', 'text/plain', status=404)
+
+    def _stream(self):
+        # Server-sent events: push a snapshot whenever the aggregates change
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
+        version = None
+        try:
+            while True:
+                snapshot = self.aggregates.snapshot()
+                if snapshot['version'] != version:
+                    version = snapshot['version']
+                    self.wfile.write(f'data: {json.dumps(snapshot)}\n\n'.encode('utf-8'))
+                    self.wfile.flush()
+                self.aggregates.wait_for_change(version, timeout=15)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def do_POST(self):
+        # Item pipeline push: a JSON list of items
+        if urlparse(self.path).path != '/api/items':
+            self._send(b'Not found', 'text/plain', status=404)
+            return
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+        except ValueError:
+            length = -1
+        if length < 0:
+            self._send(b'Invalid Content-Length', 'text/plain', status=400)
+            return
+        try:
+            books = json.loads(self.rfile.read(length))
+        except ValueError:
+            self._send(b'Invalid JSON', 'text/plain', status=400)
+            return
+        if isinstance(books, dict):
+            books = [books]
+        if not isinstance(books, list) or not all(isinstance(book, dict) for book in books):
+            self._send(b'Expected an item object or a list of item objects', 'text/plain', status=400)
+            return
+        self.aggregates.add(books)
+        self._send(b'{"ok": true}', 'application/json')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Live book scraper dashboard')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8050)
+    parser.add_argument('--seed', help='existing JSON feed to start from (e.g. data/books.json)')
+    parser.add_argument('--tail', help='JSON Lines feed to follow while a crawl writes it')
+    args = parser.parse_args()
+
+    aggregates = Aggregates()
+    if args.seed:
+        load_json_feed(args.seed, aggregates)
+        print(f'✅ Seeded {aggregates.total} books from {args.seed}')
+    if args.tail:
+        threading.Thread(target=tail_json_lines, args=(args.tail, aggregates), daemon=True).start()
+        print(f'👀 Following {args.tail}')
+
+    DashboardHandler.aggregates = aggregates
+    server = ThreadingHTTPServer((args.host, args.port), DashboardHandler)
+    server.daemon_threads = True
+    print(f'🌐 Dashboard running at http://{args.host}:{args.port}/')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print('\n👋 Dashboard stopped')
+
+
+if __name__ == '__main__':
+    main()
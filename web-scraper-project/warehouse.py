@@ -0,0 +1,268 @@
+import argparse
+import math
+import os
+import re
+import sqlite3
+import sys
+from datetime import datetime
+from itertools import islice
+
+from feeds import iter_books
+
+# One file per engine: neither can open the other's
+DEFAULT_DBS = {'sqlite': 'data/books.db', 'duckdb': 'data/books.duckdb'}
+FILE_SIGNATURES = {'sqlite': (0, b'SQLite format 3\x00'), 'duckdb': (8, b'DUCK')}
+BATCH_SIZE = 10000
+
+RATING_MAP = {'One': 1, 'Two': 2, 'Three': 3, 'Four': 4, 'Five': 5}
+PRICE_PATTERN = re.compile(r'([\d\.]+)')
+
+COLUMNS = [
+    ('title', 'TEXT'),
+    ('price', 'DOUBLE'),
+    ('rating', 'INTEGER'),
+    ('availability', 'TEXT'),
+    ('description', 'TEXT'),
+    ('category', 'TEXT'),
+    ('image_url', 'TEXT'),
+    ('product_url', 'TEXT'),
+    ('scraped_date', 'TIMESTAMP'),
+    ('loaded_at', 'TIMESTAMP'),
+]
+
+# ========== REPORT QUERIES ==========
+PRICE_STATS_SQL = '''
+SELECT COUNT(*), COUNT(DISTINCT category), COUNT(image_url), COUNT(description),
+       COUNT(price), AVG(price), MIN(price), MAX(price), STDDEV_SAMP(price)
+FROM books
+'''
+
+MOST_COMMON_PRICE_SQL = '''
+SELECT price FROM books WHERE price IS NOT NULL
+GROUP BY price ORDER BY COUNT(*) DESC, price LIMIT 1
+'''
+
+PRICE_BANDS_SQL = '''
+SELECT SUM(CASE WHEN price < 20 THEN 1 ELSE 0 END),
+       SUM(CASE WHEN price >= 20 AND price < 50 THEN 1 ELSE 0 END),
+       SUM(CASE WHEN price >= 50 THEN 1 ELSE 0 END)
+FROM books
+'''
+
+TOP_CATEGORIES_SQL = '''
+SELECT category, COUNT(*) AS books FROM books
+WHERE category IS NOT NULL
+GROUP BY category ORDER BY books DESC, category LIMIT ?
+'''
+
+RATING_DISTRIBUTION_SQL = '''
+SELECT rating, COUNT(*) FROM books WHERE rating IS NOT NULL GROUP BY rating
+'''
+
+
+class SampleStddev:
+    """STDDEV_SAMP aggregate for SQLite, using Welford's online algorithm."""
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def step(self, value):
+        if value is None:
+            return
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+
+    def finalize(self):
+        if self.count < 2:
+            return None
+        return math.sqrt(self.m2 / (self.count - 1))
+
+
+def file_engine(db_path):
+    # The engine that wrote an existing warehouse file, or None
+    try:
+        with open(db_path, 'rb') as f:
+            header = f.read(16)
+    except OSError:
+        return None
+    for engine, (offset, signature) in FILE_SIGNATURES.items():
+        if header[offset:offset + len(signature)] == signature:
+            return engine
+    return None
+
+
+def connect(db_path, engine='sqlite'):
+    other = file_engine(db_path)
+    if other not in (None, engine):
+        raise ValueError(f'{db_path} is a {other} warehouse; use --engine {other} or another --db')
+    if engine == 'duckdb':
+        import duckdb
+        return duckdb.connect(db_path)
+    con = sqlite3.connect(db_path)
+    con.create_aggregate('STDDEV_SAMP', 1, SampleStddev)
+    return con
+
+
+def create_schema(con):
+    columns = ', '.join(f'{name} {sql_type}' for name, sql_type in COLUMNS)
+    con.execute(f'CREATE TABLE IF NOT EXISTS books ({columns})')
+
+
+def to_row(book, loaded_at):
+    price = PRICE_PATTERN.search(str(book.get('price') or ''))
+    return (
+        book.get('title'),
+        float(price.group(1)) if price else None,
+        RATING_MAP.get(book.get('rating')),
+        book.get('availability'),
+        book.get('description'),
+        book.get('category'),
+        book.get('image_url'),
+        book.get('product_url'),
+        book.get('scraped_date'),
+        loaded_at,
+    )
+
+
+def append_rows(con, engine, rows):
+    if engine == 'duckdb':
+        # DuckDB bulk-loads a column batch much faster than executemany
+        import pandas as pd
+        batch = pd.DataFrame(rows, columns=[name for name, _ in COLUMNS])
+        con.register('batch', batch)
+        con.execute('INSERT INTO books SELECT * FROM batch')
+        con.unregister('batch')
+    else:
+        # sqlite3 has no bulk API: executemany reuses one prepared statement
+        # inside load()'s single transaction
+        placeholders = ', '.join('?' for _ in COLUMNS)
+        con.executemany(f'INSERT INTO books VALUES ({placeholders})', rows)
+
+
+def load(source, db_path=None, engine='sqlite'):
+    db_path = db_path or DEFAULT_DBS[engine]
+    print(f'📥 Loading {source} into {db_path} ({engine})')
+    con = connect(db_path, engine)
+    try:
+        create_schema(con)
+        loaded_at = datetime.now().isoformat()
+        rows = (to_row(book, loaded_at) for book in iter_books(source))
+        total = 0
+        # All or nothing: a failure half-way leaves the warehouse as it was
+        con.execute('BEGIN')
+        try:
+            while batch := list(islice(rows, BATCH_SIZE)):
+                append_rows(con, engine, batch)
+                total += len(batch)
+        except BaseException:
+            con.execute('ROLLBACK')
+            raise
+        con.execute('COMMIT')
+    finally:
+        con.close()
+
+    print(f'✅ Appended {total:,} books'.replace(',', ' '))
+    return total
+
+
+def report(db_path=None, engine='sqlite', top=5):
+    db_path = db_path or DEFAULT_DBS[engine]
+    if not os.path.exists(db_path):
+        print(f'❌ Warehouse not found: {db_path}')
+        return
+
+    con = connect(db_path, engine)
+    try:
+        print_report(con, db_path, top)
+    finally:
+        con.close()
+
+
+def print_report(con, db_path, top):
+    (total, categories, with_images, with_desc,
+     priced, avg_price, min_price, max_price, std_price) = con.execute(PRICE_STATS_SQL).fetchone()
+    if not total:
+        print('❌ Warehouse is empty!')
+        return
+
+    print('📊 WEB SCRAPER PROJECT - WAREHOUSE REPORT')
+    print('=' * 60)
+    print(f'📁 Warehouse: {db_path}')
+    print()
+
+    print('📈 BASIC STATISTICS:')
+    print('-' * 40)
+    print(f'   • Total Books: {total:,}'.replace(',', ' '))
+    print(f'   • Unique Categories: {categories}')
+    print(f'   • Books with Images: {with_images}')
+    print(f'   • Books with Descriptions: {with_desc}')
+
+    print()
+    print('💰 PRICE ANALYSIS:')
+    print('-' * 40)
+    if priced:
+        mode_price = con.execute(MOST_COMMON_PRICE_SQL).fetchone()[0]
+        print(f'   • Average Price: £{avg_price:.2f}')
+        print(f'   • Most Expensive: £{max_price:.2f}')
+        print(f'   • Least Expensive: £{min_price:.2f}')
+        print(f'   • Price Range: £{min_price:.2f} - £{max_price:.2f}')
+        print(f'   • Standard Deviation: £{std_price or 0.0:.2f}')
+        print(f'   • Most Common Price: £{mode_price:.2f}')
+
+        cheap, medium, expensive = con.execute(PRICE_BANDS_SQL).fetchone()
+        print(f'   • Cheap (<£20): {cheap} books')
+        print(f'   • Medium (£20-£50): {medium} books')
+        print(f'   • Expensive (≥£50): {expensive} books')
+    else:
+        print('   • No books with a price')
+
+    print()
+    print('📚 CATEGORY ANALYSIS:')
+    print('-' * 40)
+    print(f'   • Top {top} Categories:')
+    for i, (category, count) in enumerate(con.execute(TOP_CATEGORIES_SQL, (top,)).fetchall(), 1):
+        percentage = (count / total) * 100
+        print(f'     {i}. {category}: {count} books ({percentage:.1f}%)')
+
+    print()
+    print('⭐ RATING ANALYSIS:')
+    print('-' * 40)
+    rating_counts = dict(con.execute(RATING_DISTRIBUTION_SQL).fetchall())
+    for rating in range(1, 6):
+        count = rating_counts.get(rating, 0)
+        percentage = (count / total) * 100
+        stars = '★' * rating + '☆' * (5 - rating)
+        print(f'   • {stars} ({rating}/5): {count} books ({percentage:.1f}%)')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load crawl output into a SQL warehouse and report on it')
+    parser.add_argument('--db', help='warehouse file (default: data/books.db, or data/books.duckdb '
+                                     'with --engine duckdb)')
+    parser.add_argument('--engine', choices=['sqlite', 'duckdb'], default='sqlite')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    load_parser = subparsers.add_parser('load', help='append a JSON / JSON Lines crawl output')
+    load_parser.add_argument('source', nargs='?', default='data/books.json')
+
+    report_parser = subparsers.add_parser('report', help='print the analysis report')
+    report_parser.add_argument('--top', type=int, default=5, help='number of top categories')
+
+    args = parser.parse_args()
+    try:
+        if args.command == 'load':
+            load(args.source, args.db, args.engine)
+        else:
+            report(args.db, args.engine, args.top)
+    except ValueError as e:
+        print(f'❌ {e}')
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())